@@ -6,11 +6,13 @@ import shutil
 from datetime import datetime
 import io
 import re
-import traceback
+import json
+import asyncio
+import hashlib
 from contextlib import redirect_stdout
 
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, RedirectResponse
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Body, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, RedirectResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -18,22 +20,49 @@ from typing import List, Optional
 
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
-from pydub import AudioSegment
 from pinecone import Pinecone
 
 # Add the modules directory to the path
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules"))
 
+from modules.log import get_logger
+
+logger = get_logger(__name__)
+
 # Import required modules directly from the modules directory
 try:
     from modules import embed
-    from modules.speaker_id import process_conversation, transcribe, test_voice_segment, convert_to_wav
-    from modules.database.s3_operations import downloadFile, deleteFile, deleteFolder, generate_presigned_url
-    from modules.database.db_operations import get_db_connection, init_database, add_speaker, get_utterances_by_conversation, format_time
-    print("All modules imported successfully")
+    from modules.speaker_id import process_conversation, transcribe, test_voice_segment, waveform_s3_path
+    from modules.audio import (
+        decode_audio, to_wav_bytes, with_format, format_of, accepts_explicitly,
+        AUDIO_FORMATS, AUDIO_PLAYBACK_FORMAT
+    )
+    from modules.database.s3_operations import downloadFile, downloadBytes, deleteFile, deleteFolder, generate_presigned_url
+    from modules.database.db_operations import (
+        get_db_connection, init_database, add_speaker, get_utterances_by_conversation, format_time, get_conversation_by_id
+    )
+    from modules.compact_pinecone import compact_speaker
+    from modules.pinecone_gallery import (
+        delete_speaker_vectors, get_gallery, upsert_vectors, delete_vector_ids, fetch_vectors,
+        speaker_exists, start_gallery_reconciler
+    )
+    from modules.jobs import submit_job, get_job
+    from modules.vad import trim_silence
+    from modules.windowed_embed import embed_audio
+    from modules.waveform import WAVEFORM_CONTENT_TYPE
+    from modules.concurrency import offload, run_blocking
+    from modules.uploads import save_upload, UploadSizeLimitMiddleware, UPLOAD_CHUNK_BYTES
+    from modules import upload_sessions
+    from modules.ingest import ingest_lock, find_existing_conversation
+    from modules.workspace import Workspace, cleanup_stale_workspaces
+    from modules.live_ingest import LiveIngestSession, LIVE_MAX_SECONDS
+    from modules import events
+    from modules.metrics import RequestMetricsMiddleware, render_metrics, METRICS_CONTENT_TYPE
+    from modules.tracing import TracingMiddleware
+    from modules.profiling import ProfilingMiddleware, is_admin, list_profiles, profile_path, profile_text
+    logger.info("All modules imported successfully")
 except ImportError as e:
-    print(f"Warning: Module import failed: {e}")
-    print("Some functionality may be limited.")
+    logger.warning("Module import failed, some functionality may be limited: %s", e)
 
 # Load environment variables
 load_dotenv()
@@ -50,6 +79,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before the body is buffered
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path_prefixes=["/api/conversations/upload", "/api/pinecone/speakers", "/api/pinecone/embeddings"]
+)
+
+# Opt-in cProfile of single requests (X-Profile: 1 with X-Admin-Key)
+app.add_middleware(ProfilingMiddleware)
+
+# Per-route request latency for /metrics (outermost, so rejected requests are timed too)
+app.add_middleware(RequestMetricsMiddleware)
+
+# Root trace span and X-Request-ID for every request
+app.add_middleware(TracingMiddleware)
+
 # Mount static files
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
@@ -59,17 +103,24 @@ pinecone_api_key = os.getenv("PINECONE_API_KEY")
 if pinecone_api_key:
     pc = Pinecone(api_key=pinecone_api_key)
     pinecone_index = pc.Index("speaker-embeddings")
+    # Populate the speaker-name cache in the background and keep it reconciled
+    start_gallery_reconciler(pinecone_index)
 else:
-    print("WARNING: PINECONE_API_KEY not set.")
+    logger.warning("PINECONE_API_KEY not set")
     pinecone_index = None
 
 # Initialize database tables if needed
 try:
     init_database()
-    print("Database initialized successfully")
+    logger.info("Database initialized successfully")
 except Exception as e:
-    print(f"Warning: Database initialization failed: {e}")
-    print("This is not critical if tables already exist.")
+    logger.warning("Database initialization failed (not critical if tables already exist): %s", e)
+
+# Remove scratch workspaces left behind by crashed workers
+try:
+    cleanup_stale_workspaces()
+except Exception as e:
+    logger.warning("Stale workspace cleanup failed: %s", e)
 
 # Define data models for Pinecone Manager
 class Speaker(BaseModel):
@@ -89,6 +140,15 @@ class DeleteResponse(BaseModel):
     speaker_name: str
     embeddings_deleted: Optional[int] = None
     embedding_id: Optional[str] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+class CompactResponse(BaseModel):
+    speaker_name: str
+    before: int
+    after: int
+    deleted: int
+    dry_run: bool
 
 # Define data models for Dashboard
 class DashboardSpeaker(BaseModel):
@@ -116,48 +176,13 @@ class Conversation(BaseModel):
     utterances: List[Utterance]
 
 # Helper functions
-def convert_to_wav(input_file):
-    """Convert an audio file to WAV format if needed"""
-    if input_file.lower().endswith('.wav'):
-        return input_file
-        
-    print(f"Converting {input_file} to WAV format...")
-    base_filename = os.path.splitext(os.path.basename(input_file))[0]
-    wav_file = f"{base_filename}_temp.wav"
-    
-    try:
-        # Load and convert the audio file
-        audio = AudioSegment.from_file(input_file)
-        
-        # Convert to mono if stereo
-        if audio.channels > 1:
-            print("Converting to mono...")
-            audio = audio.set_channels(1)
-        
-        # Export as WAV
-        audio.export(wav_file, format="wav")
-        print(f"File converted and saved as: {wav_file}")
-        
-        return wav_file
-    except Exception as e:
-        # If any error occurs, ensure temp file is cleaned up
-        if os.path.exists(wav_file):
-            os.remove(wav_file)
-            print(f"Removed temporary file due to error: {wav_file}")
-        raise e
-
 def check_speaker_exists(speaker_name):
     """Check if a speaker already exists in the database"""
     if not pinecone_index:
         return False
         
-    results = pinecone_index.query(
-        vector=[0.0] * 192,  # Dummy vector for metadata-only search
-        top_k=1,
-        include_metadata=True,
-        filter={"speaker_name": {"$eq": speaker_name}}
-    )
-    return len(results['matches']) > 0
+    # In-memory lookup kept current by every gallery write and periodic reconciliation
+    return speaker_exists(pinecone_index, speaker_name)
 
 def find_utterance_s3_path(conversation_id_str, utterance_id, utterance_idx=None):
     """Find the S3 path for an utterance audio file using the same logic as get_audio"""
@@ -169,7 +194,7 @@ def find_utterance_s3_path(conversation_id_str, utterance_id, utterance_idx=None
         except:
             utterance_idx = 0
     
-    print(f"Finding S3 path for conversation {conversation_id_str}, utterance {utterance_id}, index {utterance_idx}")
+    logger.debug("Finding S3 path for conversation %s, utterance %s, index %s", conversation_id_str, utterance_id, utterance_idx)
     
     # Create multiple path variations to try (same as get_audio)
     paths_to_try = [
@@ -193,15 +218,14 @@ def find_utterance_s3_path(conversation_id_str, utterance_id, utterance_idx=None
         f"conversations/conversation_{conversation_id_str}/utterances/utterance_{utterance_idx}.wav",
     ]
     
-    print("Trying S3 paths:")
     for path in paths_to_try:
-        print(f"Trying path: {path}")
+        logger.debug("Trying S3 path %s", path)
         presigned_url = generate_presigned_url(path)
         if presigned_url:
-            print(f"Found file at: {path}")
+            logger.debug("Found file at %s", path)
             return path
     
-    print("Could not find audio file at any expected path")
+    logger.warning("Could not find audio file at any expected path")
     return None
 
 # ============= ROUTES FOR PAGE 1: MAIN DASHBOARD =============
@@ -222,10 +246,15 @@ async def favicon():
             f.write(b"")
     return FileResponse(favicon_path)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/conversations")
-async def list_conversations():
+@offload
+def list_conversations():
     try:
-        print("Attempting to connect to database...")
         conn = get_db_connection()
         cur = conn.cursor()
         
@@ -238,10 +267,9 @@ async def list_conversations():
             """)
             display_name_exists = cur.fetchone() is not None
         except Exception as e:
-            print(f"Error checking for display_name column: {e}")
+            logger.error("Error checking for display_name column: %s", e)
             display_name_exists = False
         
-        print("Executing conversations query...")
         # Build the query based on whether display_name exists
         if display_name_exists:
             query = """
@@ -258,7 +286,8 @@ async def list_conversations():
                     (SELECT COUNT(*) 
                      FROM utterances 
                      WHERE conversation_id = c.id
-                    ) as utterance_count
+                    ) as utterance_count,
+                    c.status
                 FROM conversations c
                 ORDER BY c.date_processed DESC
             """
@@ -276,7 +305,8 @@ async def list_conversations():
                 (SELECT COUNT(*) 
                  FROM utterances 
                  WHERE conversation_id = c.id
-                ) as utterance_count
+                ) as utterance_count,
+                c.status
             FROM conversations c
             ORDER BY c.date_processed DESC
             """
@@ -308,7 +338,8 @@ async def list_conversations():
                     "display_name": conv[4],
                     "speaker_count": conv[5],
                     "utterance_count": conv[6],
-                    "speakers": speaker_names
+                    "speakers": speaker_names,
+                    "status": conv[7]
                 })
             else:
                 result.append({
@@ -318,7 +349,8 @@ async def list_conversations():
                     "duration": conv[3],
                     "speaker_count": conv[4],
                     "utterance_count": conv[5],
-                    "speakers": speaker_names
+                    "speakers": speaker_names,
+                    "status": conv[6]
                 })
         
         cur.close()
@@ -326,14 +358,45 @@ async def list_conversations():
         return result
     
     except Exception as e:
-        print(f"Error listing conversations: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error listing conversations: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def negotiate_audio_variant(s3_path, requested_format=None, accept=None):
+    """Pick the stored variant of an utterance to serve: an explicit ?format=, else the
+    compressed playback copy when the client lists its type in Accept, else the
+    stored lossless file. Browsers send */* whether or not they can play Opus
+    (Safari cannot), so wildcards fall back to the lossless file.
+    Returns (s3_path, presigned_url), where the URL is None if it was not generated yet."""
+    candidates = []
+    if requested_format:
+        if requested_format not in AUDIO_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported audio format '{requested_format}'")
+        candidates.append(requested_format)
+    if AUDIO_PLAYBACK_FORMAT and accepts_explicitly(accept, AUDIO_PLAYBACK_FORMAT):
+        candidates.append(AUDIO_PLAYBACK_FORMAT)
+    
+    for audio_format in candidates:
+        variant_path = with_format(s3_path, audio_format)
+        if variant_path == s3_path:
+            return s3_path, None
+        # Legacy WAV-only conversations have no compressed copies
+        presigned_url = generate_presigned_url(variant_path)
+        if presigned_url:
+            return variant_path, presigned_url
+    if requested_format and format_of(s3_path) != requested_format:
+        raise HTTPException(status_code=404, detail=f"No {requested_format} variant stored for this utterance")
+    return s3_path, None
+
 @app.get("/api/audio/{conversation_id}/{utterance_id}")
-async def get_audio(conversation_id: str, utterance_id: str):
+@offload
+def get_audio(
+    conversation_id: str,
+    utterance_id: str,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
     try:
-        print(f"\nGetting audio for conversation {conversation_id}, utterance {utterance_id}")
+        logger.debug("Getting audio for conversation %s, utterance %s", conversation_id, utterance_id)
         
         # Connect to the database
         conn = get_db_connection()
@@ -346,7 +409,7 @@ async def get_audio(conversation_id: str, utterance_id: str):
         conversation = cur.fetchone()
         
         if not conversation:
-            print(f"Conversation with ID {conversation_id} not found, trying as conversation_id string")
+            logger.debug("Conversation with ID %s not found, trying as conversation_id string", conversation_id)
             # Try finding by conversation_id string
             cur.execute("""
                 SELECT id, conversation_id FROM conversations WHERE conversation_id = %s
@@ -354,10 +417,10 @@ async def get_audio(conversation_id: str, utterance_id: str):
             conversation = cur.fetchone()
             
             if not conversation:
-                print(f"Conversation {conversation_id} not found")
+                logger.info("Conversation %s not found", conversation_id)
                 raise HTTPException(status_code=404, detail="Conversation not found")
         
-        print(f"Found conversation: database ID={conversation[0]}, conversation_id={conversation[1]}")
+        logger.debug("Found conversation: database ID=%s, conversation_id=%s", conversation[0], conversation[1])
             
         # Get the utterance details - use conversation database ID
         db_conversation_id = conversation[0]
@@ -368,7 +431,7 @@ async def get_audio(conversation_id: str, utterance_id: str):
         utterance = cur.fetchone()
         
         if not utterance:
-            print(f"Utterance {utterance_id} not found for conversation {db_conversation_id}, trying as utterance_id string")
+            logger.debug("Utterance %s not found for conversation %s, trying as utterance_id string", utterance_id, db_conversation_id)
             # Try finding by utterance_id string
             cur.execute("""
                 SELECT id, utterance_id, start_time, end_time, audio_file, text FROM utterances 
@@ -377,11 +440,10 @@ async def get_audio(conversation_id: str, utterance_id: str):
             utterance = cur.fetchone()
             
             if not utterance:
-                print(f"Utterance {utterance_id} not found")
+                logger.info("Utterance %s not found", utterance_id)
                 raise HTTPException(status_code=404, detail="Utterance not found")
             
-        print(f"Found utterance: id={utterance[0]}, utterance_id={utterance[1]}, start_time={utterance[2]}, end_time={utterance[3]}")
-        print(f"Audio path: {utterance[4]}")
+        logger.debug("Found utterance: id=%s, utterance_id=%s, start_time=%s, end_time=%s, audio path=%s", *utterance[:5])
         
         # Get the S3 path for the utterance
         s3_path = utterance[4]
@@ -400,7 +462,7 @@ async def get_audio(conversation_id: str, utterance_id: str):
                 except:
                     utterance_idx = 0
                     
-            print(f"Using utterance index {utterance_idx} for S3 path construction")
+            logger.debug("Using utterance index %s for S3 path construction", utterance_idx)
             
             # Create multiple path variations to try
             paths_to_try = [
@@ -424,34 +486,36 @@ async def get_audio(conversation_id: str, utterance_id: str):
                 f"conversations/conversation_{conv_id_str}/utterances/utterance_{utterance_idx}.wav",
             ]
             
-            print("Audio file path not in database, trying default paths:")
+            logger.debug("Audio file path not in database, trying default paths")
             for path in paths_to_try:
-                print(f"Trying path: {path}")
+                logger.debug("Trying S3 path %s", path)
                 presigned_url = generate_presigned_url(path)
                 if presigned_url:
-                    print(f"Found file at: {path}")
+                    logger.debug("Found file at %s", path)
                     s3_path = path
                     break
             
             if not s3_path:
-                print("Could not find audio file at any expected path")
+                logger.warning("Could not find audio file at any expected path")
                 raise HTTPException(status_code=404, detail="Audio file not found in storage")
         
+        # Serve the compressed playback copy when the client can play it
+        s3_path, presigned_url = negotiate_audio_variant(s3_path, format, accept)
+        
         # Generate a presigned URL
-        presigned_url = generate_presigned_url(s3_path)
         if not presigned_url:
-            print("Failed to generate presigned URL")
+            presigned_url = generate_presigned_url(s3_path)
+        if not presigned_url:
+            logger.warning("Failed to generate presigned URL for %s", s3_path)
             raise HTTPException(status_code=404, detail="Audio file not found or inaccessible")
             
-        print(f"Successfully generated presigned URL")
         # Return a redirect to the presigned URL
         return RedirectResponse(url=presigned_url)
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting audio: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error getting audio: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if 'cur' in locals() and cur:
@@ -465,10 +529,11 @@ def cleanup_temp_files(temp_dir):
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
     except Exception as e:
-        print(f"Error cleaning up temporary files: {e}")
+        logger.error("Error cleaning up temporary files: %s", e)
 
 @app.get("/api/conversations/{conversation_id}")
-async def get_conversation(conversation_id: str):
+@offload
+def get_conversation(conversation_id: str):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -483,18 +548,18 @@ async def get_conversation(conversation_id: str):
             """)
             display_name_exists = cur.fetchone() is not None
         except Exception as e:
-            print(f"Error checking for display_name column: {e}")
+            logger.error("Error checking for display_name column: %s", e)
             display_name_exists = False
         
         # Get the conversation details
         if display_name_exists:
             cur.execute("""
-                SELECT id, conversation_id, date_processed, duration_seconds, display_name
+                SELECT id, conversation_id, date_processed, duration_seconds, display_name, status
                 FROM conversations WHERE id = %s
             """, (conversation_id,))
         else:
             cur.execute("""
-                SELECT id, conversation_id, date_processed, duration_seconds
+                SELECT id, conversation_id, date_processed, duration_seconds, status
                 FROM conversations WHERE id = %s
             """, (conversation_id,))
         
@@ -519,13 +584,15 @@ async def get_conversation(conversation_id: str):
         audio_s3_key = f"audio/{conversation_id}.wav" # Adjust if needed
         audio_url = generate_presigned_url(audio_s3_key) # Or construct local URL if not using S3
 
-        # Format the conversation response
+        # Format the conversation response; while status is "processing" the
+        # utterances are the ones committed so far
         conv_details = {
             "id": str(conversation[0]),
             "conversation_id": str(conversation[1]),
             "created_at": conversation[2].isoformat() if conversation[2] else None,
             "duration": conversation[3],
             "display_name": conversation[4] if display_name_exists else None,
+            "status": conversation[-1],
             "utterances": [],
             "audio_url": audio_url # Add the generated URL
         }
@@ -556,7 +623,6 @@ async def get_conversation(conversation_id: str):
             
             # If time strings are null but ms values are present, format them
             if (start_time is None or end_time is None) and (start_ms is not None and end_ms is not None):
-                print(f"Formatting times for utterance {utterance_id} from ms values")
                 start_time = format_time(start_ms)
                 end_time = format_time(end_ms)
             
@@ -581,68 +647,452 @@ async def get_conversation(conversation_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting conversation: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error getting conversation: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Peaks never change once a conversation is ingested
+WAVEFORM_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@app.get("/api/conversations/{conversation_id}/waveform")
+@offload
+def get_conversation_waveform(conversation_id: str, if_none_match: Optional[str] = Header(None)):
+    """Serve the precomputed min/max waveform peaks of a conversation"""
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        cur.execute("""
+            SELECT id, conversation_id FROM conversations WHERE id = %s
+        """, (conversation_id,))
+        conversation = cur.fetchone()
+        
+        if not conversation:
+            # Try finding by conversation_id string
+            cur.execute("""
+                SELECT id, conversation_id FROM conversations WHERE conversation_id = %s
+            """, (conversation_id,))
+            conversation = cur.fetchone()
+        
+        cur.close()
+        conn.close()
+        
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        peaks = downloadBytes(waveform_s3_path(conversation[1]))
+        if peaks is None:
+            raise HTTPException(status_code=404, detail="Waveform not available for this conversation")
+        
+        etag = f'"{hashlib.sha1(peaks).hexdigest()}"'
+        headers = {"Cache-Control": WAVEFORM_CACHE_CONTROL, "ETag": etag}
+        if if_none_match == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=peaks, media_type=WAVEFORM_CONTENT_TYPE, headers=headers)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error getting waveform: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/conversations/upload")
-async def upload_conversation(
+def ingest_conversation(file_path, conversation_id, options, content_hash, workspace, progress=None):
+    """Background job: run the ingest pipeline on a direct upload, then remove its workspace"""
+    try:
+        if progress:
+            progress(stage="processing", conversation_id=conversation_id)
+        with ingest_lock(content_hash):
+            # A duplicate may have finished while this upload was queued
+            existing = find_existing_conversation(content_hash, options.get("idempotency_key"))
+            if existing:
+                events.publish(conversation_id, "completed", conversation_id=existing["conversation_id"],
+                               duplicate=True, status=existing["status"])
+                return {"conversation_id": existing["conversation_id"], "duplicate": True}
+            
+            result = process_conversation(
+                file_path, conversation_id,
+                options.get("display_name"),
+                options.get("match_threshold", 0.40),
+                options.get("auto_update_threshold", 0.50),
+                content_hash=content_hash,
+                idempotency_key=options.get("idempotency_key"),
+                workspace=workspace
+            )
+        return {"conversation_id": result["conversation_id"], "duplicate": False}
+    except Exception as e:
+        events.publish(conversation_id, "failed", error=str(e))
+        raise
+    finally:
+        workspace.cleanup()
+
+@app.post("/api/conversations/upload", status_code=202)
+@offload
+def upload_conversation(
     file: UploadFile = File(...),
     display_name: Optional[str] = Form(None),
     match_threshold: float = Form(0.40),
-    auto_update_threshold: float = Form(0.50)
+    auto_update_threshold: float = Form(0.50),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    """Save an upload and queue it for ingest; progress streams from the returned events_url"""
+    # Scratch space for this upload; the ingest job takes it over and removes it
+    workspace = Workspace("upload")
     try:
-        # Create a temporary directory
-        temp_dir = tempfile.mkdtemp()
-        temp_wav_file = None
-        
-        try:
-            # Save the uploaded file
-            file_path = os.path.join(temp_dir, secure_filename(file.filename))
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            
-            # Convert to WAV if needed
-            wav_file = convert_to_wav(file_path)
-            if wav_file != file_path:
-                temp_wav_file = wav_file
-            
-            # Generate a unique ID for the conversation
-            conversation_id = str(uuid.uuid4())
-            
-            # Process the conversation with custom thresholds
-            result = process_conversation(wav_file, conversation_id, display_name, match_threshold, auto_update_threshold)
-            
-            return {
+        # Copy the spooled upload into the workspace, enforcing the size limit and hashing as we go
+        file_path = os.path.join(workspace.disk_dir, secure_filename(file.filename) or "upload")
+        size_bytes, content_hash = save_upload(file, file_path)
+        logger.info("Saved upload %s (%d bytes, sha256 %s)", file.filename, size_bytes, content_hash)
+        
+        # Identical audio (or a retried request) is only ingested once
+        existing = find_existing_conversation(content_hash, idempotency_key)
+        if existing:
+            logger.info("Upload matches existing conversation %s, skipping processing", existing["conversation_id"])
+            workspace.cleanup()
+            return JSONResponse(status_code=200, content={
                 "success": True,
-                "conversation_id": result["conversation_id"],
-                "message": "Conversation processed successfully"
-            }
+                "conversation_id": existing["conversation_id"],
+                "content_hash": content_hash,
+                "duplicate": True,
+                "status": existing["status"],
+                "message": "Conversation was already uploaded"
+            })
+        
+        # Generate a unique ID for the conversation
+        conversation_id = str(uuid.uuid4())
+        options = {
+            "display_name": display_name,
+            "match_threshold": match_threshold,
+            "auto_update_threshold": auto_update_threshold,
+            "idempotency_key": idempotency_key
+        }
+        # Published before the job starts so early subscribers find the conversation
+        events.publish(conversation_id, "queued")
+        job_id = submit_job("ingest", ingest_conversation, file_path, conversation_id, options, content_hash, workspace)
         
-        finally:
-            # Clean up temporary files
-            if temp_wav_file and os.path.exists(temp_wav_file):
-                os.remove(temp_wav_file)
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        return {
+            "success": True,
+            "conversation_id": conversation_id,
+            "job_id": job_id,
+            "content_hash": content_hash,
+            "duplicate": False,
+            "status": "processing",
+            "events_url": f"/api/conversations/{conversation_id}/events"
+        }
     
+    except HTTPException:
+        workspace.cleanup()
+        raise
     except Exception as e:
-        print(f"Error processing conversation: {str(e)}")
-        traceback.print_exc()
+        workspace.cleanup()
+        logger.exception("Error processing conversation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# How long EventSource waits before reconnecting to a conversation still processing elsewhere
+EVENTS_RETRY_MS = 5000
+
+def format_sse(event):
+    """Serialize an event as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def stored_status_event(conversation):
+    """The event matching a stored conversation's status, for conversations with no events in memory"""
+    conversation_id = conversation["conversation_id"]
+    status = conversation["status"]
+    if status == "failed":
+        return {"id": 1, "type": "failed", "conversation_id": conversation_id, "error": "Processing failed"}
+    if status == "processing":
+        # Not terminal: id 0 so a reconnect replays everything if the events turn up here
+        return {"id": 0, "type": "processing", "conversation_id": conversation_id}
+    return {"id": 1, "type": "completed", "conversation_id": conversation_id, "duplicate": False}
+
+@app.get("/api/conversations/{conversation_id}/events")
+async def conversation_events(conversation_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream a conversation's ingest progress as Server-Sent Events"""
+    if not events.has_events(conversation_id):
+        # Nothing in flight here (or already forgotten): report the stored status
+        try:
+            conversation = await run_blocking(get_conversation_by_id, conversation_id)
+        except Exception as e:
+            logger.exception("Error looking up conversation %s: %s", conversation_id, e)
+            raise HTTPException(status_code=500, detail=str(e))
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        event = stored_status_event(conversation)
+        message = format_sse(event)
+        if event["type"] == "processing":
+            # Still running in another worker, or orphaned by a restart: EventSource reconnects and checks again
+            message = f"retry: {EVENTS_RETRY_MS}\n" + message
+        return StreamingResponse(
+            iter([message]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"}
+        )
+    
+    # EventSource sends Last-Event-ID when it reconnects, so only missed events are replayed
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    async def stream():
+        async for event in events.subscribe(conversation_id, after):
+            # A comment line keeps idle connections from being closed by proxies
+            yield format_sse(event) if event else ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def ingest_upload_session(upload_id, progress=None):
+    """Background job: run the ingest pipeline on an assembled resumable upload"""
+    session = upload_sessions.get_session(upload_id)
+    options = session["options"]
+    file_path = upload_sessions.data_path(session)
+    upload_sessions.update_session(upload_id, status="processing")
+    if progress:
+        progress(stage="processing", upload_id=upload_id, conversation_id=session["conversation_id"])
+    
+    try:
+        with ingest_lock(session["content_hash"]):
+            # A duplicate may have finished while this upload was queued
+            existing = find_existing_conversation(session["content_hash"], options.get("idempotency_key"))
+            if existing:
+                existing_id = existing["conversation_id"]
+                upload_sessions.update_session(upload_id, status="completed", conversation_id=existing_id)
+                events.publish(session["conversation_id"], "completed", conversation_id=existing_id,
+                               duplicate=True, status=existing["status"])
+                return {"conversation_id": existing_id, "upload_id": upload_id, "duplicate": True}
+            
+            result = process_conversation(
+                file_path,
+                session["conversation_id"],
+                options.get("display_name"),
+                options.get("match_threshold", 0.40),
+                options.get("auto_update_threshold", 0.50),
+                content_hash=session["content_hash"],
+                idempotency_key=options.get("idempotency_key")
+            )
+        upload_sessions.update_session(upload_id, status="completed")
+        return {"conversation_id": result["conversation_id"], "upload_id": upload_id, "duplicate": False}
+    except Exception as e:
+        upload_sessions.update_session(upload_id, status="failed", error=str(e))
+        events.publish(session["conversation_id"], "failed", error=str(e))
+        raise
+    finally:
+        # Keep the session metadata (for status polling) until it expires, but not the audio
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+@app.post("/api/uploads", status_code=201)
+@offload
+def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(...),
+    display_name: Optional[str] = Form(None),
+    match_threshold: float = Form(0.40),
+    auto_update_threshold: float = Form(0.50),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Start a resumable upload; send chunks with PUT /api/uploads/{upload_id}?offset=N"""
+    session = upload_sessions.create_session(filename, size, {
+        "display_name": display_name,
+        "match_threshold": match_threshold,
+        "auto_update_threshold": auto_update_threshold,
+        "idempotency_key": idempotency_key
+    })
+    return {
+        "upload_id": session["upload_id"],
+        "offset": session["offset"],
+        "size": session["size"],
+        "max_chunk_bytes": upload_sessions.MAX_CHUNK_BYTES
+    }
+
+@app.get("/api/uploads/{upload_id}")
+@offload
+def get_upload_session(upload_id: str):
+    """Get the committed offset (where to resume) and processing status of an upload"""
+    session = upload_sessions.get_session(upload_id)
+    job = get_job(session["job_id"]) if session["job_id"] else None
+    return {
+        "upload_id": upload_id,
+        "offset": session["offset"],
+        "size": session["size"],
+        "status": session["status"],
+        "conversation_id": session["conversation_id"],
+        "job": job
+    }
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = 0):
+    """Receive the bytes of an upload starting at offset"""
+    part_path = await run_blocking(upload_sessions.new_part_path, upload_id)
+    try:
+        # Stream the request body to a scratch file, writing off the event loop
+        received = 0
+        buffer = bytearray()
+        with open(part_path, "wb") as part:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > upload_sessions.MAX_CHUNK_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Chunk exceeds the maximum of {upload_sessions.MAX_CHUNK_BYTES} bytes"
+                    )
+                buffer += chunk
+                if len(buffer) >= UPLOAD_CHUNK_BYTES:
+                    await run_blocking(part.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_blocking(part.write, bytes(buffer))
+        
+        session = await run_blocking(upload_sessions.commit_chunk, upload_id, offset, part_path)
+        return {"upload_id": upload_id, "offset": session["offset"], "size": session["size"]}
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+@app.post("/api/uploads/{upload_id}/complete", status_code=202)
+@offload
+def complete_upload_session(upload_id: str):
+    """Assemble a fully received upload and hand it to the ingest pipeline"""
+    session = upload_sessions.finalize_session(upload_id)
+    
+    # Short-circuit if this audio (or idempotency key) was already ingested
+    existing = find_existing_conversation(session["content_hash"], session["options"].get("idempotency_key"))
+    if existing:
+        existing_id = existing["conversation_id"]
+        logger.info("Upload %s matches existing conversation %s, skipping processing", upload_id, existing_id)
+        os.remove(upload_sessions.data_path(session))
+        upload_sessions.update_session(upload_id, status="completed", conversation_id=existing_id)
+        return JSONResponse(status_code=200, content={
+            "upload_id": upload_id,
+            "job_id": None,
+            "conversation_id": existing_id,
+            "content_hash": session["content_hash"],
+            "duplicate": True,
+            "status": existing["status"]
+        })
+    
+    # A requeued session keeps its conversation ID, so its events URL stays valid
+    conversation_id = session["conversation_id"] or str(uuid.uuid4())
+    upload_sessions.update_session(upload_id, conversation_id=conversation_id)
+    
+    events.publish(conversation_id, "queued")
+    job_id = submit_job("ingest", ingest_upload_session, upload_id)
+    upload_sessions.update_session(upload_id, job_id=job_id)
+    
+    return {
+        "upload_id": upload_id,
+        "job_id": job_id,
+        "conversation_id": conversation_id,
+        "content_hash": session["content_hash"],
+        "duplicate": False,
+        "status": "processing",
+        "events_url": f"/api/conversations/{conversation_id}/events"
+    }
+
+@app.delete("/api/uploads/{upload_id}")
+@offload
+def abort_upload_session(upload_id: str):
+    """Abandon an upload and discard the received data"""
+    session = upload_sessions.get_session(upload_id)
+    # Sessions whose ingest job was lost (e.g. to a restart) can be aborted
+    if session["status"] in ("assembled", "processing") and not upload_sessions.is_abandoned(session):
+        raise HTTPException(status_code=409, detail="Upload is already being processed")
+    upload_sessions.delete_session(upload_id)
+    return {"success": True, "upload_id": upload_id}
+
+# ============= LIVE INGEST =============
+
+@app.websocket("/ws/ingest")
+async def live_ingest(websocket: WebSocket):
+    """Stream live PCM in, push provisional speaker-labelled segments back (protocol in modules/live_ingest.py)"""
+    await websocket.accept()
+    session = None
+    pending = set()
+    send_lock = asyncio.Lock()
+    
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    async def identify_segment(start_ms, end_ms):
+        try:
+            await send(await run_blocking(session.identify, start_ms, end_ms))
+        except Exception as e:
+            logger.error("Error identifying live segment %d-%dms: %s", start_ms, end_ms, e)
+            await send({"type": "error", "start_ms": start_ms, "end_ms": end_ms, "detail": str(e)})
+    
+    def schedule(segments):
+        for start_ms, end_ms in segments:
+            task = asyncio.create_task(identify_segment(start_ms, end_ms))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    
+    try:
+        config = await websocket.receive_json()
+        if int(config.get("sample_rate", 16000)) != 16000:
+            await websocket.send_json({"type": "error", "detail": "Only 16 kHz mono int16 PCM is accepted"})
+            await websocket.close(code=1003)
+            return
+        session = LiveIngestSession(
+            display_name=config.get("display_name"),
+            match_threshold=float(config.get("match_threshold", 0.40)),
+            auto_update_threshold=float(config.get("auto_update_threshold", 0.50))
+        )
+        await send({"type": "ready", "conversation_id": session.conversation_id})
+        
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                schedule(session.feed(message["bytes"]))
+                if session.limit_reached:
+                    # Process what was recorded rather than dropping it
+                    await send({"type": "limit_reached", "max_seconds": LIVE_MAX_SECONDS})
+                    break
+            elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                break
+        
+        schedule(session.segmenter.flush())
+        if pending:
+            await asyncio.gather(*pending)
+        
+        await send({"type": "processing", "conversation_id": session.conversation_id})
+        result = await run_blocking(session.persist)
+        await send({
+            "type": "completed",
+            "conversation_id": result["conversation_id"],
+            "utterances": len(result["utterances"])
+        })
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        for task in pending:
+            task.cancel()
+        # Keep what was recorded: finish ingest in the background
+        if session and session.segmenter.duration_seconds >= 1:
+            job_id = submit_job("live_ingest", session.persist)
+            logger.info("Live session %s disconnected; persisting as job %s", session.conversation_id, job_id)
+    except Exception as e:
+        logger.exception("Error in live ingest: %s", e)
+        for task in pending:
+            task.cancel()
+        try:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
 # ============= ROUTES FOR PAGE 2: SPEAKER MANAGEMENT =============
 
 @app.get("/api/speakers")
-async def get_speakers():
+@offload
+def get_speakers():
     try:
-        print("Attempting to connect to database for speakers query...")
         # Connect to the database
         conn = get_db_connection()
         cur = conn.cursor()
         
-        print("Executing speakers query...")
         # Get all speakers with their utterance counts, total duration, and pinecone links
         cur.execute("""
             SELECT s.id, s.name, s.pinecone_speaker_name,
@@ -655,7 +1105,7 @@ async def get_speakers():
         """)
         
         speakers = cur.fetchall()
-        print(f"Found {len(speakers)} speakers")
+        logger.debug("Found %d speakers", len(speakers))
         
         # Format the response
         result = []
@@ -673,8 +1123,7 @@ async def get_speakers():
         return result
     
     except Exception as e:
-        print(f"Error getting speakers: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error getting speakers: %s", e)
         # Return a more detailed error response
         return JSONResponse(
             status_code=500,
@@ -685,7 +1134,8 @@ async def get_speakers():
         )
 
 @app.post("/api/speakers")
-async def add_speaker_endpoint(name: str = Form(...)):
+@offload
+def add_speaker_endpoint(name: str = Form(...)):
     try:
         # Connect to the database directly
         conn = get_db_connection()
@@ -707,7 +1157,7 @@ async def add_speaker_endpoint(name: str = Form(...)):
                 )
                 speaker_id = cur.fetchone()[0]
             except Exception as e:
-                print(f"First insert attempt failed: {e}")
+                logger.warning("First insert attempt failed: %s", e)
                 # If that fails, check table schema and try a different approach
                 try:
                     # Get column info
@@ -717,7 +1167,7 @@ async def add_speaker_endpoint(name: str = Form(...)):
                         WHERE table_name = 'speakers' AND column_name = 'id'
                     """)
                     column_info = cur.fetchone()
-                    print(f"ID column info: {column_info}")
+                    logger.debug("ID column info: %s", column_info)
                     
                     if column_info and column_info[1].lower() == 'uuid':
                         # If ID is UUID type, generate a UUID
@@ -738,7 +1188,7 @@ async def add_speaker_endpoint(name: str = Form(...)):
                         )
                         speaker_id = cur.fetchone()[0]
                 except Exception as inner_e:
-                    print(f"Second insert attempt failed: {inner_e}")
+                    logger.error("Second insert attempt failed: %s", inner_e)
                     raise HTTPException(
                         status_code=500,
                         detail=f"Could not create speaker: {str(inner_e)}"
@@ -756,12 +1206,12 @@ async def add_speaker_endpoint(name: str = Form(...)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error adding speaker: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error adding speaker: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/speakers/{speaker_id}")
-async def update_speaker(speaker_id: str, name: str = Form(...)):
+@offload
+def update_speaker(speaker_id: str, name: str = Form(...)):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -798,12 +1248,12 @@ async def update_speaker(speaker_id: str, name: str = Form(...)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating speaker: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error updating speaker: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/speakers/{speaker_id}/details")
-async def get_speaker_details(speaker_id: str):
+@offload
+def get_speaker_details(speaker_id: str):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -873,15 +1323,14 @@ async def get_speaker_details(speaker_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting speaker details: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error getting speaker details: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/utterances/{utterance_id}")
-async def update_utterance(utterance_id: str, request: Request):
+@offload
+def update_utterance(utterance_id: str, data: dict = Body(...)):
     try:
-        data = await request.json()
-        print(f"Received PUT request for utterance {utterance_id} with data: {data}")
+        logger.debug("Received PUT request for utterance %s with data: %s", utterance_id, data)
         
         # Check if we're updating speaker_id or text (or both)
         speaker_id = data.get("speaker_id")
@@ -919,7 +1368,7 @@ async def update_utterance(utterance_id: str, request: Request):
             WHERE id = %s
             RETURNING id, speaker_id, text, conversation_id
         """
-        print(f"Executing query: {query} with params: {params}")
+        logger.debug("Executing query: %s with params: %s", query, params)
         
         cur.execute(query, params)
         updated = cur.fetchone()
@@ -936,26 +1385,26 @@ async def update_utterance(utterance_id: str, request: Request):
             "conversation_id": updated[3]
         }
         
-        print(f"Update successful: {result}")
+        logger.debug("Update successful: %s", result)
         cur.close()
         conn.close()
         
         return result
     except Exception as e:
-        print(f"Error updating utterance: {str(e)}")
+        logger.exception("Error updating utterance: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/utterances/{utterance_id}/pinecone-inclusion")
-async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Request):
+@offload
+def toggle_utterance_pinecone_inclusion(utterance_id: str, data: dict = Body(...)):
     """Toggle whether an utterance is included in Pinecone voice profile"""
     try:
-        data = await request.json()
         include_in_pinecone = data.get("include_in_pinecone")
         
         if include_in_pinecone is None:
             raise HTTPException(status_code=400, detail="include_in_pinecone field is required")
         
-        print(f"Toggling Pinecone inclusion for utterance {utterance_id} to: {include_in_pinecone}")
+        logger.info("Toggling Pinecone inclusion for utterance %s to %s", utterance_id, include_in_pinecone)
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -989,8 +1438,6 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
         
         if include_in_pinecone:
             # Include in Pinecone - create embedding
-            print(f"Adding utterance {utterance_id} to Pinecone...")
-            
             # Get speaker name for Pinecone metadata
             cur.execute("SELECT name FROM speakers WHERE id = %s", (utterance[1],))
             speaker_row = cur.fetchone()
@@ -1002,7 +1449,6 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
             try:
                 # Generate embedding for this utterance
                 # Use direct S3 access instead of calling our own endpoint
-                import tempfile
                 import os
                 import uuid
                 
@@ -1045,7 +1491,7 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
                         except:
                             utterance_idx = 0
                     
-                    print(f"Using utterance index {utterance_idx} for S3 path construction")
+                    logger.debug("Using utterance index %s for S3 path construction", utterance_idx)
                     
                     # Use helper function with proper utterance index
                     s3_path = find_utterance_s3_path(conv_id_str, utterance_id, utterance_idx)
@@ -1053,20 +1499,14 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
                     if not s3_path:
                         raise HTTPException(status_code=404, detail="Audio file not found in storage")
                 
-                # Download directly from S3 using the path
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                    local_audio_path = tmp_file.name
-                
-                try:
-                    print(f"Downloading from S3 path: {s3_path}")
+                # Download directly from S3 into a scratch workspace private to this request
+                with Workspace("include") as workspace:
+                    local_audio_path = workspace.path(f"utterance{os.path.splitext(s3_path)[1] or '.wav'}")
+                    logger.debug("Downloading from S3 path %s", s3_path)
                     downloadFile(s3_path, local_audio_path)
                     
-                    # Generate embedding
-                    embedding = embed(local_audio_path)
-                    
-                finally:
-                    if os.path.exists(local_audio_path):
-                        os.remove(local_audio_path)
+                    # Embed like ingest does: speech frames only, long clips as pooled windows
+                    embedding = embed_audio(trim_silence(decode_audio(local_audio_path, memmap=False)))
                 
                 # Create unique embedding ID
                 embedding_id = f"utterance_{speaker_name.replace(' ', '_')}_{uuid.uuid4().hex[:8]}"
@@ -1086,8 +1526,8 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
                     else:
                         embedding_list = embedding
                     
-                    pinecone_index.upsert(vectors=[(embedding_id, embedding_list, metadata)])
-                    print(f"✅ Added embedding {embedding_id} to Pinecone for utterance {utterance_id}")
+                    upsert_vectors(pinecone_index, [(embedding_id, embedding_list, metadata)])
+                    logger.info("Added embedding %s to Pinecone for utterance %s", embedding_id, utterance_id)
                 else:
                     raise HTTPException(status_code=500, detail="Pinecone not initialized")
                 
@@ -1099,19 +1539,17 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
                 """, (True, embedding_id, utterance_id))
                 
             except Exception as e:
-                print(f"❌ Error creating Pinecone embedding: {str(e)}")
+                logger.exception("Error creating Pinecone embedding: %s", e)
                 raise HTTPException(status_code=500, detail=f"Failed to create Pinecone embedding: {str(e)}")
         
         else:
             # Remove from Pinecone
-            print(f"Removing utterance {utterance_id} from Pinecone...")
-            
             if current_embedding_id and pinecone_index:
                 try:
-                    pinecone_index.delete(ids=[current_embedding_id])
-                    print(f"✅ Removed embedding {current_embedding_id} from Pinecone")
+                    delete_vector_ids(pinecone_index, [current_embedding_id])
+                    logger.info("Removed embedding %s from Pinecone", current_embedding_id)
                 except Exception as e:
-                    print(f"⚠️ Warning: Failed to remove embedding from Pinecone: {str(e)}")
+                    logger.warning("Failed to remove embedding from Pinecone: %s", e)
                     # Continue anyway to update database
             
             # Update database
@@ -1140,12 +1578,12 @@ async def toggle_utterance_pinecone_inclusion(utterance_id: str, request: Reques
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error toggling utterance Pinecone inclusion: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error toggling utterance Pinecone inclusion: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/speakers/{from_speaker_id}/update-all-utterances")
-async def update_all_utterances(from_speaker_id: str, to_speaker_id: str = Form(...)):
+@offload
+def update_all_utterances(from_speaker_id: str, to_speaker_id: str = Form(...)):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -1199,12 +1637,12 @@ async def update_all_utterances(from_speaker_id: str, to_speaker_id: str = Form(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating utterances: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error updating utterances: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/speakers/{speaker_id}")
-async def delete_speaker(speaker_id: str):
+@offload
+def delete_speaker(speaker_id: str):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -1254,12 +1692,12 @@ async def delete_speaker(speaker_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting speaker: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error deleting speaker: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/conversations/{conversation_id}")
-async def update_conversation(
+@offload
+def update_conversation(
     conversation_id: str, 
     display_name: str = Form(...)
 ):
@@ -1290,7 +1728,7 @@ async def update_conversation(
             """)
             display_name_exists = cur.fetchone() is not None
         except Exception as e:
-            print(f"Error checking for display_name column: {e}")
+            logger.error("Error checking for display_name column: %s", e)
             display_name_exists = False
         
         # Update the conversation
@@ -1311,7 +1749,7 @@ async def update_conversation(
                     UPDATE conversations SET display_name = %s WHERE id = %s
                 """, (display_name, conversation_id))
             except Exception as e:
-                print(f"Error adding display_name column: {e}")
+                logger.error("Error adding display_name column: %s", e)
                 raise HTTPException(
                     status_code=500,
                     detail=f"Could not update conversation name: {str(e)}"
@@ -1330,12 +1768,12 @@ async def update_conversation(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating conversation: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error updating conversation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/conversations/{conversation_id}")
-async def delete_conversation(conversation_id: str):
+@offload
+def delete_conversation(conversation_id: str):
     try:
         # Connect to the database
         conn = get_db_connection()
@@ -1361,11 +1799,11 @@ async def delete_conversation(conversation_id: str):
         from modules.database.s3_operations import s3_client, BUCKET_NAME
         prefix = f"conversations/{conv_id_str}/"
         
-        print(f"Listing S3 objects with prefix: {prefix}")
+        logger.debug("Listing S3 objects with prefix %s", prefix)
         resp = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
         keys = [obj["Key"] for obj in resp.get("Contents", [])]
         
-        print(f"Found {len(keys)} S3 objects to delete")
+        logger.info("Found %d S3 objects to delete", len(keys))
         
         # Step 2: Delete them from S3
         deleted_s3_count = 0
@@ -1377,7 +1815,7 @@ async def delete_conversation(conversation_id: str):
             # Log any errors
             if "Errors" in delete_result and delete_result["Errors"]:
                 for error in delete_result["Errors"]:
-                    print(f"Error deleting S3 object {error['Key']}: {error['Code']} - {error['Message']}")
+                    logger.error("Error deleting S3 object %s: %s - %s", error['Key'], error['Code'], error['Message'])
         
         # Step 3: Delete Pinecone embeddings for this conversation's utterances
         deleted_pinecone_count = 0
@@ -1391,11 +1829,11 @@ async def delete_conversation(conversation_id: str):
                 embedding_ids = [row[0] for row in cur.fetchall() if row[0]]
                 
                 if embedding_ids:
-                    pinecone_index.delete(ids=embedding_ids)
+                    delete_vector_ids(pinecone_index, embedding_ids)
                     deleted_pinecone_count = len(embedding_ids)
-                    print(f"Deleted {deleted_pinecone_count} embeddings from Pinecone")
+                    logger.info("Deleted %d embeddings from Pinecone", deleted_pinecone_count)
             except Exception as e:
-                print(f"Warning: Failed to delete Pinecone embeddings: {str(e)}")
+                logger.warning("Failed to delete Pinecone embeddings: %s", e)
                 # Continue with database deletion even if Pinecone cleanup fails
         
         # Step 4: Delete from database (in correct order to avoid foreign key constraints)
@@ -1443,17 +1881,16 @@ async def delete_conversation(conversation_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting conversation: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error deleting conversation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============= SPEAKER-PINECONE LINKING ENDPOINTS =============
 
 @app.put("/api/speakers/{speaker_id}/link-pinecone")
-async def link_speaker_to_pinecone(speaker_id: str, request: Request):
+@offload
+def link_speaker_to_pinecone(speaker_id: str, data: dict = Body(...)):
     """Link a database speaker to an existing Pinecone speaker"""
     try:
-        data = await request.json()
         pinecone_speaker_name = data.get("pinecone_speaker_name")
         
         if not pinecone_speaker_name:
@@ -1500,12 +1937,12 @@ async def link_speaker_to_pinecone(speaker_id: str, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error linking speaker to Pinecone: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error linking speaker to Pinecone: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/speakers/{speaker_id}/unlink-pinecone")
-async def unlink_speaker_from_pinecone(speaker_id: str):
+@offload
+def unlink_speaker_from_pinecone(speaker_id: str):
     """Remove the link between a database speaker and Pinecone speaker"""
     try:
         # Connect to database
@@ -1548,48 +1985,36 @@ async def unlink_speaker_from_pinecone(speaker_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error unlinking speaker from Pinecone: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error unlinking speaker from Pinecone: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============= ROUTES FOR PAGE 3: PINECONE MANAGEMENT =============
 
 @app.get("/api/pinecone/speakers", response_model=SpeakerResponse)
-async def get_pinecone_speakers():
+@offload
+def get_pinecone_speakers(refresh: bool = False):
     """Get all speakers and their embeddings"""
     try:
         if not pinecone_index:
             raise HTTPException(status_code=500, detail="Pinecone not initialized")
             
-        # Query with dummy vector to get all vectors
-        results = pinecone_index.query(
-            vector=[0.0] * 192,  # Dummy vector for metadata-only search
-            top_k=10000,  # Large number to get all
-            include_metadata=True
-        )
-        
-        # Group by speaker name
-        speakers = {}
-        for match in results['matches']:
-            if 'metadata' in match and 'speaker_name' in match['metadata']:
-                speaker_name = match['metadata']['speaker_name']
-                if speaker_name not in speakers:
-                    speakers[speaker_name] = {
-                        'name': speaker_name,
-                        'embeddings': []
-                    }
-                speakers[speaker_name]['embeddings'].append({
-                    'id': match['id']
-                })
-        
-        return {"speakers": list(speakers.values())}
+        # Speaker -> vector IDs from the gallery cache (reloaded after it expires or with refresh)
+        speakers = get_gallery(pinecone_index, refresh=refresh)
+        
+        # Built directly rather than validated against SpeakerResponse, which is slow for large galleries
+        return JSONResponse(content={"speakers": [
+            {"name": speaker_name, "embeddings": [{"id": embedding_id} for embedding_id in embedding_ids]}
+            for speaker_name, embedding_ids in sorted(speakers.items())
+        ]})
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error getting speakers: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error getting speakers: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/pinecone/speakers", response_model=EmbeddingResponse, status_code=201)
-async def add_pinecone_speaker(
+@offload
+def add_pinecone_speaker(
     speaker_name: str = Form(...),
     audio_file: UploadFile = File(...)
 ):
@@ -1605,47 +2030,40 @@ async def add_pinecone_speaker(
                 detail=f"Speaker '{speaker_name}' already exists in the database"
             )
         
-        # Save the uploaded file temporarily
+        # Save the uploaded file in a scratch workspace private to this request
         file_extension = os.path.splitext(audio_file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
-            content = await audio_file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        try:
-            # Convert to WAV if needed
-            wav_file = convert_to_wav(tmp_path)
+        with Workspace("enroll") as workspace:
+            # Uploads can be up to the size limit, so they go on disk rather than tmpfs
+            tmp_path = workspace.disk_path(f"sample{file_extension}")
             
-            # Generate embedding
-            embedding = embed(wav_file)
+            # Copy the spooled upload into the workspace, enforcing the size limit
+            save_upload(audio_file, tmp_path)
+            
+            # Decode to the canonical format and embed straight from memory
+            embedding = embed(to_wav_bytes(decode_audio(tmp_path, memmap=False)))
             
             # Create unique ID and metadata
             unique_id = f"speaker_{speaker_name}_{uuid.uuid4().hex[:8]}"
             metadata = {"speaker_name": speaker_name}
             
             # Add to database
-            pinecone_index.upsert(vectors=[(unique_id, embedding, metadata)])
+            upsert_vectors(pinecone_index, [(unique_id, embedding, metadata)])
             
             return {
                 'success': True,
                 'speaker_name': speaker_name,
                 'embedding_id': unique_id
             }
-        finally:
-            # Clean up temporary files
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            if wav_file != tmp_path and os.path.exists(wav_file):
-                os.remove(wav_file)
     
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error in add_pinecone_speaker: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/pinecone/embeddings", response_model=EmbeddingResponse, status_code=201)
-async def add_pinecone_embedding(
+@offload
+def add_pinecone_embedding(
     speaker_name: str = Form(...),
     audio_file: UploadFile = File(...)
 ):
@@ -1661,110 +2079,124 @@ async def add_pinecone_embedding(
                 detail=f"Speaker '{speaker_name}' does not exist in the database"
             )
         
-        # Save the uploaded file temporarily
+        # Save the uploaded file in a scratch workspace private to this request
         file_extension = os.path.splitext(audio_file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
-            content = await audio_file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        try:
-            # Convert to WAV if needed
-            wav_file = convert_to_wav(tmp_path)
+        with Workspace("enroll") as workspace:
+            # Uploads can be up to the size limit, so they go on disk rather than tmpfs
+            tmp_path = workspace.disk_path(f"sample{file_extension}")
             
-            # Generate embedding
-            embedding = embed(wav_file)
+            # Copy the spooled upload into the workspace, enforcing the size limit
+            save_upload(audio_file, tmp_path)
+            
+            # Decode to the canonical format and embed straight from memory
+            embedding = embed(to_wav_bytes(decode_audio(tmp_path, memmap=False)))
             
             # Create unique ID and metadata
             unique_id = f"speaker_{speaker_name}_{uuid.uuid4().hex[:8]}"
             metadata = {"speaker_name": speaker_name}
             
             # Add to database
-            pinecone_index.upsert(vectors=[(unique_id, embedding, metadata)])
+            upsert_vectors(pinecone_index, [(unique_id, embedding, metadata)])
             
             return {
                 'success': True,
                 'speaker_name': speaker_name,
                 'embedding_id': unique_id
             }
-        finally:
-            # Clean up temporary files
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            if wav_file != tmp_path and os.path.exists(wav_file):
-                os.remove(wav_file)
     
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error in add_pinecone_embedding: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/api/pinecone/speakers/{speaker_name}", response_model=DeleteResponse)
-async def delete_pinecone_speaker(speaker_name: str):
-    """Delete all embeddings for a speaker"""
+@app.delete("/api/pinecone/speakers/{speaker_name}", response_model=DeleteResponse, status_code=202)
+@offload
+def delete_pinecone_speaker(speaker_name: str):
+    """Delete all embeddings for a speaker as a background job"""
     try:
         if not pinecone_index:
             raise HTTPException(status_code=500, detail="Pinecone not initialized")
             
-        results = pinecone_index.query(
-            vector=[0.0] * 192,  # Dummy vector for metadata-only search
-            top_k=1000,  # Increase if needed
-            include_metadata=True,
-            filter={"speaker_name": {"$eq": speaker_name}}
-        )
-        
-        if not results['matches']:
+        if not check_speaker_exists(speaker_name):
             raise HTTPException(
                 status_code=404,
                 detail=f"No embeddings found for speaker: {speaker_name}"
             )
         
-        for match in results['matches']:
-            pinecone_index.delete(ids=[match['id']])
+        # List IDs page by page and delete in batches; poll /api/jobs/{job_id} for progress
+        job_id = submit_job("delete_pinecone_speaker", delete_speaker_vectors, pinecone_index, speaker_name)
         
-        count = len(results['matches'])
         return {
             'success': True,
             'speaker_name': speaker_name,
-            'embeddings_deleted': count
+            'job_id': job_id,
+            'status': "queued"
         }
     
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error in delete_pinecone_speaker: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/pinecone/speakers/{speaker_name}/compact", response_model=CompactResponse)
+@offload
+def compact_pinecone_speaker(
+    speaker_name: str,
+    max_exemplars: int = Form(50),
+    dry_run: bool = Form(False)
+):
+    """Cap a speaker's exemplars to a diverse subset and delete the rest"""
+    try:
+        if not pinecone_index:
+            raise HTTPException(status_code=500, detail="Pinecone not initialized")
+
+        if max_exemplars < 1:
+            raise HTTPException(status_code=400, detail="max_exemplars must be at least 1")
+
+        report = compact_speaker(pinecone_index, speaker_name, max_exemplars, dry_run)
+
+        if report['before'] == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No embeddings found for speaker: {speaker_name}"
+            )
+
+        return report
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in compact_pinecone_speaker: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/pinecone/embeddings/{embedding_id}", response_model=DeleteResponse)
-async def delete_pinecone_embedding(embedding_id: str):
+@offload
+def delete_pinecone_embedding(embedding_id: str):
     """Delete a specific embedding by ID"""
     try:
         if not pinecone_index:
             raise HTTPException(status_code=500, detail="Pinecone not initialized")
             
-        print(f"Attempting to delete embedding with ID: {embedding_id}")
+        logger.info("Deleting embedding %s", embedding_id)
         
         # First verify the embedding exists
-        results = pinecone_index.fetch(ids=[embedding_id])
+        found = list(fetch_vectors(pinecone_index, [embedding_id]))
         
-        # Debug print
-        print(f"Fetch results: {results}")
-        
-        if not hasattr(results, 'vectors') or embedding_id not in results.vectors:
-            print(f"No embedding found with ID: {embedding_id}")
+        if not found:
+            logger.info("No embedding found with ID %s", embedding_id)
             raise HTTPException(
                 status_code=404,
                 detail=f"No embedding found with ID: {embedding_id}"
             )
         
         # Get the speaker name for the response
-        speaker_name = results.vectors[embedding_id].metadata['speaker_name']
-        print(f"Found embedding for speaker: {speaker_name}")
+        speaker_name = found[0][2].get('speaker_name')
+        logger.debug("Found embedding for speaker %s", speaker_name)
         
         # Delete the embedding
-        delete_result = pinecone_index.delete(ids=[embedding_id])
-        print(f"Delete result: {delete_result}")
+        delete_vector_ids(pinecone_index, [embedding_id])
         
         return {
             'success': True,
@@ -1776,10 +2208,41 @@ async def delete_pinecone_embedding(embedding_id: str):
         raise
     except Exception as e:
         error_message = str(e)
-        print(f"Error deleting embedding: {error_message}")
-        traceback.print_exc()
+        logger.exception("Error in delete_pinecone_embedding: %s", e)
         raise HTTPException(status_code=500, detail=error_message)
 
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status and progress of a background job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+def require_admin(admin_key):
+    if not is_admin(admin_key):
+        raise HTTPException(status_code=403, detail="A valid X-Admin-Key header is required")
+
+@app.get("/api/profiles")
+async def get_profiles(x_admin_key: Optional[str] = Header(None)):
+    """List saved request and job profiles, newest first"""
+    require_admin(x_admin_key)
+    return {"profiles": await run_blocking(list_profiles)}
+
+@app.get("/api/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "prof", sort: str = "cumulative", x_admin_key: Optional[str] = Header(None)):
+    """Download a profile as a pstats file, or as a text report with format=text"""
+    require_admin(x_admin_key)
+    path = profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    if format == "text":
+        if sort not in ("cumulative", "tottime", "ncalls"):
+            raise HTTPException(status_code=400, detail="sort must be cumulative, tottime or ncalls")
+        # Loading and formatting a large profile takes a while; keep it off the event loop
+        return Response(await run_blocking(profile_text, path, sort), media_type="text/plain")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the Speaker ID API.
+
+Fires requests at one endpoint from many threads and reports throughput and
+latency percentiles, to check that slow blocking calls in one request do not
+stall the others.
+
+Usage:
+    python load_test.py --url http://localhost:8000 --path /api/speakers --concurrency 20 --requests 200
+"""
+
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def timed_request(session, url):
+    """Issue one GET and return (status_code, seconds)"""
+    start = time.perf_counter()
+    try:
+        status = session.get(url, timeout=120).status_code
+    except requests.RequestException:
+        status = None
+    return status, time.perf_counter() - start
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def run_load_test(base_url, path, concurrency, total_requests):
+    url = base_url.rstrip('/') + path
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    print(f"Sending {total_requests} requests to {url} with concurrency {concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: timed_request(session, url), range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for _, seconds in results]
+    errors = sum(1 for status, _ in results if status is None or status >= 500)
+
+    print(f"Completed in {elapsed:.2f}s: {total_requests / elapsed:.1f} requests/s, {errors} errors")
+    print(f"Latency mean {statistics.mean(latencies) * 1000:.0f}ms, "
+          f"p50 {percentile(latencies, 50) * 1000:.0f}ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.0f}ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.0f}ms")
+    return elapsed, latencies, errors
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Speaker ID API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/speakers")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    run_load_test(args.url, args.path, args.concurrency, args.requests)
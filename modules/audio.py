@@ -0,0 +1,283 @@
+"""
+Audio decoding for the ingest pipeline.
+Each upload is decoded exactly once, by streaming ffmpeg's output in fixed-size
+chunks, into a canonical PCM buffer (16 kHz, mono, 16-bit) that utterance
+slicing, embedding and utterance storage all share. The original upload is left
+untouched for storage and transcription.
+
+Uploads whose decoded PCM (probed duration x 16 kHz x 2 bytes) is at least
+AUDIO_MEMMAP_MIN_MB, and any decode that turns out to grow past it, are streamed through ffmpeg into a WAV file on disk and accessed
+with np.memmap, so slicing an utterance only touches
+the pages it needs and memory stays flat for multi-hour recordings.
+
+Stored audio is compressed: utterances are cut from the original upload at its
+own sample rate and kept as FLAC (lossless, so they can be decoded back for
+embedding) plus a small Opus copy for browser playback.
+"""
+
+import io
+import os
+import wave
+import itertools
+import tempfile
+import subprocess
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import get_prober_name
+
+CANONICAL_SAMPLE_RATE = 16000
+CANONICAL_CHANNELS = 1
+CANONICAL_SAMPLE_WIDTH = 2  # bytes, i.e. int16
+AUDIO_MEMMAP_MIN_BYTES = int(float(os.getenv("AUDIO_MEMMAP_MIN_MB", "64")) * 1024 * 1024)
+DECODE_CHUNK_BYTES = 1024 * 1024
+# Tail of ffmpeg's error output quoted when a decode fails
+DECODE_ERROR_BYTES = 4096
+
+# Storage formats: name -> (file extension, content type, ffmpeg output arguments)
+AUDIO_FORMATS = {
+    "wav": (".wav", "audio/wav", ["-f", "wav"]),
+    "flac": (".flac", "audio/flac", ["-c:a", "flac", "-f", "flac"]),
+    "opus": (".opus", "audio/ogg", ["-c:a", "libopus", "-b:a", os.getenv("OPUS_BITRATE", "24k"), "-f", "ogg"]),
+}
+# Lossless format used for stored utterances; "wav" keeps the old uncompressed layout
+AUDIO_STORAGE_FORMAT = os.getenv("AUDIO_STORAGE_FORMAT", "flac")
+# Extra compressed copy served for playback; empty to disable
+AUDIO_PLAYBACK_FORMAT = os.getenv("AUDIO_PLAYBACK_FORMAT", "opus")
+# Source formats that are stored losslessly compressed instead of as uploaded
+UNCOMPRESSED_EXTENSIONS = (".wav", ".wave", ".aif", ".aiff")
+
+class PCMBuffer:
+    """Mono int16 PCM audio backed by a NumPy array.
+
+    Indexing with a millisecond slice (buffer[start_ms:end_ms]) returns a view
+    that shares memory with the parent buffer, and len() is the duration in
+    milliseconds, matching pydub's AudioSegment conventions.
+    """
+
+    def __init__(self, samples, sample_rate=CANONICAL_SAMPLE_RATE, path=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        # WAV file backing a memory-mapped buffer, removed by close()
+        self.path = path
+
+    def __len__(self):
+        return int(round(len(self.samples) * 1000 / self.sample_rate))
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError("PCMBuffer only supports [start_ms:end_ms] slicing")
+        start = 0 if key.start is None else self._ms_to_sample(key.start)
+        stop = len(self.samples) if key.stop is None else self._ms_to_sample(key.stop)
+        return PCMBuffer(self.samples[start:stop], self.sample_rate)
+
+    def _ms_to_sample(self, ms):
+        return min(max(int(ms * self.sample_rate // 1000), 0), len(self.samples))
+
+    @property
+    def duration_seconds(self):
+        return len(self.samples) / self.sample_rate
+
+    @classmethod
+    def concatenate(cls, buffers, sample_rate=CANONICAL_SAMPLE_RATE):
+        """Join buffers into one preallocated array (a single copy per input)"""
+        buffers = list(buffers)
+        out = np.empty(sum(len(b.samples) for b in buffers), dtype=np.int16)
+        position = 0
+        for buffer in buffers:
+            out[position:position + len(buffer.samples)] = buffer.samples
+            position += len(buffer.samples)
+        return cls(out, buffers[0].sample_rate if buffers else sample_rate)
+
+    def close(self):
+        """Release the backing file of a memory-mapped buffer"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+def iter_pcm_chunks(file_path, chunk_bytes=DECODE_CHUNK_BYTES):
+    """Yield canonical PCM bytes from ffmpeg in fixed-size chunks as they are decoded"""
+    command = [
+        AudioSegment.converter, "-nostdin", "-v", "error", "-i", file_path,
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", str(CANONICAL_CHANNELS), "-ar", str(CANONICAL_SAMPLE_RATE), "-"
+    ]
+    # Errors go to a file: a full stderr pipe nobody reads would block ffmpeg (and the job) on a noisy input
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            for chunk in iter(lambda: process.stdout.read(chunk_bytes), b""):
+                yield chunk
+            if process.wait() != 0:
+                stderr.seek(max(0, stderr.tell() - DECODE_ERROR_BYTES))
+                message = stderr.read().decode(errors="replace").strip()
+                raise RuntimeError(f"ffmpeg failed to decode {file_path}: {message}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+def probe_duration_seconds(file_path):
+    """Duration of a media file according to ffprobe, or None if it cannot tell"""
+    command = [
+        get_prober_name(), "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", file_path
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=30, check=True)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+def decoded_size_bytes(file_path):
+    """Expected size of a file's canonical PCM, falling back to the file size if it cannot be probed"""
+    duration = probe_duration_seconds(file_path)
+    if duration is None:
+        return os.path.getsize(file_path)
+    return int(duration * CANONICAL_SAMPLE_RATE) * CANONICAL_CHANNELS * CANONICAL_SAMPLE_WIDTH
+
+def decode_audio(file_path, memmap=None, workdir=None):
+    """Decode any ffmpeg-supported file into a canonical 16 kHz mono int16 PCMBuffer.
+
+    memmap=None picks the memory-mapped mode for inputs that decode to at least
+    AUDIO_MEMMAP_MIN_MB of PCM, and also moves a decode held in memory to a
+    memory-mapped file once its PCM outgrows AUDIO_MEMMAP_MIN_MB.
+    """
+    spill = memmap is None
+    if memmap is None:
+        # Compressed inputs decode to many times their size, so judge by the decoded size
+        memmap = decoded_size_bytes(file_path) >= AUDIO_MEMMAP_MIN_BYTES
+    chunks = iter_pcm_chunks(file_path)
+    try:
+        if memmap:
+            return _memmap_pcm(chunks, workdir)
+
+        pcm = bytearray()
+        for chunk in chunks:
+            pcm += chunk
+            if spill and len(pcm) >= AUDIO_MEMMAP_MIN_BYTES:
+                return _memmap_pcm(itertools.chain([pcm], chunks), workdir)
+        # frombuffer wraps the bytearray without copying it
+        return PCMBuffer(np.frombuffer(pcm, dtype=np.int16), CANONICAL_SAMPLE_RATE)
+    finally:
+        # Stops ffmpeg if decoding ended early
+        chunks.close()
+
+def decode_to_memmap(file_path, workdir=None):
+    """Stream-decode a file into a temporary WAV file and memory-map its samples"""
+    chunks = iter_pcm_chunks(file_path)
+    try:
+        return _memmap_pcm(chunks, workdir)
+    finally:
+        chunks.close()
+
+def _memmap_pcm(chunks, workdir=None):
+    """Write PCM chunks to a temporary WAV file and memory-map its samples"""
+    fd, wav_path = tempfile.mkstemp(suffix=".wav", dir=workdir)
+    os.close(fd)
+    try:
+        with wave.open(wav_path, "wb") as wav:
+            wav.setnchannels(CANONICAL_CHANNELS)
+            wav.setsampwidth(CANONICAL_SAMPLE_WIDTH)
+            wav.setframerate(CANONICAL_SAMPLE_RATE)
+            for chunk in chunks:
+                wav.writeframesraw(chunk)
+
+        with wave.open(wav_path, "rb") as wav:
+            frame_count = wav.getnframes()
+        if frame_count == 0:
+            samples = np.zeros(0, dtype=np.int16)
+        else:
+            header_bytes = os.path.getsize(wav_path) - frame_count * CANONICAL_SAMPLE_WIDTH
+            samples = np.memmap(wav_path, dtype="<i2", mode="r", offset=header_bytes, shape=(frame_count,))
+        return PCMBuffer(samples, CANONICAL_SAMPLE_RATE, path=wav_path)
+    except Exception:
+        if os.path.exists(wav_path):
+            os.remove(wav_path)
+        raise
+
+def write_wav(audio, fileobj):
+    """Write a PCMBuffer to a binary file object as a WAV file"""
+    with wave.open(fileobj, "wb") as wav:
+        wav.setnchannels(CANONICAL_CHANNELS)
+        wav.setsampwidth(CANONICAL_SAMPLE_WIDTH)
+        wav.setframerate(audio.sample_rate)
+        wav.writeframes(np.ascontiguousarray(audio.samples, dtype="<i2").data)
+
+def to_wav_bytes(audio):
+    """Serialize a PCMBuffer as an in-memory WAV file"""
+    buffer = io.BytesIO()
+    write_wav(audio, buffer)
+    return buffer.getvalue()
+
+def storage_formats():
+    """Formats each stored clip is written in: the lossless copy first, then the playback copy"""
+    formats = [AUDIO_STORAGE_FORMAT]
+    if AUDIO_PLAYBACK_FORMAT and AUDIO_PLAYBACK_FORMAT != AUDIO_STORAGE_FORMAT:
+        formats.append(AUDIO_PLAYBACK_FORMAT)
+    return formats
+
+def with_format(path, audio_format):
+    """Swap a path's extension for the given format's"""
+    return os.path.splitext(path)[0] + AUDIO_FORMATS[audio_format][0]
+
+def content_type(audio_format):
+    return AUDIO_FORMATS[audio_format][1]
+
+# Media types a client may list in Accept to ask for a format, besides its content type
+ACCEPT_ALIASES = {"opus": ("audio/opus",)}
+
+def parse_accept(accept):
+    """{media range: q} from an Accept header (parameters other than q are ignored)"""
+    ranges = {}
+    for part in (accept or "").split(","):
+        media, *params = [piece.strip() for piece in part.split(";")]
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges[media.lower()] = q
+    return ranges
+
+def accepts_explicitly(accept, audio_format):
+    """True if the Accept header names the format's media type with q > 0; wildcards such as */* do not count"""
+    ranges = parse_accept(accept)
+    media_types = (content_type(audio_format), *ACCEPT_ALIASES.get(audio_format, ()))
+    return any(ranges.get(media, 0) > 0 for media in media_types)
+
+def format_of(path):
+    """Storage format of a path from its extension, or None if unknown"""
+    extension = os.path.splitext(path)[1].lower()
+    for name, (format_extension, _, _) in AUDIO_FORMATS.items():
+        if extension == format_extension:
+            return name
+    return None
+
+def _run_ffmpeg(input_args, audio_format, input_bytes=None, output="-"):
+    command = [AudioSegment.converter, "-nostdin", "-v", "error", "-y", *input_args, *AUDIO_FORMATS[audio_format][2], output]
+    result = subprocess.run(command, input=input_bytes, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {audio_format}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+def encode_audio(audio, audio_format):
+    """Encode a PCMBuffer in a storage format and return the bytes"""
+    if audio_format == "wav":
+        return to_wav_bytes(audio)
+    input_args = ["-f", "s16le", "-ar", str(audio.sample_rate), "-ac", str(CANONICAL_CHANNELS), "-i", "-"]
+    return _run_ffmpeg(input_args, audio_format, np.ascontiguousarray(audio.samples, dtype="<i2").tobytes())
+
+def encode_clip(file_path, start_ms, end_ms, audio_format):
+    """Encode a span of an audio file in a storage format, keeping its sample rate and channels"""
+    input_args = ["-ss", f"{start_ms / 1000:.3f}", "-t", f"{(end_ms - start_ms) / 1000:.3f}", "-i", file_path]
+    return _run_ffmpeg(input_args, audio_format)
+
+def encode_file(file_path, audio_format, dest_path):
+    """Re-encode an audio file into dest_path, keeping its sample rate and channels"""
+    _run_ffmpeg(["-i", file_path], audio_format, output=dest_path)
@@ -8,19 +8,25 @@ import numpy as np
 import uuid
 from datetime import datetime
 from pinecone import Pinecone
+from modules.pinecone_gallery import upsert_vectors
+from modules.log import get_logger, SAMPLED
+from modules.metrics import track_call
+
+logger = get_logger(__name__)
 
 def is_duplicate(embedding_np, index, similarity_threshold=0.92):
     """Check if an embedding is too similar to existing ones in Pinecone"""
     # Query Pinecone for similar embeddings
-    results = index.query(
-        vector=embedding_np.tolist(),
-        top_k=5,
-        include_metadata=True
-    )
+    with track_call("vector", "query", top_k=5):
+        results = index.query(
+            vector=embedding_np.tolist(),
+            top_k=5,
+            include_metadata=True
+        )
     
     # Check if any match exceeds the similarity threshold
     if results["matches"] and results["matches"][0]["score"] >= similarity_threshold:
-        print(f"  Found similar embedding: {results['matches'][0]['id']} (similarity: {results['matches'][0]['score']:.4f})")
+        logger.debug("Found similar embedding %s (similarity %.4f)", results['matches'][0]['id'], results['matches'][0]['score'])
         return True
     
     return False
@@ -30,7 +36,7 @@ def auto_update_embedding(embedding_np, speaker_name, audio_source, index, confi
     
     # Skip if confidence below threshold
     if confidence < threshold:
-        print(f"  Skipping auto-update: confidence {confidence:.4f} below threshold {threshold:.4f}")
+        logger.debug("Skipping auto-update: confidence %.4f below threshold %.4f", confidence, threshold)
         return False
     
     # Generate a unique ID for this embedding
@@ -46,7 +52,85 @@ def auto_update_embedding(embedding_np, speaker_name, audio_source, index, confi
     }
     
     # Add to Pinecone
-    print(f"  ✅ Auto-updating speaker database: {speaker_name} (confidence: {confidence:.4f})")
-    index.upsert(vectors=[(embedding_id, embedding_np.tolist(), metadata)])
+    logger.info("Auto-updating speaker database: %s (confidence %.4f)", speaker_name, confidence)
+    upsert_vectors(index, [(embedding_id, embedding_np.tolist(), metadata)])
     
     return True
+
+class AutoUpdateBuffer:
+    """Collect auto-update candidates for one conversation and write them in one batch"""
+
+    def __init__(self, index, threshold, similarity_threshold=0.92):
+        self.index = index
+        self.threshold = threshold
+        self.similarity_threshold = similarity_threshold
+        self.candidates = []
+
+    def add(self, embedding_np, speaker_name, audio_source, confidence, gallery_score=None):
+        """Queue a candidate; gallery_score is its best similarity to the existing gallery"""
+        if confidence < self.threshold:
+            logger.debug("Skipping auto-update: confidence %.4f below threshold %.4f", confidence, self.threshold)
+            return False
+
+        self.candidates.append({
+            "embedding": np.asarray(embedding_np, dtype=np.float32).reshape(-1),
+            "speaker_name": speaker_name,
+            "audio_source": audio_source,
+            "confidence": float(confidence),
+            "gallery_score": gallery_score
+        })
+        return True
+
+    def _deduplicate(self):
+        """Drop candidates too similar to the gallery or to a higher-confidence candidate of the same speaker"""
+        candidates = []
+        for candidate in self.candidates:
+            gallery_score = candidate["gallery_score"]
+            if gallery_score is None:
+                duplicate = is_duplicate(candidate["embedding"], self.index, self.similarity_threshold)
+            else:
+                duplicate = gallery_score >= self.similarity_threshold
+            if not duplicate:
+                candidates.append(candidate)
+
+        if not candidates:
+            return []
+
+        # Pairwise cosine similarity between all remaining candidates in one pass
+        candidates.sort(key=lambda c: c["confidence"], reverse=True)
+        embeddings = np.stack([c["embedding"] for c in candidates])
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        similarity = embeddings @ embeddings.T
+
+        # Similar-sounding speakers must not suppress each other's updates, so
+        # each candidate is only compared with those kept for its own speaker
+        kept_by_speaker = {}
+        for i, candidate in enumerate(candidates):
+            kept = kept_by_speaker.setdefault(candidate["speaker_name"], [])
+            if not kept or similarity[i, kept].max() < self.similarity_threshold:
+                kept.append(i)
+        return [candidates[i] for i in sorted(i for kept in kept_by_speaker.values() for i in kept)]
+
+    def flush(self):
+        """Deduplicate queued candidates and upsert the survivors; returns the number written"""
+        candidates = self._deduplicate()
+        skipped = len(self.candidates) - len(candidates)
+        self.candidates = []
+
+        vectors = []
+        for candidate in candidates:
+            speaker_name = candidate["speaker_name"]
+            embedding_id = f"speaker_{speaker_name.replace(' ', '_')}_{uuid.uuid4().hex[:8]}"
+            metadata = {
+                "speaker_name": speaker_name,
+                "source_file": candidate["audio_source"],
+                "timestamp": datetime.now().isoformat(),
+                "confidence": candidate["confidence"],
+                "auto_updated": True
+            }
+            vectors.append((embedding_id, candidate["embedding"].tolist(), metadata))
+
+        upsert_vectors(self.index, vectors)
+
+        logger.info("Auto-updated speaker database with %d embedding(s) (%d duplicate(s) skipped)", len(vectors), skipped)
+        return len(vectors)
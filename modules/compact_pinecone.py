@@ -0,0 +1,129 @@
+"""
+Gallery compaction for the Pinecone speaker database.
+Caps the number of exemplars kept per speaker by keeping a diverse subset
+(farthest-point sampling under cosine distance) and deleting the rest in bulk.
+
+Usage:
+    python -m modules.compact_pinecone --max-exemplars 50 [--speaker NAME] [--dry-run]
+"""
+
+import os
+import argparse
+import numpy as np
+from modules.pinecone_gallery import (
+    fetch_speaker_vectors, fetch_vectors, list_vector_ids, delete_vector_ids
+)
+from modules.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_EXEMPLARS = 50
+
+def is_protected(metadata):
+    """Manually enrolled or manually included vectors are never compacted away"""
+    return not metadata.get("auto_updated", False)
+
+def farthest_point_sample(embeddings, k, seed_indices=()):
+    """Pick up to k row indices that are spread out under cosine distance.
+
+    Seed indices are always kept. Without seeds, sampling starts from the
+    exemplar closest to the speaker centroid so the most typical sample survives.
+    """
+    n = len(embeddings)
+    if n <= k:
+        return list(range(n))
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.maximum(norms, 1e-12)
+
+    selected = list(seed_indices)
+    if not selected:
+        centroid = normalized.mean(axis=0)
+        selected = [int(np.argmax(normalized @ centroid))]
+
+    # Distance from every exemplar to its nearest selected exemplar
+    min_distance = np.min(1.0 - normalized @ normalized[selected].T, axis=1)
+    min_distance[selected] = -np.inf
+
+    while len(selected) < k:
+        next_index = int(np.argmax(min_distance))
+        selected.append(next_index)
+        min_distance = np.minimum(min_distance, 1.0 - normalized @ normalized[next_index])
+        min_distance[selected] = -np.inf
+
+    return selected
+
+def plan_compaction(vectors, max_exemplars=DEFAULT_MAX_EXEMPLARS):
+    """Return (keep_ids, delete_ids) for one speaker's (id, values, metadata) vectors"""
+    if len(vectors) <= max_exemplars:
+        return [v[0] for v in vectors], []
+
+    embeddings = np.array([v[1] for v in vectors], dtype=np.float32)
+    protected = [i for i, v in enumerate(vectors) if is_protected(v[2])]
+    budget = max(max_exemplars, len(protected))
+
+    keep = set(farthest_point_sample(embeddings, budget, seed_indices=protected))
+    keep_ids = [v[0] for i, v in enumerate(vectors) if i in keep]
+    delete_ids = [v[0] for i, v in enumerate(vectors) if i not in keep]
+    return keep_ids, delete_ids
+
+def _compact_vectors(index, speaker_name, vectors, max_exemplars, dry_run):
+    keep_ids, delete_ids = plan_compaction(vectors, max_exemplars)
+    if delete_ids and not dry_run:
+        delete_vector_ids(index, delete_ids)
+
+    report = {
+        "speaker_name": speaker_name,
+        "before": len(vectors),
+        "after": len(keep_ids),
+        "deleted": len(delete_ids),
+        "dry_run": dry_run
+    }
+    logger.info("Compacted %s: %d -> %d exemplars%s", speaker_name, report['before'], report['after'], " (dry run)" if dry_run else "")
+    return report
+
+def compact_speaker(index, speaker_name, max_exemplars=DEFAULT_MAX_EXEMPLARS, dry_run=False):
+    """Compact one speaker's exemplars and report before/after sizes"""
+    vectors = fetch_speaker_vectors(index, speaker_name)
+    return _compact_vectors(index, speaker_name, vectors, max_exemplars, dry_run)
+
+def compact_gallery(index, max_exemplars=DEFAULT_MAX_EXEMPLARS, dry_run=False):
+    """Compact every speaker in the index and report before/after sizes"""
+    by_speaker = {}
+    for vector_id, values, metadata in fetch_vectors(index, list_vector_ids(index)):
+        speaker_name = metadata.get("speaker_name")
+        if speaker_name:
+            by_speaker.setdefault(speaker_name, []).append((vector_id, values, metadata))
+
+    logger.info("Compacting %d speaker(s) to at most %d exemplars each", len(by_speaker), max_exemplars)
+    speakers = [
+        _compact_vectors(index, speaker_name, vectors, max_exemplars, dry_run)
+        for speaker_name, vectors in sorted(by_speaker.items())
+    ]
+
+    return {
+        "speakers": speakers,
+        "before": sum(s["before"] for s in speakers),
+        "after": sum(s["after"] for s in speakers),
+        "deleted": sum(s["deleted"] for s in speakers),
+        "dry_run": dry_run
+    }
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pinecone import Pinecone
+
+    parser = argparse.ArgumentParser(description="Cap exemplars per speaker in the Pinecone gallery")
+    parser.add_argument("--max-exemplars", type=int, default=DEFAULT_MAX_EXEMPLARS)
+    parser.add_argument("--speaker", help="Only compact this speaker")
+    parser.add_argument("--dry-run", action="store_true", help="Report without deleting")
+    args = parser.parse_args()
+
+    load_dotenv()
+    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index("speaker-embeddings")
+
+    if args.speaker:
+        report = compact_speaker(index, args.speaker, args.max_exemplars, args.dry_run)
+    else:
+        report = compact_gallery(index, args.max_exemplars, args.dry_run)
+    print(f"Total: {report['before']} -> {report['after']} exemplars ({report['deleted']} deleted)")
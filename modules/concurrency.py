@@ -0,0 +1,39 @@
+"""
+Dispatch blocking work off the event loop.
+psycopg2, boto3, requests and the Pinecone client all block, so routes that use
+them are written as plain functions and wrapped with @offload, which runs them
+on a dedicated thread pool of BLOCKING_IO_THREADS workers.
+"""
+
+import os
+import functools
+import anyio
+from anyio import to_thread
+from modules.metrics import BLOCKING_THREADS
+from modules.profiling import run_in_active_session
+
+BLOCKING_IO_THREADS = int(os.getenv("BLOCKING_IO_THREADS", "32"))
+
+_limiter = None
+
+def get_limiter():
+    """Return the capacity limiter that sizes the blocking I/O thread pool"""
+    global _limiter
+    # Created lazily because anyio limiters must be built inside the event loop
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(BLOCKING_IO_THREADS)
+        limiter = _limiter
+        BLOCKING_THREADS.labels("in_use").set_function(lambda: limiter.borrowed_tokens)
+        BLOCKING_THREADS.labels("max").set_function(lambda: limiter.total_tokens)
+    return _limiter
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the I/O thread pool and await its result (profiled with the request, if it is)"""
+    return await to_thread.run_sync(functools.partial(run_in_active_session, func, *args, **kwargs), limiter=get_limiter())
+
+def offload(func):
+    """Turn a blocking route function into a coroutine that runs it on the I/O thread pool"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+    return wrapper
@@ -1,62 +1,124 @@
 import os
+import threading
 import psycopg2
 from psycopg2.extras import DictCursor
-from datetime import datetime
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from datetime import datetime, timedelta
 import pathlib
 from dotenv import load_dotenv
 from modules.database.s3_operations import build_s3_path
+from modules.log import get_logger
+from modules.metrics import instrumented, DB_POOL_CONNECTIONS
 import uuid
 
+logger = get_logger(__name__)
+
 # Get the path to the root directory's .env file
 root_dir = pathlib.Path(__file__).parent.parent.parent
 env_path = os.path.join(root_dir, '.env')
-print(f"Loading .env from: {env_path}")
+logger.debug("Loading .env from %s", env_path)
 load_dotenv(env_path)
 
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '20'))
+# Conversations still processing after this long are assumed to have lost their worker
+PROCESSING_STALE_MINUTES = int(os.getenv('PROCESSING_STALE_MINUTES', '120'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class PooledConnection:
+    """psycopg2 connection wrapper whose close() returns the connection to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if conn.closed:
+                self._pool.putconn(conn, close=True)
+            else:
+                # Discard any uncommitted work, as closing a connection would
+                conn.rollback()
+                self._pool.putconn(conn)
+        except Exception:
+            self._pool.putconn(conn, close=True)
+
+def get_connection_string():
+    """Build the database connection string from environment variables"""
+    # Get database credentials from environment variables
+    db_username = os.getenv('DATABASE_USERNAME')
+    db_password = os.getenv('DATABASE_PASSWORD')
+    db_host = os.getenv('DATABASE_HOST')
+    db_port = os.getenv('DATABASE_PORT', '5432')  # Default to 5432 if not specified
+    db_name = os.getenv('DATABASE_NAME')
+    
+    # Check if required credentials are available
+    if not all([db_username, db_password, db_host, db_name]):
+        missing = [k for k, v in {
+            'DATABASE_USERNAME': db_username,
+            'DATABASE_PASSWORD': db_password,
+            'DATABASE_HOST': db_host,
+            'DATABASE_NAME': db_name
+        }.items() if not v]
+        raise Exception(f"Database credentials not fully specified. Missing: {', '.join(missing)}")
+        
+    return f"postgres://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+def get_pool():
+    """Create the shared connection pool on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            logger.info("Creating database connection pool (max %d connections)", DB_POOL_MAX)
+            _pool = ThreadedConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+                get_connection_string(),
+                sslmode='require'
+            )
+            pool = _pool
+            DB_POOL_CONNECTIONS.labels("in_use").set_function(lambda: len(pool._used))
+            DB_POOL_CONNECTIONS.labels("idle").set_function(lambda: len(pool._pool))
+            DB_POOL_CONNECTIONS.labels("max").set_function(lambda: pool.maxconn)
+        return _pool
+
 def get_db_connection():
-    """Create a connection to the Supabase database"""
+    """Get a connection to the Supabase database from the shared pool"""
     try:
-        # Get database credentials from environment variables
-        db_username = os.getenv('DATABASE_USERNAME')
-        db_password = os.getenv('DATABASE_PASSWORD')
-        db_host = os.getenv('DATABASE_HOST')
-        db_port = os.getenv('DATABASE_PORT', '5432')  # Default to 5432 if not specified
-        db_name = os.getenv('DATABASE_NAME')
-        
-        # Check if required credentials are available
-        if not all([db_username, db_password, db_host, db_name]):
-            missing = [k for k, v in {
-                'DATABASE_USERNAME': db_username,
-                'DATABASE_PASSWORD': db_password,
-                'DATABASE_HOST': db_host,
-                'DATABASE_NAME': db_name
-            }.items() if not v]
-            raise Exception(f"Database credentials not fully specified. Missing: {', '.join(missing)}")
-            
-        print(f"Connecting to database at {db_host}:{db_port}/{db_name} as {db_username}")
-        connection_string = f"postgres://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
-        
-        # Create connection
-        conn = psycopg2.connect(
-            connection_string,
-            sslmode='require'
-        )
+        pool = get_pool()
+        try:
+            conn = pool.getconn()
+        except PoolError:
+            # Pool exhausted (e.g. a nested connection while every slot is busy)
+            logger.warning("Database pool exhausted, opening a dedicated connection")
+            return psycopg2.connect(get_connection_string(), sslmode='require')
         
-        # Test the connection
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
+        # Test the connection; replace it if the server dropped it while idle
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+        except psycopg2.Error:
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
         
-        print("Successfully connected to database")
-        return conn
+        return PooledConnection(pool, conn)
     except psycopg2.Error as e:
-        print(f"PostgreSQL Error: {e.pgerror}")
-        print(f"Error Code: {e.pgcode}")
+        logger.error("PostgreSQL error %s: %s", e.pgcode, e.pgerror)
         raise Exception(f"Database connection error: {str(e)}")
     except Exception as e:
-        print(f"Error connecting to database: {e}")
+        logger.error("Error connecting to database: %s", e)
         raise
 
+@instrumented("db")
 def add_speaker(name, description=None):
     """Add a new speaker to the database"""
     conn = get_db_connection()
@@ -84,6 +146,7 @@ def add_speaker(name, description=None):
         cur.close()
         conn.close()
 
+@instrumented("db")
 def add_conversation(conversation_info):
     """Add a new conversation to the database"""
     conn = get_db_connection()
@@ -102,63 +165,59 @@ def add_conversation(conversation_info):
             """)
             display_name_exists = cur.fetchone() is not None
         except Exception as e:
-            print(f"Error checking for display_name column: {e}")
+            logger.error("Error checking for display_name column: %s", e)
             display_name_exists = False
         
         # Create standardized S3 path for original audio
         conversation_id = conversation_info['conversation_id']
-        s3_path = build_s3_path(conversation_id, "original")
+        s3_path = conversation_info.get('original_s3_path') or build_s3_path(conversation_id, "original")
         if not s3_path:
             # Fallback if build_s3_path fails
             s3_path = f"conversations/conversation_{conversation_id}/original_audio.wav"
             
-        print(f"Adding conversation with S3 path: {s3_path}")
+        logger.debug("Adding conversation with S3 path %s", s3_path)
+        
+        # Optional columns used to deduplicate repeated uploads and track ingest progress
+        extra_columns = {
+            column: conversation_info[column]
+            for column in ('content_hash', 'idempotency_key', 'status')
+            if conversation_info.get(column)
+        }
             
         # Insert the conversation
+        columns = {
+            'conversation_id': conversation_id,
+            'original_audio': s3_path,
+            'date_processed': datetime.now(),
+            'duration_seconds': conversation_info['duration_seconds']
+        }
         if display_name_exists and display_name:
-            cur.execute(
-                """
-                INSERT INTO conversations 
-                (conversation_id, original_audio, date_processed, duration_seconds, display_name)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    conversation_id,
-                    s3_path,
-                    datetime.now(),
-                    conversation_info['duration_seconds'],
-                    display_name
-                )
-            )
-        else:
-            cur.execute(
-                """
-                INSERT INTO conversations 
-                (conversation_id, original_audio, date_processed, duration_seconds)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-                """,
-                (
-                    conversation_id,
-                    s3_path,
-                    datetime.now(),
-                    conversation_info['duration_seconds']
-                )
-            )
+            columns['display_name'] = display_name
+        columns.update(extra_columns)
+        
+        cur.execute(
+            f"""
+            INSERT INTO conversations 
+            ({', '.join(columns)})
+            VALUES ({', '.join(['%s'] * len(columns))})
+            RETURNING id
+            """,
+            list(columns.values())
+        )
         
         conversation_db_id = cur.fetchone()[0]  # This is a UUID
         conn.commit()
         return conversation_db_id
         
     except Exception as e:
-        print(f"Error adding conversation: {e}")
+        logger.error("Error adding conversation: %s", e)
         conn.rollback()
         raise
     finally:
         cur.close()
         conn.close()
 
+@instrumented("db")
 def add_utterance(conversation_id=None, utterance_id=None, s3_path=None, start_time=None, end_time=None, speaker=None, confidence=None, embedding_id=None, utterance_info=None):
     """Add a new utterance to the database - supports both old and new call patterns"""
     conn = get_db_connection()
@@ -172,19 +231,17 @@ def add_utterance(conversation_id=None, utterance_id=None, s3_path=None, start_t
             WHERE table_name = 'utterances'
         """)
         column_names = [row[0] for row in cur.fetchall()]
-        print(f"Table columns: {column_names}")
+        logger.debug("Utterance table columns: %s", column_names)
         
         # Determine which calling pattern is being used
         if utterance_info is not None and isinstance(utterance_info, dict):
             # Old-style call with a dictionary
-            print("Using old-style add_utterance with dictionary")
-            
             # Get speaker ID or create a new speaker
             speaker_name = utterance_info.get('speaker')
             # Ensure speaker name is not None or empty
             if not speaker_name:
                 speaker_name = "Unknown_Speaker"
-                print(f"Using default speaker name: {speaker_name}")
+                logger.debug("Using default speaker name %s", speaker_name)
                 
             speaker_id = None
             
@@ -255,12 +312,10 @@ def add_utterance(conversation_id=None, utterance_id=None, s3_path=None, start_t
             
         else:
             # New-style call with separate parameters
-            print("Using new-style add_utterance with separate parameters")
-            
             # Ensure speaker is not None or empty
             if not speaker:
                 speaker = "Unknown_Speaker"
-                print(f"Using default speaker name: {speaker}")
+                logger.debug("Using default speaker name %s", speaker)
                 
             # Get speaker ID or create a new speaker
             speaker_id = None
@@ -328,8 +383,8 @@ def add_utterance(conversation_id=None, utterance_id=None, s3_path=None, start_t
                 RETURNING id
             """
             
-            print(f"Executing query: {query}")
-            print(f"Values: {values}")
+            logger.debug("Executing query: %s", query)
+            logger.debug("Values: %s", values)
             
             # Execute the query
             cur.execute(query, values)
@@ -340,13 +395,105 @@ def add_utterance(conversation_id=None, utterance_id=None, s3_path=None, start_t
         return utterance_id
         
     except Exception as e:
-        print(f"Error adding utterance: {e}")
+        logger.error("Error adding utterance: %s", e)
         conn.rollback()
         return None
     finally:
         cur.close()
         conn.close()
 
+@instrumented("db")
+def add_utterances(utterance_infos):
+    """Insert a batch of utterances and their word timestamps in one transaction.
+
+    Each dict needs speaker_id already resolved (see add_speaker); returns the
+    new utterance IDs in order.
+    """
+    if not utterance_infos:
+        return []
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        utterance_db_ids = []
+        for info in utterance_infos:
+            cur.execute(
+                """
+                INSERT INTO utterances 
+                (utterance_id, conversation_id, speaker_id, start_time, end_time, 
+                start_ms, end_ms, text, confidence, embedding_id, audio_file)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (
+                    info['utterance_id'],
+                    info['conversation_id'],
+                    info['speaker_id'],
+                    format_time(info['start_ms']),
+                    format_time(info['end_ms']),
+                    info['start_ms'],
+                    info['end_ms'],
+                    info.get('text', ''),
+                    info.get('confidence', 0.0),
+                    info.get('embedding_id'),
+                    info['s3_path']
+                )
+            )
+            utterance_db_id = cur.fetchone()[0]
+            add_word_timestamps_in_transaction(cur, utterance_db_id, info.get('words'))
+            utterance_db_ids.append(utterance_db_id)
+        
+        conn.commit()
+        return utterance_db_ids
+        
+    except Exception as e:
+        logger.error("Error adding utterances: %s", e)
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+@instrumented("db")
+def update_utterance_speakers(updates):
+    """Reassign utterances in one transaction: [(utterance_db_id, speaker_id, confidence, embedding_id)]"""
+    if not updates:
+        return
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.executemany(
+            "UPDATE utterances SET speaker_id = %s, confidence = %s, embedding_id = %s WHERE id = %s",
+            [(speaker_id, confidence, embedding_id, utterance_db_id) for utterance_db_id, speaker_id, confidence, embedding_id in updates]
+        )
+        conn.commit()
+        
+    except Exception as e:
+        logger.error("Error updating utterance speakers: %s", e)
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+@instrumented("db")
+def set_conversation_status(conversation_db_id, status):
+    """Set a conversation's ingest status: processing, completed or failed"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("UPDATE conversations SET status = %s WHERE id = %s", (status, conversation_db_id))
+        conn.commit()
+        
+    finally:
+        cur.close()
+        conn.close()
+
+@instrumented("db")
 def add_conversation_speaker(conversation_id, speaker_id):
     """Add a speaker to a conversation (junction table)"""
     conn = get_db_connection()
@@ -354,7 +501,7 @@ def add_conversation_speaker(conversation_id, speaker_id):
     
     try:
         # Both conversation_id and speaker_id should be UUIDs at this point
-        print(f"Adding speaker {speaker_id} to conversation {conversation_id}")
+        logger.debug("Adding speaker %s to conversation %s", speaker_id, conversation_id)
         
         cur.execute(
             """
@@ -368,7 +515,7 @@ def add_conversation_speaker(conversation_id, speaker_id):
         return True
         
     except Exception as e:
-        print(f"Error adding conversation speaker: {e}")
+        logger.error("Error adding conversation speaker: %s", e)
         conn.rollback()
         # This is not critical, so we don't raise the exception
         return False
@@ -376,6 +523,7 @@ def add_conversation_speaker(conversation_id, speaker_id):
         cur.close()
         conn.close()
 
+@instrumented("db")
 def get_speaker_by_name(name):
     """Get a speaker by name"""
     conn = get_db_connection()
@@ -389,6 +537,7 @@ def get_speaker_by_name(name):
         cur.close()
         conn.close()
 
+@instrumented("db")
 def get_conversation_by_id(conversation_id):
     """Get a conversation by its ID"""
     conn = get_db_connection()
@@ -402,6 +551,47 @@ def get_conversation_by_id(conversation_id):
         cur.close()
         conn.close()
 
+@instrumented("db")
+def find_conversation(content_hash=None, idempotency_key=None):
+    """Find a previously ingested conversation by idempotency key or audio content hash.
+
+    Failed ingests are ignored, and so are ingests still processing after
+    PROCESSING_STALE_MINUTES, so a recording whose worker died can be uploaded again.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=DictCursor)
+    stale_before = datetime.now() - timedelta(minutes=PROCESSING_STALE_MINUTES)
+    
+    try:
+        if idempotency_key:
+            cur.execute(
+                """
+                SELECT id, conversation_id, content_hash, status FROM conversations
+                WHERE idempotency_key = %s AND status <> 'failed'
+                AND (status <> 'processing' OR date_processed >= %s)
+                ORDER BY date_processed
+                LIMIT 1
+                """,
+                (idempotency_key, stale_before)
+            )
+        else:
+            cur.execute(
+                """
+                SELECT id, conversation_id, content_hash, status FROM conversations
+                WHERE content_hash = %s AND status <> 'failed'
+                AND (status <> 'processing' OR date_processed >= %s)
+                ORDER BY date_processed
+                LIMIT 1
+                """,
+                (content_hash, stale_before)
+            )
+        return cur.fetchone()
+        
+    finally:
+        cur.close()
+        conn.close()
+
+@instrumented("db")
 def get_utterances_by_conversation(conversation_id):
     """Get all utterances for a conversation"""
     conn = get_db_connection()
@@ -479,6 +669,15 @@ def init_database():
             )
         """)
         
+        # Content hash and idempotency key for deduplicating repeated uploads
+        cur.execute("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        cur.execute("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS idempotency_key TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_conversations_content_hash ON conversations (content_hash)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_conversations_idempotency_key ON conversations (idempotency_key)")
+        
+        # Ingest status; utterances are committed while a conversation is still processing
+        cur.execute("ALTER TABLE conversations ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'completed'")
+        
         # Create word_timestamps table
         cur.execute("""
             CREATE TABLE IF NOT EXISTS word_timestamps (
@@ -495,10 +694,10 @@ def init_database():
         """)
         
         conn.commit()
-        print("Database tables initialized successfully")
+        logger.info("Database tables initialized successfully")
         
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
         conn.rollback()
         raise
     finally:
@@ -530,12 +729,13 @@ def add_word_timestamps_in_transaction(cur, utterance_id, words):
             )
             cur.execute(insert_query, values)
         
-        print(f"Added {len(words)} word timestamps for utterance {utterance_id}")
+        logger.debug("Added %d word timestamps for utterance %s", len(words), utterance_id)
         
     except Exception as e:
-        print(f"Error adding word timestamps: {e}")
+        logger.error("Error adding word timestamps: %s", e)
         raise
 
+@instrumented("db")
 def add_word_timestamps(utterance_id, words):
     """Add word-level timestamps to the database (standalone version)"""
     if not words:
@@ -549,7 +749,7 @@ def add_word_timestamps(utterance_id, words):
         conn.commit()
         
     except Exception as e:
-        print(f"Error adding word timestamps: {e}")
+        logger.error("Error adding word timestamps: %s", e)
         conn.rollback()
         raise
     finally:
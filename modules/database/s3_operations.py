@@ -2,6 +2,10 @@ import boto3
 import os
 from dotenv import load_dotenv
 import pathlib
+from modules.log import get_logger
+from modules.metrics import track_call
+
+logger = get_logger(__name__)
 
 # Get the path to the root directory's .env file
 root_dir = pathlib.Path(__file__).parent.parent.parent
@@ -35,7 +39,7 @@ def build_s3_path(conversation_id, path_type, filename=None, utterance_id=None):
         Properly formatted S3 path
     """
     if not conversation_id:
-        print("Error: conversation_id is required")
+        logger.error("build_s3_path: conversation_id is required")
         return None
         
     # Format conversation_id path component
@@ -47,7 +51,7 @@ def build_s3_path(conversation_id, path_type, filename=None, utterance_id=None):
     base_path = f"{S3_BASE_PATH}/{conversation_path}"
     
     if path_type == "original":
-        return f"{base_path}/original_audio.wav"
+        return f"{base_path}/{filename or 'original_audio.wav'}"
     elif path_type == "utterance" and utterance_id is not None:
         return f"{base_path}/{S3_UTTERANCES_PATH}/utterance_{utterance_id:03d}.wav"
     elif path_type == "combined" and filename:
@@ -55,41 +59,66 @@ def build_s3_path(conversation_id, path_type, filename=None, utterance_id=None):
     elif filename:
         return f"{base_path}/{filename}"
     else:
-        print(f"Error: Invalid path_type '{path_type}' or missing required parameters")
+        logger.error("build_s3_path: invalid path_type %r or missing required parameters", path_type)
         return None
 
 def uploadFile(file_path, s3_key):
     try:
-        s3_client.upload_file(file_path, BUCKET_NAME, s3_key)
+        with track_call("s3", "upload_file", key=s3_key):
+            s3_client.upload_file(file_path, BUCKET_NAME, s3_key)
+        return True
+    except Exception as e:
+        logger.error("Error uploading file: %s", e)
+        return False
+
+def uploadBytes(data, s3_key, content_type=None):
+    """Upload an in-memory object without writing it to disk first"""
+    try:
+        extra_args = {'ContentType': content_type} if content_type else {}
+        with track_call("s3", "put_object", key=s3_key, bytes=len(data)):
+            s3_client.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=data, **extra_args)
         return True
     except Exception as e:
-        print(f"Error uploading file: {e}")
+        logger.error("Error uploading file: %s", e)
         return False
 
+def downloadBytes(s3_key):
+    """Read a small object into memory; returns None if it cannot be read"""
+    try:
+        with track_call("s3", "get_object", key=s3_key):
+            response = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
+            return response['Body'].read()
+    except Exception as e:
+        logger.error("Error downloading file: %s", e)
+        return None
+
 def downloadFile(s3_key, local_path):
     try:
-        s3_client.download_file(BUCKET_NAME, s3_key, local_path)
+        with track_call("s3", "download_file", key=s3_key):
+            s3_client.download_file(BUCKET_NAME, s3_key, local_path)
         return True
     except Exception as e:
-        print(f"Error downloading file: {e}")
+        logger.error("Error downloading file: %s", e)
         return False
 
 def listFiles(prefix=''):
     try:
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
+        with track_call("s3", "list_objects", prefix=prefix):
+            response = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
         if 'Contents' in response:
             return [obj['Key'] for obj in response['Contents']]
         return []
     except Exception as e:
-        print(f"Error listing files: {e}")
+        logger.error("Error listing files: %s", e)
         return []
 
 def deleteFile(s3_key):
     try:
-        s3_client.delete_object(Bucket=BUCKET_NAME, Key=s3_key)
+        with track_call("s3", "delete_object", key=s3_key):
+            s3_client.delete_object(Bucket=BUCKET_NAME, Key=s3_key)
         return True
     except Exception as e:
-        print(f"Error deleting file: {e}")
+        logger.error("Error deleting file: %s", e)
         return False
 
 def deleteFolder(prefix):
@@ -101,55 +130,56 @@ def deleteFolder(prefix):
         # List all objects in the folder
         objects_to_delete = listFiles(prefix)
         if not objects_to_delete:
-            print(f"No objects found with prefix: {prefix}")
+            logger.info("No objects found with prefix %s", prefix)
             return True
             
         # S3 requires a specific format for batch delete
         delete_objects = {'Objects': [{'Key': key} for key in objects_to_delete]}
         
         # Delete all objects in one API call
-        response = s3_client.delete_objects(
-            Bucket=BUCKET_NAME,
-            Delete=delete_objects
-        )
+        with track_call("s3", "delete_objects", prefix=prefix, count=len(objects_to_delete)):
+            response = s3_client.delete_objects(
+                Bucket=BUCKET_NAME,
+                Delete=delete_objects
+            )
         
         # Log the results
         if 'Deleted' in response:
-            print(f"Deleted {len(response['Deleted'])} objects from {prefix}")
+            logger.info("Deleted %d objects from %s", len(response['Deleted']), prefix)
         if 'Errors' in response and response['Errors']:
-            print(f"Failed to delete {len(response['Errors'])} objects")
+            logger.error("Failed to delete %d objects", len(response['Errors']))
             for error in response['Errors']:
-                print(f"  Error deleting {error['Key']}: {error['Code']} - {error['Message']}")
+                logger.error("Error deleting %s: %s - %s", error['Key'], error['Code'], error['Message'])
             
         return True
         
     except Exception as e:
-        print(f"Error deleting folder {prefix}: {e}")
+        logger.error("Error deleting folder %s: %s", prefix, e)
         return False
 
 def generate_presigned_url(s3_path):
     """Generate a presigned URL for an S3 object"""
     try:
         if not s3_client:
-            print("Warning: S3 client not initialized")
+            logger.warning("S3 client not initialized")
             return None
             
         if not BUCKET_NAME:
-            print("Warning: AWS_S3_BUCKET not set")
+            logger.warning("AWS_S3_BUCKET not set")
             return None
             
-        print(f"Generating presigned URL for {BUCKET_NAME}/{s3_path}")
+        logger.debug("Generating presigned URL for %s/%s", BUCKET_NAME, s3_path)
         
         # Check if the file exists
         try:
             s3_client.head_object(Bucket=BUCKET_NAME, Key=s3_path)
-            print(f"File exists at {s3_path}")
+            logger.debug("File exists at %s", s3_path)
         except s3_client.exceptions.ClientError as e:
             if e.response['Error']['Code'] == '404':
-                print(f"File not found at {s3_path}")
+                logger.info("File not found at %s", s3_path)
                 return None
             else:
-                print(f"Error checking file existence: {e}")
+                logger.error("Error checking file existence: %s", e)
                 return None
         
         # Generate the presigned URL
@@ -162,9 +192,8 @@ def generate_presigned_url(s3_path):
             ExpiresIn=3600  # URL expires in 1 hour
         )
         
-        print(f"Successfully generated presigned URL")
         return url
         
     except Exception as e:
-        print(f"Error generating presigned URL: {e}")
+        logger.error("Error generating presigned URL: %s", e)
         return None 
\ No newline at end of file
@@ -16,9 +16,16 @@ CREATE TABLE conversations (
     original_audio text,
     date_processed timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
     duration_seconds integer,
-    display_name text
+    display_name text,
+    content_hash text,
+    idempotency_key text,
+    -- processing, completed or failed
+    status text NOT NULL DEFAULT 'completed'
 );
 
+CREATE INDEX idx_conversations_content_hash ON conversations (content_hash);
+CREATE INDEX idx_conversations_idempotency_key ON conversations (idempotency_key);
+
 -- Conversations-Speakers junction table
 CREATE TABLE conversations_speakers (
     conversation_id uuid NOT NULL REFERENCES conversations(id),
@@ -9,31 +9,69 @@ Example:
     import embed
     embedding = embed("test/sample.wav")
     print(len(embedding))  # Prints: 192
+
+    embeddings = embed.batch([wav_bytes_1, wav_bytes_2])  # Concurrent requests, results in order
 """
 
+import os
 import requests
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.log import get_logger
+from modules.metrics import track_call
+from modules.tracing import in_current_context
+
+logger = get_logger(__name__)
+
+# Concurrent requests used by embed.batch
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
 
 class EmbedCallable:
+    def __init__(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _post(self, audio):
+        return requests.post("https://banddude--speaker-embedding-fastapi-app.modal.run/extract_embedding", headers={"X-API-Key": "your-secret-key-12345"}, files={"audio_file": audio})
+
     def __call__(self, audio_file):
         """
         Get speaker embedding from the API for a given audio file.
         
         Args:
-            audio_file (str): Path to the audio file
+            audio_file (str | bytes): Path to the audio file, or in-memory WAV bytes
             
         Returns:
             list: Speaker embedding vector
         """
         try:
-            response = requests.post("https://banddude--speaker-embedding-fastapi-app.modal.run/extract_embedding", headers={"X-API-Key": "your-secret-key-12345"}, files={"audio_file": open(audio_file, "rb")})
-            print(f"API Response: {response.text}")  # Debug print
-            data = response.json()
-            print(f"JSON Data: {data}")  # Debug print
-            return data["embedding"]
+            with track_call("embed", "extract_embedding"):
+                if isinstance(audio_file, (bytes, bytearray)):
+                    response = self._post(("audio.wav", bytes(audio_file), "audio/wav"))
+                else:
+                    with open(audio_file, "rb") as f:
+                        response = self._post(f)
+                logger.debug("Embedding API responded %s (%d bytes)", response.status_code, len(response.content))
+                return response.json()["embedding"]
         except Exception as e:
-            print(f"Error in embed.py: {str(e)}")  # Debug print
+            logger.error("Embedding request failed: %s", e)
             raise
 
+    def batch(self, audio_files):
+        """
+        Get embeddings for several audio files concurrently.
+        
+        Args:
+            audio_files (list[str | bytes]): Paths or in-memory WAV bytes
+            
+        Returns:
+            list: Speaker embedding vectors, in the same order as audio_files
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+        return list(self._executor.map(in_current_context(self), audio_files))
+
 # Make the module itself callable
 sys.modules[__name__] = EmbedCallable()
@@ -0,0 +1,107 @@
+"""
+Ingest progress events, streamed to clients over Server-Sent Events.
+The ingest pipeline publishes events for a conversation from whatever thread
+it runs on; GET /api/conversations/{conversation_id}/events replays the events
+published so far and then streams new ones until the conversation completes
+or fails.
+
+Events (each also carries "id", "type", "conversation_id" and "time"):
+    queued                                 upload accepted, waiting for a worker
+    stage        stage                     decode, transcribe, identify, combine or auto_update started
+    transcribed  utterances                transcript received
+    utterance    index, total, status      status is "skipped", "matched" (with speaker,
+                                           confidence, matched) or "stored"
+    completed    conversation_id, utterances, duplicate (duplicates carry the existing
+                                           conversation's status instead of utterances)
+    failed       error
+"""
+
+import os
+import asyncio
+import threading
+from datetime import datetime
+
+TERMINAL_EVENTS = ("completed", "failed")
+# Finished conversations whose events are kept for late subscribers
+MAX_FINISHED_CHANNELS = 200
+# Seconds between keep-alive comments on an idle stream
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+_channels = {}
+_lock = threading.Lock()
+
+class _Channel:
+    def __init__(self):
+        self.events = []
+        self.finished_at = None
+        # (event loop, asyncio.Event) of each connected subscriber
+        self.waiters = []
+
+def _prune_finished_channels():
+    """Forget the oldest finished conversations so the registry stays bounded"""
+    finished = [(channel.finished_at, key) for key, channel in _channels.items() if channel.finished_at]
+    finished.sort()
+    for _, key in finished[:max(0, len(finished) - MAX_FINISHED_CHANNELS)]:
+        del _channels[key]
+
+def publish(conversation_id, event_type, **fields):
+    """Record an event for a conversation and wake its subscribers.
+
+    Events published after the conversation completed or failed are dropped.
+    """
+    with _lock:
+        channel = _channels.get(conversation_id)
+        if channel is None:
+            _prune_finished_channels()
+            channel = _channels[conversation_id] = _Channel()
+        if channel.finished_at:
+            return
+        event = {
+            "id": len(channel.events) + 1,
+            "type": event_type,
+            "conversation_id": conversation_id,
+            "time": datetime.now().isoformat(),
+            **fields
+        }
+        channel.events.append(event)
+        if event_type in TERMINAL_EVENTS:
+            channel.finished_at = datetime.now().isoformat()
+        waiters = list(channel.waiters)
+    for loop, wakeup in waiters:
+        loop.call_soon_threadsafe(wakeup.set)
+
+def has_events(conversation_id):
+    with _lock:
+        return conversation_id in _channels
+
+async def subscribe(conversation_id, after=0, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+    """Yield a conversation's events with id > after, then new ones as they arrive.
+
+    Yields None when nothing happened for heartbeat seconds, and returns after
+    the completed or failed event.
+    """
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    with _lock:
+        channel = _channels.get(conversation_id)
+        if channel is None:
+            return
+        channel.waiters.append((loop, wakeup))
+    try:
+        while True:
+            wakeup.clear()
+            with _lock:
+                pending = [event for event in channel.events if event["id"] > after]
+                finished = channel.finished_at is not None
+            for event in pending:
+                after = event["id"]
+                yield event
+            if finished:
+                return
+            try:
+                await asyncio.wait_for(wakeup.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        with _lock:
+            channel.waiters.remove((loop, wakeup))
@@ -0,0 +1,43 @@
+"""
+Idempotency for the ingest pipeline.
+Uploads are identified by the SHA-256 of their audio (and optionally a
+client-supplied Idempotency-Key), so re-uploading the same file returns the
+existing conversation instead of transcribing, embedding and storing it again.
+"""
+
+import threading
+from contextlib import contextmanager
+from fastapi import HTTPException
+from modules.database.db_operations import find_conversation
+
+_ingest_locks = {}  # {content_hash: [lock, number of holders/waiters]}
+_ingest_locks_guard = threading.Lock()
+
+@contextmanager
+def ingest_lock(content_hash):
+    """Serialize ingests of identical audio so a concurrent duplicate waits and then reuses the result"""
+    with _ingest_locks_guard:
+        entry = _ingest_locks.setdefault(content_hash, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _ingest_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _ingest_locks[content_hash]
+
+def find_existing_conversation(content_hash, idempotency_key=None):
+    """Return the conversation (conversation_id, status) already ingested for this audio or idempotency key, or None"""
+    if idempotency_key:
+        existing = find_conversation(idempotency_key=idempotency_key)
+        if existing:
+            if existing['content_hash'] and existing['content_hash'] != content_hash:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Idempotency-Key was already used for a different file"
+                )
+            return existing
+
+    return find_conversation(content_hash=content_hash)
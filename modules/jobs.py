@@ -0,0 +1,97 @@
+"""
+In-process background job registry.
+Long-running operations run on a small thread pool and report progress that
+clients can poll through GET /api/jobs/{job_id}.
+"""
+
+import os
+import uuid
+import threading
+from datetime import datetime
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from modules.log import get_logger
+from modules.metrics import BACKGROUND_JOBS
+from modules.tracing import in_current_context
+from modules.profiling import session_for_background_job
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_FINISHED_JOBS = 200
+
+logger = get_logger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_jobs = {}
+_lock = threading.Lock()
+
+def _prune_finished_jobs():
+    """Forget the oldest finished jobs so the registry stays bounded"""
+    finished = [job for job in _jobs.values() if job["status"] in ("completed", "failed")]
+    finished.sort(key=lambda job: job["finished_at"])
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job["job_id"]]
+
+def _count_jobs(status):
+    with _lock:
+        return sum(1 for job in _jobs.values() if job["status"] == status)
+
+BACKGROUND_JOBS.labels("queued").set_function(lambda: _count_jobs("queued"))
+BACKGROUND_JOBS.labels("running").set_function(lambda: _count_jobs("running"))
+
+def submit_job(kind, func, *args, **kwargs):
+    """Run func(*args, progress=..., **kwargs) in the background and return the job ID.
+
+    func reports progress by calling progress(field=value, ...); its return
+    value becomes the job result.
+    """
+    job_id = uuid.uuid4().hex
+    # Jobs submitted by a profiled request are profiled too
+    profile = session_for_background_job(kind)
+    job = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "progress": {},
+        "result": None,
+        "error": None,
+        "created_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "profile_id": profile.profile_id if profile else None
+    }
+
+    def progress(**fields):
+        with _lock:
+            job["progress"].update(fields)
+
+    def run():
+        with _lock:
+            job["status"] = "running"
+        try:
+            with profile.activate() if profile else nullcontext():
+                result = func(*args, progress=progress, **kwargs)
+            with _lock:
+                job["result"] = result
+                job["status"] = "completed"
+        except Exception as e:
+            logger.exception("Job %s (%s) failed: %s", job_id, kind, e, extra={"job_id": job_id, "kind": kind})
+            with _lock:
+                job["error"] = str(e)
+                job["status"] = "failed"
+        finally:
+            with _lock:
+                job["finished_at"] = datetime.now().isoformat()
+
+    with _lock:
+        _prune_finished_jobs()
+        _jobs[job_id] = job
+    # The job's spans stay in the trace of the request that submitted it
+    _executor.submit(in_current_context(run))
+    return job_id
+
+def get_job(job_id):
+    """Return a snapshot of a job, or None if it is unknown"""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {**job, "progress": dict(job["progress"])}
@@ -0,0 +1,221 @@
+"""
+Live conversation ingest over a websocket.
+
+Protocol for /ws/ingest:
+    client -> {"sample_rate": 16000, "display_name": ..., "match_threshold": ..., "auto_update_threshold": ...}
+    server -> {"type": "ready", "conversation_id": ...}
+    client -> binary frames of 16 kHz mono little-endian int16 PCM, any size
+    server -> {"type": "segment", "segment_id", "start_ms", "end_ms", "speaker", "confidence", "embedding_id"}
+              as each speech segment closes
+    client -> {"type": "end"}
+    server -> {"type": "processing"}, then {"type": "completed", "conversation_id", "utterances"}
+
+A session reaching LIVE_MAX_SECONDS is ended by the server: it sends
+{"type": "limit_reached", "max_seconds"}, ignores the audio past the limit and
+processes the recording as if the client had sent "end".
+
+Segments are cut on pauses by a streaming version of the VAD in modules/vad.py
+and matched against the speaker gallery as they close; segments with no
+gallery match are clustered into Speaker_A, Speaker_B, ... by embedding
+similarity. Those labels are provisional: when the stream ends the recording
+is persisted through process_conversation, exactly like an upload.
+"""
+
+import os
+import uuid
+import threading
+from collections import deque
+import numpy as np
+from modules.audio import PCMBuffer, write_wav, CANONICAL_SAMPLE_RATE, CANONICAL_SAMPLE_WIDTH
+from modules.vad import VAD_FRAME_MS, VAD_MARGIN_DB, VAD_DYNAMIC_RANGE_DB, VAD_FLOOR_DBFS, VAD_HANGOVER_MS, trim_silence
+from modules.speaker_id import process_conversation, query_gallery, MATCH_THRESHOLD, AUTO_UPDATE_CONFIDENCE_THRESHOLD
+from modules.workspace import Workspace
+from modules.upload_sessions import hash_file
+
+# A pause this long closes the current segment
+LIVE_SEGMENT_SILENCE_MS = int(os.getenv("LIVE_SEGMENT_SILENCE_MS", "600"))
+# Segments are cut at this length even without a pause, to bound latency
+LIVE_MAX_SEGMENT_MS = int(os.getenv("LIVE_MAX_SEGMENT_MS", "8000"))
+# Shorter segments are not identified (same cut-off as the batch pipeline)
+LIVE_MIN_SEGMENT_MS = 700
+# Seconds of recent audio used to estimate the noise floor
+LIVE_NOISE_WINDOW_SECONDS = 10
+# Cosine similarity for an unmatched segment to join an existing unknown speaker
+LIVE_CLUSTER_THRESHOLD = float(os.getenv("LIVE_CLUSTER_THRESHOLD", "0.6"))
+# Longest live session accepted; the whole recording is buffered for persistence
+LIVE_MAX_SECONDS = int(os.getenv("LIVE_MAX_SECONDS", str(4 * 3600)))
+
+class LiveSegmenter:
+    """Cut a growing 16 kHz int16 PCM stream into speech segments as it arrives"""
+
+    def __init__(self, sample_rate=CANONICAL_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.frame_length = sample_rate * VAD_FRAME_MS // 1000
+        self.pcm = bytearray()
+        self.frames_processed = 0
+        self.recent_energy = deque(maxlen=LIVE_NOISE_WINDOW_SECONDS * 1000 // VAD_FRAME_MS)
+        self.segment_start = None
+        self.last_speech = None
+        self.hangover_frames = VAD_HANGOVER_MS // VAD_FRAME_MS
+        self.silence_frames = LIVE_SEGMENT_SILENCE_MS // VAD_FRAME_MS
+        self.max_segment_frames = LIVE_MAX_SEGMENT_MS // VAD_FRAME_MS
+
+    @property
+    def duration_seconds(self):
+        return len(self.pcm) // CANONICAL_SAMPLE_WIDTH / self.sample_rate
+
+    def feed(self, data):
+        """Append PCM bytes; returns [(start_ms, end_ms)] of segments that closed"""
+        self.pcm += data
+        frame_count = len(self.pcm) // (self.frame_length * CANONICAL_SAMPLE_WIDTH)
+        if frame_count <= self.frames_processed:
+            return []
+
+        # astype copies, so no view of the growing bytearray outlives this call
+        frames = np.frombuffer(
+            self.pcm, dtype=np.int16,
+            count=(frame_count - self.frames_processed) * self.frame_length,
+            offset=self.frames_processed * self.frame_length * CANONICAL_SAMPLE_WIDTH
+        ).astype(np.float32).reshape(-1, self.frame_length)
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+        energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+
+        # Same thresholding as the batch VAD, over a sliding window of recent frames
+        self.recent_energy.extend(energy_db.tolist())
+        recent = np.fromiter(self.recent_energy, dtype=np.float64)
+        threshold_db = min(np.percentile(recent, 10) + VAD_MARGIN_DB, recent.max() - VAD_DYNAMIC_RANGE_DB)
+        speech = energy_db > max(threshold_db, VAD_FLOOR_DBFS)
+
+        closed = []
+        for offset, is_speech in enumerate(speech):
+            frame = self.frames_processed + offset
+            if is_speech:
+                if self.segment_start is None:
+                    self.segment_start = max(frame - self.hangover_frames, 0)
+                self.last_speech = frame
+            if self.segment_start is None:
+                continue
+            if frame - self.last_speech >= self.silence_frames:
+                closed.append(self._close(self.last_speech + 1 + self.hangover_frames))
+            elif frame + 1 - self.segment_start >= self.max_segment_frames:
+                closed.append(self._close(frame + 1))
+        self.frames_processed = frame_count
+        return [segment for segment in closed if segment]
+
+    def flush(self):
+        """Close the open segment at the end of the stream"""
+        if self.segment_start is None:
+            return []
+        segment = self._close(min(self.last_speech + 1 + self.hangover_frames, self.frames_processed))
+        return [segment] if segment else []
+
+    def _close(self, end_frame):
+        start_ms = self.segment_start * VAD_FRAME_MS
+        end_ms = end_frame * VAD_FRAME_MS
+        self.segment_start = None
+        self.last_speech = None
+        if end_ms - start_ms < LIVE_MIN_SEGMENT_MS:
+            return None
+        return start_ms, end_ms
+
+    def audio(self, start_ms, end_ms):
+        """PCM between two offsets, copied so the stream can keep growing while it is used"""
+        start = start_ms * self.sample_rate // 1000 * CANONICAL_SAMPLE_WIDTH
+        end = end_ms * self.sample_rate // 1000 * CANONICAL_SAMPLE_WIDTH
+        return PCMBuffer(np.frombuffer(self.pcm[start:end], dtype=np.int16), self.sample_rate)
+
+class UnknownSpeakerClusters:
+    """Online clustering of unmatched segments into Speaker_A, Speaker_B, ..."""
+
+    def __init__(self, threshold=LIVE_CLUSTER_THRESHOLD):
+        self.threshold = threshold
+        self.centroids = []
+        self.counts = []
+
+    @staticmethod
+    def label(index):
+        return f"Speaker_{chr(ord('A') + index)}" if index < 26 else f"Speaker_{index + 1}"
+
+    def assign(self, embedding):
+        """Return (label, similarity) for an embedding, starting a new speaker if nothing is close"""
+        vector = np.asarray(embedding, dtype=np.float64)
+        vector = vector / max(np.linalg.norm(vector), 1e-12)
+        if self.centroids:
+            similarities = np.stack(self.centroids) @ vector / np.maximum(
+                np.linalg.norm(np.stack(self.centroids), axis=1), 1e-12
+            )
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                # Running mean of the member embeddings
+                self.counts[best] += 1
+                self.centroids[best] += (vector - self.centroids[best]) / self.counts[best]
+                return self.label(best), float(similarities[best])
+        self.centroids.append(vector)
+        self.counts.append(1)
+        return self.label(len(self.centroids) - 1), 1.0
+
+class LiveIngestSession:
+    """State for one live conversation: the PCM stream, its segments and their provisional speakers"""
+
+    def __init__(self, display_name=None, match_threshold=MATCH_THRESHOLD, auto_update_threshold=AUTO_UPDATE_CONFIDENCE_THRESHOLD):
+        self.conversation_id = str(uuid.uuid4())
+        self.display_name = display_name
+        self.match_threshold = match_threshold
+        self.auto_update_threshold = auto_update_threshold
+        self.segmenter = LiveSegmenter()
+        self.clusters = UnknownSpeakerClusters()
+        self.segment_count = 0
+        self.limit_reached = False
+        self._lock = threading.Lock()
+
+    def feed(self, data):
+        """Add PCM bytes; returns the segments that closed.
+
+        Audio past LIVE_MAX_SECONDS is dropped and limit_reached is set, so the
+        caller can end the session and persist what was recorded.
+        """
+        room = LIVE_MAX_SECONDS * CANONICAL_SAMPLE_RATE * CANONICAL_SAMPLE_WIDTH - len(self.segmenter.pcm)
+        if len(data) >= room:
+            data = data[:max(room, 0)]
+            self.limit_reached = True
+        return self.segmenter.feed(data) if data else []
+
+    def identify(self, start_ms, end_ms):
+        """Match one segment against the gallery, falling back to an unknown-speaker cluster"""
+        speech = trim_silence(self.segmenter.audio(start_ms, end_ms))
+        embedding, matches = query_gallery(speech)
+        with self._lock:
+            segment_id = self.segment_count
+            self.segment_count += 1
+            if matches and matches[0]["score"] >= self.match_threshold:
+                speaker, confidence, embedding_id = matches[0]["metadata"]["speaker_name"], matches[0]["score"], matches[0]["id"]
+            else:
+                (speaker, confidence), embedding_id = self.clusters.assign(embedding), None
+        return {
+            "type": "segment",
+            "segment_id": segment_id,
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "speaker": speaker,
+            "confidence": confidence,
+            "embedding_id": embedding_id
+        }
+
+    def persist(self, progress=None):
+        """Write the recording out and run it through the standard ingest pipeline"""
+        with Workspace(self.conversation_id) as workspace:
+            wav_path = os.path.join(workspace.disk_dir, "live.wav")
+            with open(wav_path, "wb") as f:
+                # The stream has ended, so the buffer can be viewed without copying; frames
+                # may have split a sample, so an odd trailing byte is left out
+                pcm = self.segmenter.pcm
+                samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // CANONICAL_SAMPLE_WIDTH)
+                write_wav(PCMBuffer(samples), f)
+            content_hash = hash_file(wav_path)
+            if progress:
+                progress(stage="processing", conversation_id=self.conversation_id)
+            return process_conversation(
+                wav_path, self.conversation_id, self.display_name,
+                self.match_threshold, self.auto_update_threshold,
+                content_hash=content_hash, workspace=workspace
+            )
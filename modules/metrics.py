@@ -0,0 +1,95 @@
+"""
+Prometheus metrics, served at /metrics.
+
+    ingest_stage_seconds{stage}                      per-conversation time in each process_conversation stage
+    external_calls_total{service}                    embed, vector, s3 and db calls
+    external_call_errors_total{service}              ... of which failed
+    db_pool_connections{state}                       in_use / idle / max
+    blocking_threads{state}                          in_use / max for the @offload thread pool
+    background_jobs{status}                          queued / running jobs
+    http_request_duration_seconds{method,route,status}  time until the response starts, per route
+"""
+
+import time
+import functools
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from modules.tracing import span, route_template
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+INGEST_STAGE_SECONDS = Histogram(
+    "ingest_stage_seconds",
+    "Time one conversation spent in each ingest stage",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+EXTERNAL_CALLS = Counter("external_calls_total", "Calls to external services", ["service"])
+EXTERNAL_CALL_ERRORS = Counter("external_call_errors_total", "Failed calls to external services", ["service"])
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Database pool connections", ["state"])
+BLOCKING_THREADS = Gauge("blocking_threads", "Blocking I/O thread pool usage", ["state"])
+BACKGROUND_JOBS = Gauge("background_jobs", "Background jobs by status", ["status"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per route",
+    ["method", "route", "status"]
+)
+
+def observe_stages(timings):
+    """Record a finished conversation's {stage: seconds} totals"""
+    for stage, seconds in timings.items():
+        INGEST_STAGE_SECONDS.labels(stage).observe(seconds)
+
+@contextmanager
+def track_call(service, operation=None, **attributes):
+    """Count a call to an external service (as an error if the block raises) and trace it as a "service.operation" span"""
+    EXTERNAL_CALLS.labels(service).inc()
+    with span(f"{service}.{operation}" if operation else service, **attributes):
+        try:
+            yield
+        except Exception:
+            EXTERNAL_CALL_ERRORS.labels(service).inc()
+            raise
+
+def instrumented(service):
+    """Decorator form of track_call, with the function name as the operation"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_call(service, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def render_metrics():
+    """Current metrics in the Prometheus text format"""
+    return generate_latest()
+
+class RequestMetricsMiddleware:
+    """Record HTTP request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        start = time.perf_counter()
+        started = False
+
+        async def timed_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(message["status"])).observe(time.perf_counter() - start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        except Exception:
+            if not started:
+                HTTP_REQUEST_SECONDS.labels(scope["method"], route, "500").observe(time.perf_counter() - start)
+            raise
@@ -0,0 +1,264 @@
+"""
+Helpers for enumerating and bulk-editing the Pinecone speaker gallery.
+Uses the index's ID listing API with batched fetch/delete instead of dummy-vector
+queries, so results are not capped by top_k.
+
+The full gallery listing ({vector_id: speaker_name}) is cached in process.
+Writes made through upsert_vectors/delete_vector_ids keep the cache current;
+it is reloaded from the index after GALLERY_CACHE_TTL_SECONDS to pick up
+writes made elsewhere; a reload lists every ID but only fetches the ones it has
+not seen, since a fetch also transfers the full embeddings. A per-speaker vector count kept alongside it makes
+speaker_exists an in-memory check for known speakers (unknown names are looked
+up in the index); a background reconciler reloads the listing every
+GALLERY_RECONCILE_INTERVAL_SECONDS.
+"""
+
+import os
+import time
+import threading
+from modules.log import get_logger
+from modules.metrics import track_call
+
+logger = get_logger(__name__)
+
+FETCH_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000
+UPSERT_BATCH_SIZE = 100
+GALLERY_CACHE_TTL_SECONDS = int(os.getenv("GALLERY_CACHE_TTL_SECONDS", "600"))
+GALLERY_RECONCILE_INTERVAL_SECONDS = int(os.getenv("GALLERY_RECONCILE_INTERVAL_SECONDS", "300"))
+
+_gallery = None  # {vector_id: speaker_name}, None until first load
+_grouped = None  # get_gallery's {speaker_name: [vector_id, ...]} view of _gallery, rebuilt after writes
+_speaker_counts = {}  # {speaker_name: number of vectors}
+_gallery_loaded_at = 0.0
+_gallery_generation = 0  # Bumped on every write so concurrent loads can detect staleness
+_gallery_lock = threading.Lock()
+
+def speaker_id_prefixes(speaker_name):
+    """Return the vector ID prefixes used for a speaker across the app"""
+    underscored = speaker_name.replace(' ', '_')
+    return sorted({
+        f"speaker_{underscored}_",     # speaker_id.py / auto_update_pinecone.py
+        f"speaker_{speaker_name}_",    # Pinecone manager enrollment
+        f"utterance_{underscored}_",   # Manual utterance inclusion
+    })
+
+def list_vector_ids(index, prefix=None):
+    """Yield every vector ID in the index, following pagination"""
+    kwargs = {"prefix": prefix} if prefix else {}
+    for page in index.list(**kwargs):
+        for vector_id in page:
+            yield vector_id
+
+def fetch_vectors(index, ids):
+    """Fetch vectors in batches, yielding (id, values, metadata)"""
+    ids = list(ids)
+    for start in range(0, len(ids), FETCH_BATCH_SIZE):
+        batch = ids[start:start + FETCH_BATCH_SIZE]
+        with track_call("vector", "fetch", count=len(batch)):
+            results = index.fetch(ids=batch)
+        for vector_id, vector in results.vectors.items():
+            yield vector_id, vector.values, vector.metadata or {}
+
+def fetch_speaker_vectors(index, speaker_name):
+    """Fetch a speaker's vectors: those under its ID prefixes plus any the gallery cache maps to it"""
+    ids = set()
+    for prefix in speaker_id_prefixes(speaker_name):
+        ids.update(list_vector_ids(index, prefix))
+    # Vectors under any other ID scheme are found through the gallery cache, which maps IDs by
+    # metadata; it is only consulted when already loaded, since loading it fetches the whole index
+    ids.update(cached_speaker_ids(speaker_name))
+
+    # Prefixes can overlap between names ("Bob_" vs "Bob_Smith_"), so confirm via metadata
+    return [
+        (vector_id, values, metadata)
+        for vector_id, values, metadata in fetch_vectors(index, ids)
+        if metadata.get("speaker_name") == speaker_name
+    ]
+
+def cached_speaker_ids(speaker_name):
+    """IDs the gallery cache maps to a speaker, without loading it (empty until the first load)"""
+    with _gallery_lock:
+        if _gallery is None:
+            return []
+        return [vector_id for vector_id, name in _gallery.items() if name == speaker_name]
+
+def _load_gallery(index, known=None):
+    """Enumerate every vector in the index and map it to its speaker.
+
+    IDs already in known ({vector_id: speaker_name}) keep their speaker; only
+    new IDs are fetched, since a fetch also transfers the full embedding.
+    """
+    known = known or {}
+    gallery = {}
+    new_ids = []
+    for vector_id in list_vector_ids(index):
+        if vector_id in known:
+            gallery[vector_id] = known[vector_id]
+        else:
+            new_ids.append(vector_id)
+    for vector_id, _, metadata in fetch_vectors(index, new_ids):
+        speaker_name = metadata.get("speaker_name")
+        if speaker_name:
+            gallery[vector_id] = speaker_name
+    return gallery
+
+def group_by_speaker(gallery):
+    """Turn {vector_id: speaker_name} into {speaker_name: [vector_id, ...]}"""
+    speakers = {}
+    for vector_id, speaker_name in gallery.items():
+        speakers.setdefault(speaker_name, []).append(vector_id)
+    for vector_ids in speakers.values():
+        vector_ids.sort()
+    return speakers
+
+def get_gallery(index, refresh=False):
+    """Return {speaker_name: [vector_id, ...]} for the whole index, served from cache when fresh.
+
+    The result is shared with other callers and must not be modified.
+    """
+    global _gallery, _grouped, _speaker_counts, _gallery_loaded_at
+
+    with _gallery_lock:
+        fresh = (
+            _gallery is not None and not refresh
+            and time.monotonic() - _gallery_loaded_at < GALLERY_CACHE_TTL_SECONDS
+        )
+        if fresh:
+            if _grouped is None:
+                _grouped = group_by_speaker(_gallery)
+            return _grouped
+        generation = _gallery_generation
+        known = dict(_gallery or {})
+
+    # Load outside the lock; it can take many round trips on a large index
+    loaded = _load_gallery(index, known)
+
+    with _gallery_lock:
+        _gallery = loaded
+        _grouped = group_by_speaker(loaded)
+        _speaker_counts = {}
+        for speaker_name in loaded.values():
+            _speaker_counts[speaker_name] = _speaker_counts.get(speaker_name, 0) + 1
+        # A write that raced with the load may be missing; reload on next read
+        _gallery_loaded_at = time.monotonic() if generation == _gallery_generation else 0.0
+        return _grouped
+
+def invalidate_gallery_cache():
+    """Force the next get_gallery call to reload from the index"""
+    global _gallery_loaded_at, _gallery_generation
+    with _gallery_lock:
+        _gallery_generation += 1
+        _gallery_loaded_at = 0.0
+
+def _find_speaker_in_index(index, speaker_name):
+    """Look for a speaker's vectors under its ID prefixes, recording any found in the cache"""
+    for prefix in speaker_id_prefixes(speaker_name):
+        # Prefixes can overlap between names ("Bob_" vs "Bob_Smith_"), so confirm via metadata
+        found = [
+            vector for vector in fetch_vectors(index, list_vector_ids(index, prefix))
+            if vector[2].get("speaker_name") == speaker_name
+        ]
+        if found:
+            _record_upsert(found)
+            return True
+    return False
+
+def speaker_exists(index, speaker_name):
+    """Check whether a speaker has any vectors, answering from the cache when it knows the speaker.
+
+    A miss is checked against the index, since another process may have added
+    the speaker since the last reconcile.
+    """
+    with _gallery_lock:
+        if _gallery is not None and speaker_name in _speaker_counts:
+            return True
+    return _find_speaker_in_index(index, speaker_name)
+
+def known_speaker_names():
+    """Return the set of speaker names currently known to the gallery cache"""
+    with _gallery_lock:
+        return set(_speaker_counts)
+
+def _remove_entry(vector_id):
+    speaker_name = _gallery.pop(vector_id, None)
+    if speaker_name is not None:
+        _speaker_counts[speaker_name] -= 1
+        if not _speaker_counts[speaker_name]:
+            del _speaker_counts[speaker_name]
+
+def _record_upsert(vectors):
+    global _gallery_generation, _grouped
+    with _gallery_lock:
+        _gallery_generation += 1
+        if _gallery is not None:
+            _grouped = None
+            for vector_id, _, metadata in vectors:
+                speaker_name = metadata.get("speaker_name")
+                if speaker_name:
+                    _remove_entry(vector_id)
+                    _gallery[vector_id] = speaker_name
+                    _speaker_counts[speaker_name] = _speaker_counts.get(speaker_name, 0) + 1
+
+def _record_delete(ids):
+    global _gallery_generation, _grouped
+    with _gallery_lock:
+        _gallery_generation += 1
+        if _gallery is not None:
+            _grouped = None
+            for vector_id in ids:
+                _remove_entry(vector_id)
+
+def start_gallery_reconciler(index, interval=GALLERY_RECONCILE_INTERVAL_SECONDS):
+    """Load the gallery now and reload it periodically in a daemon thread"""
+    def reconcile():
+        while True:
+            try:
+                speakers = get_gallery(index, refresh=True)
+                logger.info("Reconciled speaker gallery: %d speakers", len(speakers))
+            except Exception as e:
+                logger.error("Error reconciling speaker gallery: %s", e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=reconcile, name="gallery-reconciler", daemon=True)
+    thread.start()
+    return thread
+
+def upsert_vectors(index, vectors):
+    """Upsert (id, values, metadata) tuples in batches and keep the gallery cache current"""
+    vectors = list(vectors)
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        batch = vectors[start:start + UPSERT_BATCH_SIZE]
+        with track_call("vector", "upsert", count=len(batch)):
+            index.upsert(vectors=batch)
+        _record_upsert(batch)
+    return len(vectors)
+
+def delete_vector_ids(index, ids, progress=None):
+    """Delete vectors in batches and return the number deleted"""
+    ids = list(ids)
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        batch = ids[start:start + DELETE_BATCH_SIZE]
+        with track_call("vector", "delete", count=len(batch)):
+            index.delete(ids=batch)
+        _record_delete(batch)
+        if progress:
+            progress(deleted=start + len(batch))
+    return len(ids)
+
+def delete_speaker_vectors(index, speaker_name, progress=None):
+    """Delete every vector belonging to a speaker, reporting progress as it goes"""
+    if progress:
+        progress(stage="listing", listed=0, deleted=0)
+
+    vectors = fetch_speaker_vectors(index, speaker_name)
+    ids = [vector_id for vector_id, _, _ in vectors]
+
+    if progress:
+        progress(stage="deleting", listed=len(ids), total=len(ids))
+
+    deleted = delete_vector_ids(index, ids, progress)
+
+    if progress:
+        progress(stage="done")
+    return {"speaker_name": speaker_name, "embeddings_deleted": deleted}
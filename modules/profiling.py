@@ -0,0 +1,203 @@
+"""
+Opt-in cProfile profiles of single requests and ingest jobs.
+A request is profiled when it carries X-Profile: 1 (or ?profile=1) and an
+X-Admin-Key header matching ADMIN_API_KEY; profiling is disabled when
+ADMIN_API_KEY is unset. The response carries the profile's ID in X-Profile-Id.
+Background jobs submitted by a profiled request (such as the ingest job behind
+an upload) get a profile of their own, whose ID appears as the job's profile_id.
+
+A profile covers the thread that handles the request or runs the job, plus any
+blocking work it passes to run_blocking/@offload. cProfile only sees one thread
+at a time, so other worker pools (transcription, S3, embedding batches) show up
+only as time spent waiting on them. Request profiles are taken on the event
+loop thread, so they also include any other requests the loop serves
+meanwhile, and only one request is profiled at a time.
+
+Profiles are saved to PROFILE_DIR as <profile_id>.prof (pstats format, for
+snakeviz or python -m pstats), with a <profile_id>.json summary next to each.
+Only the newest MAX_PROFILES are kept.
+"""
+
+import io
+import os
+import hmac
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from modules.log import get_logger
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "speaker-id-profiles")
+MAX_PROFILES = int(os.getenv("MAX_PROFILES", "50"))
+# Functions listed in a text report
+PROFILE_TEXT_LINES = 60
+
+logger = get_logger(__name__)
+
+_active_session = contextvars.ContextVar("profile_session", default=None)
+# Request profiles share the event loop thread, so only one runs at a time
+_request_profiling = threading.Lock()
+_save_lock = threading.Lock()
+
+def is_admin(key):
+    """True if key matches ADMIN_API_KEY (always False when it is unset)"""
+    return bool(ADMIN_API_KEY) and bool(key) and hmac.compare_digest(key.encode(), ADMIN_API_KEY.encode())
+
+class ProfileSession:
+    """cProfile stats gathered from every thread working on one request or job"""
+
+    def __init__(self, label):
+        self.profile_id = uuid.uuid4().hex
+        self.label = label
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self._stats = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def collect(self):
+        """Profile the current thread for the duration of the block"""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+
+    @contextmanager
+    def activate(self):
+        """Make this the current session, profile the block and save the result"""
+        token = _active_session.set(self)
+        try:
+            with self.collect():
+                yield self
+        finally:
+            _active_session.reset(token)
+            self.save()
+
+    def save(self):
+        with self._lock:
+            stats = self._stats
+        if stats is None:
+            return
+        duration = time.perf_counter() - self._start
+        with _save_lock:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stats.dump_stats(os.path.join(PROFILE_DIR, f"{self.profile_id}.prof"))
+            with open(os.path.join(PROFILE_DIR, f"{self.profile_id}.json"), "w") as f:
+                json.dump({
+                    "profile_id": self.profile_id,
+                    "label": self.label,
+                    "started_at": self.started_at,
+                    "duration_seconds": round(duration, 3)
+                }, f)
+            _prune_profiles()
+        logger.info("Saved profile %s (%s, %.2fs)", self.profile_id, self.label, duration,
+                    extra={"profile_id": self.profile_id})
+
+def _prune_profiles():
+    """Delete the oldest profiles beyond MAX_PROFILES"""
+    summaries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in summaries[:max(0, len(summaries) - MAX_PROFILES)]:
+        profile_id = entry.name[:-len(".json")]
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+def run_in_active_session(func, *args, **kwargs):
+    """Call func, adding the current thread to the active profile session if there is one"""
+    session = _active_session.get()
+    if session is None:
+        return func(*args, **kwargs)
+    with session.collect():
+        return func(*args, **kwargs)
+
+def session_for_background_job(kind):
+    """A new session for a job submitted while profiling, otherwise None"""
+    if _active_session.get() is None:
+        return None
+    return ProfileSession(f"job {kind}")
+
+def list_profiles():
+    """Summaries of the saved profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda profile: profile["started_at"], reverse=True)
+
+def profile_path(profile_id):
+    """Path of a saved .prof file, or None if there is no such profile"""
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
+
+def profile_text(path, sort="cumulative"):
+    """Plain-text report of the most expensive functions in a saved profile"""
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats(sort).print_stats(PROFILE_TEXT_LINES)
+    return stream.getvalue()
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it with X-Profile: 1 or ?profile=1 and a valid X-Admin-Key"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMIN_API_KEY:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if not self._requested(scope, headers) or not is_admin(headers.get(b"x-admin-key", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        if not _request_profiling.acquire(blocking=False):
+            logger.warning("Profile of %s %s skipped: another request is being profiled", scope["method"], scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            session = ProfileSession(f"{scope['method']} {scope['path']}")
+
+            async def send_with_profile_id(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", session.profile_id.encode())]}
+                await send(message)
+
+            with session.activate():
+                await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _request_profiling.release()
+
+    @staticmethod
+    def _requested(scope, headers):
+        if headers.get(b"x-profile", b"") in (b"1", b"true"):
+            return True
+        query = scope.get("query_string", b"").decode("latin-1")
+        return any(param in ("profile=1", "profile=true") for param in query.split("&"))
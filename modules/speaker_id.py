@@ -1,18 +1,38 @@
 import os
 import json
+import time
+import logging
+import tempfile
 import assemblyai as aai
 from pinecone import Pinecone
 # import torch  # Removed - not needed since embed API returns Python lists
 import numpy as np
-from pydub import AudioSegment
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import uuid
-from modules import embed
-from modules.database.s3_operations import uploadFile, build_s3_path
-from modules.database.db_operations import add_speaker, add_conversation, add_utterance
-from modules.auto_update_pinecone import auto_update_embedding
+from modules.database.s3_operations import uploadFile, uploadBytes, build_s3_path
+from modules.database.db_operations import (
+    add_speaker, add_conversation, add_utterances, update_utterance_speakers, set_conversation_status
+)
+from modules.auto_update_pinecone import auto_update_embedding, AutoUpdateBuffer
+from modules.pinecone_gallery import upsert_vectors
+from modules.audio import (
+    PCMBuffer, decode_audio, encode_audio, encode_clip, encode_file, storage_formats,
+    with_format, content_type, AUDIO_FORMATS, AUDIO_STORAGE_FORMAT, UNCOMPRESSED_EXTENSIONS
+)
+from modules.timing import StageTimer, timed
+from modules.waveform import waveform_bytes, WAVEFORM_CONTENT_TYPE
+from modules.vad import trim_silence, TrimStats
+from modules.windowed_embed import embed_audio
+from modules.workspace import Workspace
+from modules.events import publish
+from modules.log import get_logger, SAMPLED
+from modules.metrics import track_call
+from modules.tracing import traced, annotate, in_current_context
 import traceback
 
+logger = get_logger(__name__)
+
 # Initialize APIs
 aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
@@ -26,6 +46,11 @@ S3_UTTERANCES_PATH = "utterances"
 AUTO_UPDATE_CONFIDENCE_THRESHOLD = 0.50
 MATCH_THRESHOLD = 0.40
 
+# Utterances are committed in batches of this size, or once this many seconds
+# have passed, so a long recording can be reviewed while it is still processing
+UTTERANCE_COMMIT_BATCH = int(os.getenv("UTTERANCE_COMMIT_BATCH", "10"))
+UTTERANCE_COMMIT_SECONDS = float(os.getenv("UTTERANCE_COMMIT_SECONDS", "5"))
+
 def format_time(ms):
     """Format milliseconds as HH:MM:SS"""
     seconds = ms / 1000
@@ -33,48 +58,19 @@ def format_time(ms):
     hours, minutes = divmod(minutes, 60)
     return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}"
 
-def convert_to_wav(input_file):
-    """Convert an audio file to WAV format if needed"""
-    if input_file.lower().endswith('.wav'):
-        return input_file
-        
-    print(f"Converting {input_file} to WAV format...")
-    base_filename = os.path.splitext(os.path.basename(input_file))[0]
-    wav_file = f"{base_filename}_temp.wav"
-    
-    try:
-        # Load and convert the audio file
-        audio = AudioSegment.from_file(input_file)
-        
-        # Convert to mono if stereo
-        if audio.channels > 1:
-            print("Converting to mono...")
-            audio = audio.set_channels(1)
-        
-        # Export as WAV
-        audio.export(wav_file, format="wav")
-        print(f"File converted and saved as: {wav_file}")
-        
-        return wav_file
-    except Exception as e:
-        # If any error occurs, ensure temp file is cleaned up
-        if os.path.exists(wav_file):
-            os.remove(wav_file)
-            print(f"Removed temporary file due to error: {wav_file}")
-        raise e
-
-def transcribe(file_path):
-    """Transcribe audio file using AssemblyAI"""
-    print(f"\nTranscribing {file_path}...")
+def transcribe(audio):
+    """Transcribe audio using AssemblyAI (a file path or a binary file object)"""
+    logger.info("Transcribing %s", audio if isinstance(audio, str) else "in-memory audio")
     config = aai.TranscriptionConfig(
         speaker_labels=True
         # TODO: According to docs, word-level timestamps should be included by default
         # If 'words' field is still missing, we may need to add additional config
     )
     transcriber = aai.Transcriber(config=config)
-    transcript = transcriber.transcribe(file_path)
-    print("\nTranscription data:")
-    print(json.dumps(transcript.json_response, indent=2))
+    with track_call("assemblyai", "transcribe"):
+        transcript = transcriber.transcribe(audio)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Transcription data: %s", json.dumps(transcript.json_response))
     return transcript.json_response
 
 def add_embedding_to_pinecone(embedding, speaker_name, source_file, is_short=False, duration_seconds=None):
@@ -103,81 +99,140 @@ def add_embedding_to_pinecone(embedding, speaker_name, source_file, is_short=Fal
         embedding_list = embedding
     
     # Upload to Pinecone
-    index.upsert(vectors=[(unique_id, embedding_list, metadata)])
+    upsert_vectors(index, [(unique_id, embedding_list, metadata)])
     
     return unique_id
 
 def check_if_embedding_exists(embedding, similarity_threshold=0.98):
     """Check if an embedding already exists in the database"""
-    results = index.query(
-        vector=embedding.tolist(),
-        top_k=1,
-        include_metadata=True
-    )
+    with track_call("vector", "query", top_k=1):
+        results = index.query(
+            vector=embedding.tolist(),
+            top_k=1,
+            include_metadata=True
+        )
     
     if results["matches"] and results["matches"][0]["score"] >= similarity_threshold:
         return True, results["matches"][0]["id"]
     
     return False, None
 
-def test_voice_segment(audio_segment, conversation_id, utterance_id, confidence_threshold=MATCH_THRESHOLD, is_short=False):
-    """Test a voice segment against the speaker database"""
-    # Save segment to temporary file
-    temp_wav = "temp_segment.wav"
-    audio_segment.export(temp_wav, format="wav")
+def utterance_s3_path(conversation_id, name):
+    """S3 key of a stored clip (e.g. "utterance_003") in the storage format"""
+    return f"{S3_BASE_PATH}/{conversation_id}/{S3_UTTERANCES_PATH}/{name}{AUDIO_FORMATS[AUDIO_STORAGE_FORMAT][0]}"
+
+def store_audio(audio, s3_path, timer=None):
+    """Upload a clip in the lossless storage format plus its compressed playback copy"""
+    for audio_format in storage_formats():
+        with timed(timer, "encode"):
+            data = encode_audio(audio, audio_format)
+        with timed(timer, "s3_upload"):
+            uploadBytes(data, with_format(s3_path, audio_format), content_type(audio_format))
+
+def store_clip(file_path, start_ms, end_ms, s3_path, timer=None):
+    """Upload a span of the original recording, at its own sample rate, in the storage and playback formats"""
+    for audio_format in storage_formats():
+        with timed(timer, "encode"):
+            data = encode_clip(file_path, start_ms, end_ms, audio_format)
+        with timed(timer, "s3_upload"):
+            uploadBytes(data, with_format(s3_path, audio_format), content_type(audio_format))
+
+def waveform_s3_path(conversation_id):
+    """S3 key of a conversation's precomputed waveform peaks"""
+    return f"{S3_BASE_PATH}/{conversation_id}/waveform.peaks"
+
+def store_waveform(audio, conversation_id):
+    """Compute waveform peaks from the decoded audio and upload them"""
+    try:
+        return uploadBytes(waveform_bytes(audio), waveform_s3_path(conversation_id), WAVEFORM_CONTENT_TYPE)
+    except Exception as e:
+        logger.error("Error computing waveform for %s: %s", conversation_id, e)
+        return False
+
+def original_s3_path_for(conversation_id, file_path):
+    """S3 key for a conversation's original recording, FLAC for uncompressed sources"""
+    extension = os.path.splitext(file_path)[1].lower() or ".wav"
+    if extension in UNCOMPRESSED_EXTENSIONS:
+        extension = AUDIO_FORMATS[AUDIO_STORAGE_FORMAT][0]
+    return build_s3_path(conversation_id, "original", filename=f"original_audio{extension}")
+
+def store_original_audio(file_path, s3_path, workdir=None):
+    """Upload the original recording, losslessly compressing uncompressed sources"""
+    if os.path.splitext(s3_path)[1] == os.path.splitext(file_path)[1].lower():
+        return uploadFile(file_path, s3_path)
+    fd, compressed_path = tempfile.mkstemp(suffix=os.path.splitext(s3_path)[1], dir=workdir or os.path.dirname(file_path) or None)
+    os.close(fd)
+    try:
+        encode_file(file_path, AUDIO_STORAGE_FORMAT, compressed_path)
+        return uploadFile(compressed_path, s3_path)
+    except Exception as e:
+        logger.error("Error compressing original audio: %s", e)
+        return False
+    finally:
+        if os.path.exists(compressed_path):
+            os.remove(compressed_path)
+
+def query_gallery(speech, top_k=1, timer=None):
+    """Embed a clip of speech and return (embedding, best gallery matches)"""
+    # Long clips are embedded as pooled windows
+    embedding_np = embed_audio(speech, timer)
+    with timed(timer, "vector_query"), track_call("vector", "query", top_k=top_k):
+        results = index.query(
+            vector=embedding_np.tolist(),
+            top_k=top_k,
+            include_metadata=True
+        )
+    return embedding_np, results["matches"]
+
+def test_voice_segment(audio_segment, conversation_id, utterance_id, confidence_threshold=MATCH_THRESHOLD, is_short=False, timer=None, trim_stats=None, source_span=None):
+    """Test a voice segment against the speaker database.
+
+    source_span is (file_path, start_ms, end_ms) of the segment in the original
+    recording; the stored clip is cut from it rather than from the 16 kHz decode.
+    """
+    # Only the speech frames are embedded; the stored clip keeps the full span for playback
+    with timed(timer, "vad"):
+        speech = trim_silence(audio_segment, trim_stats)
+    
+    # Upload to S3 (compressed)
+    s3_path = utterance_s3_path(conversation_id, f"utterance_{utterance_id:03d}")
+    if source_span:
+        store_clip(*source_span, s3_path, timer)
+    else:
+        store_audio(audio_segment, s3_path, timer)
     
+    # Special handling for very short utterances - log additional info
+    segment_duration = len(audio_segment) / 1000.0  # Convert to seconds
+    if segment_duration < 0.7:  # Less than 700ms
+        is_short = True
+        logger.info("Skipping short utterance %d (%.2fs)", utterance_id, segment_duration, extra=SAMPLED)
+        return None, 0.0, None, None  # Skip very short utterances
+        
     try:
-        # Upload to S3
-        s3_path = f"{S3_BASE_PATH}/{conversation_id}/{S3_UTTERANCES_PATH}/utterance_{utterance_id:03d}.wav"
-        uploadFile(temp_wav, s3_path)
+        # Look for top matches (more for short utterances)
+        embedding_np, matches = query_gallery(speech, top_k=2 if is_short else 1, timer=timer)
         
-        # Special handling for very short utterances - log additional info
-        segment_duration = len(audio_segment) / 1000.0  # Convert to seconds
-        if segment_duration < 0.7:  # Less than 700ms
-            is_short = True
-            print(f"  Short utterance detected ({segment_duration:.2f} seconds)")
-            return None, 0.0, None, None  # Skip very short utterances
-            
-        try:
-            # Generate embedding using our embed module
-            embedding = embed(temp_wav)  # Use the module directly as a callable
-            embedding_np = np.array(embedding)
+        if matches:
+            match = matches[0]
             
-            # Look for top matches
-            top_k = 2 if is_short else 1
-                
-            # Query database
-            results = index.query(
-                vector=embedding_np.tolist(),
-                top_k=top_k,  # Get more matches for short utterances
-                include_metadata=True
-            )
+            # For short utterances, log more details
+            if is_short:
+                for i, match_result in enumerate(matches):
+                    logger.debug(
+                        "Top match %d: %s (score %.4f, short sample: %s)", i + 1,
+                        match_result['metadata']['speaker_name'], match_result['score'],
+                        match_result["metadata"].get("is_short_utterance", False)
+                    )
             
-            if results["matches"]:
-                match = results["matches"][0]
-                
-                # For short utterances, print more details
-                if is_short:
-                    print(f"  Top matches:")
-                    for i, match_result in enumerate(results["matches"]):
-                        is_short_sample = match_result["metadata"].get("is_short_utterance", False)
-                        print(f"   {i+1}. {match_result['metadata']['speaker_name']} "
-                              f"(score: {match_result['score']:.4f}, "
-                              f"short sample: {is_short_sample})")
-                
-                if match["score"] >= confidence_threshold:
-                    return match["metadata"]["speaker_name"], match["score"], match["id"], embedding_np
-        except Exception as e:
-            print(f"  Error getting embedding: {str(e)}")
-            return None, 0.0, None, None
-    
-    finally:
-        if os.path.exists(temp_wav):
-            os.remove(temp_wav)
+            if match["score"] >= confidence_threshold:
+                return match["metadata"]["speaker_name"], match["score"], match["id"], embedding_np
+    except Exception as e:
+        logger.error("Error getting embedding for utterance %d: %s", utterance_id, e)
+        return None, 0.0, None, None
     
     return None, 0.0, None, None
 
-def identify_unknown_speakers_by_combining(utterance_metadata, conversation_info, full_audio, match_threshold=MATCH_THRESHOLD, auto_update_threshold=AUTO_UPDATE_CONFIDENCE_THRESHOLD):
+def identify_unknown_speakers_by_combining(utterance_metadata, conversation_info, full_audio, match_threshold=MATCH_THRESHOLD, auto_update_threshold=AUTO_UPDATE_CONFIDENCE_THRESHOLD, auto_update_buffer=None):
     """Combine utterances from unknown speakers to create more robust samples for identification"""
     # Group utterances by unknown speaker ID and track short utterances
     unknown_speakers = {}
@@ -200,63 +255,62 @@ def identify_unknown_speakers_by_combining(utterance_metadata, conversation_info
     if not unknown_speakers:
         return utterance_metadata
         
-    print(f"Found {len(unknown_speakers)} unknown speaker(s) to process")
-    print(f"Including {len(unknown_short_utterances)} speaker(s) with short utterances")
+    logger.info(
+        "Found %d unknown speaker(s) to process (%d with short utterances)",
+        len(unknown_speakers), len(unknown_short_utterances)
+    )
     
     # Process each unknown speaker
     for unknown_speaker, utterances in unknown_speakers.items():
-        print(f"\nProcessing {unknown_speaker} with {len(utterances)} utterances")
+        logger.info("Combining %d utterances of %s", len(utterances), unknown_speaker)
         
-        # Combine audio segments
-        combined_audio = AudioSegment.empty()
-        for utterance in utterances:
-            start_ms = utterance["start_ms"]
-            end_ms = utterance["end_ms"]
-            segment = full_audio[start_ms:end_ms]
-            combined_audio += segment
+        # Combine the speech of each utterance, without its silences (not recorded in the
+        # VAD totals again: the first pass already counted these utterances)
+        combined_audio = PCMBuffer.concatenate(
+            trim_silence(full_audio[utterance["start_ms"]:utterance["end_ms"]])
+            for utterance in utterances
+        )
             
-        # Save combined audio to temp file
-        temp_file = f"temp_combined_{unknown_speaker}.wav"
-        combined_audio.export(temp_file, format="wav")
+        # Upload to S3 (compressed)
+        s3_path = utterance_s3_path(conversation_info['conversation_id'], f"combined_{unknown_speaker}")
+        store_audio(combined_audio, s3_path)
         
-        try:
-            # Upload to S3
-            s3_path = f"{S3_BASE_PATH}/{conversation_info['conversation_id']}/{S3_UTTERANCES_PATH}/combined_{unknown_speaker}.wav"
-            uploadFile(temp_file, s3_path)
-            
-            # Test the combined sample against database
-            embedding = embed(temp_file)
-            embedding_np = np.array(embedding)
+        # Test the combined sample against database
+        embedding_np = embed_audio(combined_audio)
+        with track_call("vector", "query", top_k=1):
             results = index.query(
                 vector=embedding_np.tolist(),
                 top_k=1,
                 include_metadata=True
             )
+        
+        if results["matches"] and results["matches"][0]["score"] >= match_threshold:  # Using passed threshold
+            match = results["matches"][0]
+            speaker_name = match["metadata"]["speaker_name"]
+            confidence = match["score"]
+            embedding_id = match["id"]
             
-            if results["matches"] and results["matches"][0]["score"] >= match_threshold:  # Using passed threshold
-                match = results["matches"][0]
-                speaker_name = match["metadata"]["speaker_name"]
-                confidence = match["score"]
-                embedding_id = match["id"]
-                
-                print(f"  ✅ Identified as {speaker_name} (confidence: {confidence:.4f})")
-                
-                # Update all utterances from this unknown speaker
-                for utterance in utterances:
-                    # Update the speaker if we found a match
-                    utterance["speaker"] = speaker_name
-                    utterance["confidence"] = confidence
-                    utterance["embedding_id"] = embedding_id
-                    utterance["combined_identification"] = True
-                    
-                    # Update S3 path
-                    utterance["s3_path"] = f"{S3_BASE_PATH}/{conversation_info['conversation_id']}/{S3_UTTERANCES_PATH}/utterance_{utterance['id']:03d}.wav"
+            logger.info("Identified %s as %s (confidence %.4f)", unknown_speaker, speaker_name, confidence)
+            
+            # Update all utterances from this unknown speaker
+            for utterance in utterances:
+                # Update the speaker if we found a match
+                utterance["speaker"] = speaker_name
+                utterance["confidence"] = confidence
+                utterance["embedding_id"] = embedding_id
+                utterance["combined_identification"] = True
                 
-                # Auto-update Pinecone with high-confidence combined embeddings
-                if confidence > auto_update_threshold:
-                    # Generate source info for metadata
-                    source_info = f"{S3_BASE_PATH}/{conversation_info['conversation_id']}/{S3_UTTERANCES_PATH}/combined_{unknown_speaker}.wav"
-                    # Try to auto-update the database
+                # Update S3 path
+                utterance["s3_path"] = utterance_s3_path(conversation_info['conversation_id'], f"utterance_{utterance['id']:03d}")
+            
+            # Auto-update Pinecone with high-confidence combined embeddings
+            if confidence > auto_update_threshold:
+                # Generate source info for metadata
+                source_info = s3_path
+                # Queue for the batched update, or write immediately if no buffer was given
+                if auto_update_buffer is not None:
+                    auto_update_buffer.add(embedding_np, speaker_name, source_info, confidence, gallery_score=confidence)
+                else:
                     auto_update_embedding(
                         embedding_np=embedding_np, 
                         speaker_name=speaker_name, 
@@ -265,44 +319,106 @@ def identify_unknown_speakers_by_combining(utterance_metadata, conversation_info
                         confidence=confidence,
                         threshold=auto_update_threshold
                     )
-        
-        finally:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
     
     return utterance_metadata
 
-def process_conversation(file_path, conversation_id=None, display_name=None, match_threshold=MATCH_THRESHOLD, auto_update_threshold=AUTO_UPDATE_CONFIDENCE_THRESHOLD):
-    """Process an audio file and identify speakers"""
-    print(f"\n🎙 Processing conversation: {file_path}")
+class UtteranceCommitBuffer:
+    """Queue identified utterances and commit them to the database in small batches"""
+
+    def __init__(self, conversation_id, total, timer=None):
+        self.conversation_id = conversation_id
+        self.total = total
+        self.timer = timer
+        self.pending = []
+        self.last_commit = time.monotonic()
+
+    def add(self, utterance_data, utterance_info):
+        """Queue an utterance; commits the batch when it is full or old enough"""
+        self.pending.append((utterance_data, utterance_info))
+        if len(self.pending) >= UTTERANCE_COMMIT_BATCH or time.monotonic() - self.last_commit >= UTTERANCE_COMMIT_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """Commit the queued utterances, recording each one's database ID in its metadata"""
+        if self.pending:
+            with timed(self.timer, "db"):
+                utterance_db_ids = add_utterances([utterance_info for _, utterance_info in self.pending])
+            for (utterance_data, _), utterance_db_id in zip(self.pending, utterance_db_ids):
+                utterance_data["db_id"] = utterance_db_id
+                publish(self.conversation_id, "utterance", index=utterance_data["id"], total=self.total, status="stored")
+            self.pending = []
+        self.last_commit = time.monotonic()
+
+@traced()
+def process_conversation(file_path, conversation_id=None, display_name=None, match_threshold=MATCH_THRESHOLD, auto_update_threshold=AUTO_UPDATE_CONFIDENCE_THRESHOLD, content_hash=None, idempotency_key=None, workspace=None):
+    """Process an audio file and identify speakers (scratch files go in workspace, or a new one).
+
+    The conversation is stored with status "processing" and its utterances are
+    committed in batches as they are identified, so partial results can be read
+    before it is marked "completed". Progress is also published to
+    modules.events under conversation_id.
+    """
+    logger.info("Processing conversation %s", file_path)
     
     # Create conversation ID if not provided
     if not conversation_id:
         conversation_id = f"convo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    annotate(conversation_id=conversation_id, file=os.path.basename(file_path))
         
-    # Convert to WAV if needed
-    wav_file = convert_to_wav(file_path)
-    
-    # Load audio file for processing
-    full_audio = AudioSegment.from_wav(wav_file)
+    timer = StageTimer(conversation_id)
+    own_workspace = workspace is None
+    if own_workspace:
+        workspace = Workspace(conversation_id)
     
-    # Transcribe audio using AssemblyAI
-    transcript_data = transcribe(wav_file)
-    
-    # Extract utterances with speaker labels
-    utterances = transcript_data.get('utterances', [])
+    # Store the original upload and submit it for transcription while it is
+    # decoded locally; AssemblyAI timestamps are relative to the same media
+    original_s3_path = original_s3_path_for(conversation_id, file_path)
+    background = ThreadPoolExecutor(max_workers=3, thread_name_prefix="ingest")
+    original_upload = background.submit(in_current_context(store_original_audio), file_path, original_s3_path, workspace.disk_dir)
+    transcription = background.submit(in_current_context(transcribe), file_path)
+    full_audio = None
+    result = None
+    db_conversation_id = None
     
     try:
+        # Decode once to the canonical format; every later stage slices this buffer
+        publish(conversation_id, "stage", stage="decode")
+        with timer.stage("decode"):
+            full_audio = decode_audio(file_path, workdir=workspace.disk_dir)
+        # Waveform peaks for the player are computed from the same buffer in the background
+        background.submit(in_current_context(store_waveform), full_audio, conversation_id)
+        
+        # Wait for the transcript (only the time not hidden behind decoding is counted)
+        publish(conversation_id, "stage", stage="transcribe")
+        with timer.stage("transcribe"):
+            transcript_data = transcription.result()
+        
+        # Extract utterances with speaker labels
+        utterances = transcript_data.get('utterances', [])
+        publish(conversation_id, "transcribed", utterances=len(utterances))
+        
         # Add conversation to database
         conversation_info = {
             'conversation_id': conversation_id,
             'original_audio': os.path.basename(file_path),
+            'original_s3_path': original_s3_path,
             'duration_seconds': len(full_audio) / 1000.0,
-            'display_name': display_name
+            'display_name': display_name,
+            'content_hash': content_hash,
+            'idempotency_key': idempotency_key,
+            'status': 'processing'
         }
-        db_conversation_id = add_conversation(conversation_info)
+        with timer.stage("db"):
+            db_conversation_id = add_conversation(conversation_info)
+
+        # Auto-update candidates are buffered and written in one batch at the end
+        auto_update_buffer = AutoUpdateBuffer(index, auto_update_threshold)
+        trim_stats = TrimStats()
+        commit_buffer = UtteranceCommitBuffer(conversation_id, len(utterances), timer)
+        speaker_ids = {}
 
         # Process utterances and store in S3/database
+        publish(conversation_id, "stage", stage="identify")
         utterance_metadata = []
         for i, utterance in enumerate(utterances):
             # TODO: TEMPORARY FIX - AssemblyAI should be returning "words" field but isn't
@@ -319,23 +435,33 @@ def process_conversation(file_path, conversation_id=None, display_name=None, mat
 
             # Only process if duration is sufficient
             if duration_ms < 700:  # Skip very short utterances
-                print(f"  Skipping short utterance ({duration_ms}ms)")
+                logger.info("Skipping short utterance %d (%dms)", i, duration_ms, extra=SAMPLED)
+                publish(conversation_id, "utterance", index=i, total=len(utterances), status="skipped")
                 continue
 
             audio_segment = full_audio[start_ms:end_ms]
 
             # Test the segment
             speaker_name, confidence, embedding_id, embedding = test_voice_segment(
-                audio_segment, conversation_id, i, match_threshold
+                audio_segment, conversation_id, i, match_threshold, timer=timer, trim_stats=trim_stats,
+                source_span=(file_path, start_ms, end_ms)
             )
 
             # If no speaker found, use AssemblyAI's label
+            matched = bool(speaker_name)
             if not speaker_name:
                 speaker_name = f"Speaker_{utterance['speaker']}"
                 confidence = utterance.get("confidence", 0.0)
+            publish(conversation_id, "utterance", index=i, total=len(utterances), status="matched",
+                    speaker=speaker_name, confidence=confidence, matched=matched)
+            logger.info("Utterance %d/%d: %s (confidence %.4f, matched %s)", i + 1, len(utterances),
+                        speaker_name, confidence or 0.0, matched, extra=SAMPLED)
 
             # Add speaker to database if new
-            speaker_id = add_speaker(speaker_name)
+            if speaker_name not in speaker_ids:
+                with timer.stage("db"):
+                    speaker_ids[speaker_name] = add_speaker(speaker_name)
+            speaker_id = speaker_ids[speaker_name]
 
             # Store metadata
             utterance_data = {
@@ -356,23 +482,15 @@ def process_conversation(file_path, conversation_id=None, display_name=None, mat
             # Auto-update Pinecone with high-confidence embeddings
             if embedding is not None and confidence > auto_update_threshold:
                 # Generate source info for metadata
-                source_info = f"{S3_BASE_PATH}/{conversation_id}/{S3_UTTERANCES_PATH}/utterance_{i:03d}.wav"
-                # Try to auto-update the database
-                auto_update_embedding(
-                    embedding_np=embedding,
-                    speaker_name=speaker_name,
-                    audio_source=source_info,
-                    index=index,
-                    confidence=confidence,
-                    threshold=auto_update_threshold
-                )
-
-            # Add utterance to database
-            s3_path = f"{S3_BASE_PATH}/{conversation_id}/{S3_UTTERANCES_PATH}/utterance_{i:03d}.wav"
-            add_utterance(utterance_info={
+                source_info = utterance_s3_path(conversation_id, f"utterance_{i:03d}")
+                # Queue for the batched update at the end of ingest; the match score
+                # is already this embedding's best similarity to the gallery
+                auto_update_buffer.add(embedding, speaker_name, source_info, confidence, gallery_score=confidence)
+
+            # Queue the utterance for the next batched database commit
+            s3_path = utterance_s3_path(conversation_id, f"utterance_{i:03d}")
+            commit_buffer.add(utterance_data, {
                 'utterance_id': f"utterance_{uuid.uuid4().hex[:8]}",
-                'start_time': format_time(start_ms),
-                'end_time': format_time(end_ms),
                 'start_ms': start_ms,
                 'end_ms': end_ms,
                 'text': utterance["text"],
@@ -380,32 +498,87 @@ def process_conversation(file_path, conversation_id=None, display_name=None, mat
                 'embedding_id': embedding_id,
                 's3_path': s3_path,
                 'speaker_id': speaker_id,
-                'speaker': speaker_name,
                 'conversation_id': db_conversation_id,
                 'words': utterance.get("words", [])  # TODO: Should have words but field missing - debug later
             })
+        commit_buffer.flush()
 
         # Try to identify unknown speakers by combining their utterances
-        utterance_metadata = identify_unknown_speakers_by_combining(
-            utterance_metadata,
-            {"conversation_id": conversation_id},
-            full_audio,
-            match_threshold,
-            auto_update_threshold
+        publish(conversation_id, "stage", stage="combine")
+        with timer.stage("combine"):
+            utterance_metadata = identify_unknown_speakers_by_combining(
+                utterance_metadata,
+                {"conversation_id": conversation_id},
+                full_audio,
+                match_threshold,
+                auto_update_threshold,
+                auto_update_buffer
+            )
+
+        # Utterances are already committed, so store the speakers found by combining
+        combined_updates = []
+        for utterance_data in utterance_metadata:
+            if utterance_data.get("combined_identification") and utterance_data.get("db_id"):
+                speaker_name = utterance_data["speaker"]
+                with timer.stage("db"):
+                    if speaker_name not in speaker_ids:
+                        speaker_ids[speaker_name] = add_speaker(speaker_name)
+                combined_updates.append((
+                    utterance_data["db_id"], speaker_ids[speaker_name],
+                    utterance_data["confidence"], utterance_data["embedding_id"]
+                ))
+        with timer.stage("db"):
+            update_utterance_speakers(combined_updates)
+
+        # Write all deduplicated auto-update embeddings in one batched upsert
+        publish(conversation_id, "stage", stage="auto_update")
+        with timer.stage("auto_update"):
+            auto_update_buffer.flush()
+
+        vad_summary = trim_stats.summary()
+        logger.info(
+            "VAD trimmed %.1fs of non-speech from %.1fs across %d clip(s)",
+            vad_summary['seconds_saved'], vad_summary['input_seconds'], vad_summary['clips'],
+            extra={"conversation_id": conversation_id, "vad": vad_summary}
         )
 
-        return {
+        result = {
             "conversation_id": conversation_id,
             "original_file": os.path.basename(file_path),
-            "s3_path": s3_path,
+            "s3_path": original_s3_path,
             "utterances": utterance_metadata,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "timings": timer.summary(),
+            "vad": vad_summary
         }
 
+        # Marked completed only once nothing else in the pipeline can fail
+        with timer.stage("db"):
+            set_conversation_status(db_conversation_id, "completed")
+
+    except Exception as e:
+        if db_conversation_id:
+            # Keep the utterances committed so far, but let the upload be retried
+            try:
+                set_conversation_status(db_conversation_id, "failed")
+            except Exception as status_error:
+                logger.error("Error marking conversation %s as failed: %s", conversation_id, status_error)
+        publish(conversation_id, "failed", error=str(e))
+        raise
+
     finally:
-        # Clean up temporary WAV file if it was created
-        if wav_file != file_path and os.path.exists(wav_file):
-            os.remove(wav_file)
-            print(f"Removed temporary file: {wav_file}")
+        with timer.stage("s3_upload"):
+            if not original_upload.result():
+                logger.warning("Failed to store original audio at %s", original_s3_path)
+        background.shutdown(wait=True)
+        if full_audio is not None:
+            full_audio.close()
+        if own_workspace:
+            workspace.cleanup()
+        timer.report()
+
+    # Published last so subscribers see the conversation only once the original is stored
+    publish(conversation_id, "completed", utterances=len(result["utterances"]), duplicate=False)
+    return result
 
 # Remove everything below this point - no main() function needed 
\ No newline at end of file
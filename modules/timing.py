@@ -0,0 +1,50 @@
+"""
+Per-stage wall-clock timing for the ingest pipeline.
+"""
+
+import time
+from contextlib import contextmanager
+from modules.log import get_logger
+from modules.metrics import observe_stages
+from modules.tracing import span
+
+logger = get_logger(__name__)
+
+class StageTimer:
+    """Accumulate elapsed seconds per named pipeline stage"""
+
+    def __init__(self, label):
+        self.label = label
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block, add it to the stage total and trace it as a "stage.<name>" span"""
+        start = time.perf_counter()
+        try:
+            with span(f"stage.{name}"):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def summary(self):
+        """Return {stage: seconds} rounded for reporting"""
+        return {name: round(seconds, 3) for name, seconds in self.timings.items()}
+
+    def report(self):
+        """Log stage totals, slowest first, and record them in the ingest stage histograms"""
+        observe_stages(self.timings)
+        stages = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)
+        logger.info(
+            "Stage timings for %s: %s", self.label, ", ".join(f"{name}={seconds:.2f}s" for name, seconds in stages),
+            extra={"label": self.label, "timings": self.summary()}
+        )
+
+@contextmanager
+def timed(timer, name):
+    """timer.stage(name) when a timer is given, otherwise a no-op"""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
@@ -0,0 +1,162 @@
+"""
+Tracing spans for API requests and the ingest pipeline.
+A span opened inside another becomes its child and shares its trace_id. Every
+HTTP request gets a root span with a request_id (taken from the X-Request-ID
+header or generated, and echoed back in the response), and process_conversation
+tags its span with the conversation_id. Both IDs are copied onto every
+descendant span, so a slow upload's embed, Pinecone, S3 and database calls can
+be found by either.
+
+TRACE_EXPORTER chooses where finished spans go:
+    none     (default) spans are timed but not exported
+    console  each span is logged by this module's logger, as a "span" field
+    file     each span is appended to TRACE_FILE (default traces.jsonl) as a JSON line
+
+Spans follow a context variable, so work handed to another thread only stays in
+the trace when the callable is wrapped with in_current_context.
+"""
+
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from starlette.routing import Match
+from modules.log import get_logger
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# Attributes that are inherited by every descendant span
+CORRELATION_ATTRIBUTES = ("request_id", "conversation_id")
+# Longest X-Request-ID accepted from a client
+MAX_REQUEST_ID_LENGTH = 128
+
+logger = get_logger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_trace_file = None
+_trace_file_lock = threading.Lock()
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.correlation = dict(parent.correlation) if parent else {}
+        self.attributes = {}
+        self.error = None
+        self.started_at = time.time()
+        self.set(**(attributes or {}))
+
+    def set(self, **attributes):
+        """Add attributes; correlation IDs set here are inherited by spans opened afterwards"""
+        self.attributes.update(attributes)
+        self.correlation.update(
+            (key, attributes[key]) for key in CORRELATION_ATTRIBUTES if attributes.get(key) is not None
+        )
+
+    def to_dict(self, duration):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration * 1000, 3),
+            **self.correlation,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+def _export(record):
+    global _trace_file
+    if TRACE_EXPORTER == "console":
+        logger.info("Span %s took %.1f ms", record["name"], record["duration_ms"], extra={"span": record})
+    elif TRACE_EXPORTER == "file":
+        line = json.dumps(record, default=str) + "\n"
+        with _trace_file_lock:
+            if _trace_file is None:
+                _trace_file = open(TRACE_FILE, "a", buffering=1)
+            _trace_file.write(line)
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a child of the current span (or as a new trace) and export it"""
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        if TRACE_EXPORTER != "none":
+            _export(current.to_dict(duration))
+
+def traced(name=None):
+    """Decorator: run every call of the function in a span (named after the function by default)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**attributes):
+    """Add attributes to the current span, if there is one"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+def in_current_context(func):
+    """Wrap func so it runs in a copy of the caller's context, e.g. on another thread, and stays in the trace"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Each call gets its own copy, so the wrapper can run on several threads at once
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+def route_template(scope):
+    """Path template of the route that will handle a request, so IDs don't become labels"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class TracingMiddleware:
+    """Open a root span for each HTTP request and return its request ID in X-Request-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+        request_id = request_id or uuid.uuid4().hex
+
+        with span("http.request", request_id=request_id, method=scope["method"], route=route_template(scope)) as request_span:
+            async def send_with_request_id(message):
+                if message["type"] == "http.response.start":
+                    request_span.set(status=message["status"])
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_request_id)
@@ -0,0 +1,249 @@
+"""
+Resumable chunked uploads for long recordings.
+
+Protocol:
+    POST   /api/uploads                      create a session for a file of known size
+    PUT    /api/uploads/{upload_id}?offset=N  send the bytes starting at offset N
+    GET    /api/uploads/{upload_id}          current offset (resume point) and status
+    POST   /api/uploads/{upload_id}/complete assemble and hand off to ingest
+    DELETE /api/uploads/{upload_id}          abandon the upload
+
+Sessions live on disk under UPLOAD_SESSION_DIR (one directory per upload with
+a meta.json and the partially assembled file), so an interrupted upload can
+resume from the last committed offset. The SHA-256 of the upload is updated
+as chunks arrive, so completing it does not re-read the whole file. A session
+whose ingest job was lost, e.g. to a restart, can be completed again (which
+requeues it) or aborted.
+"""
+
+import os
+import re
+import json
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from werkzeug.utils import secure_filename
+from modules.uploads import UPLOAD_CHUNK_BYTES
+from modules.log import get_logger
+from modules.jobs import get_job
+
+logger = get_logger(__name__)
+
+UPLOAD_SESSION_DIR = os.getenv(
+    "UPLOAD_SESSION_DIR", os.path.join(tempfile.gettempdir(), "speaker-id-uploads")
+)
+MAX_RESUMABLE_UPLOAD_BYTES = int(os.getenv("MAX_RESUMABLE_UPLOAD_MB", "8192")) * 1024 * 1024
+MAX_CHUNK_BYTES = int(os.getenv("MAX_UPLOAD_CHUNK_MB", "64")) * 1024 * 1024
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+# An assembled upload gets its ingest job within moments; one without a job for longer was orphaned
+HANDOFF_GRACE_SECONDS = 60
+
+_session_locks = {}  # {upload_id: [lock, number of holders/waiters]}
+_session_locks_guard = threading.Lock()
+# Running SHA-256 of each upload's committed bytes: {upload_id: [offset, hash]}
+_hashers = {}
+
+@contextmanager
+def _session_lock(upload_id):
+    """Serialize changes to one session; the lock is dropped once nobody holds or waits for it"""
+    with _session_locks_guard:
+        entry = _session_locks.setdefault(upload_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _session_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _session_locks[upload_id]
+
+def _hasher_at(session, offset):
+    """Running hash of the session's data up to offset, rebuilt from the file after a resend or restart"""
+    entry = _hashers.get(session["upload_id"])
+    if entry is None or entry[0] != offset:
+        digest = hashlib.sha256()
+        with open(data_path(session), "rb") as f:
+            remaining = offset
+            while remaining:
+                chunk = f.read(min(UPLOAD_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        entry = _hashers[session["upload_id"]] = [offset, digest]
+    return entry
+
+def _session_dir(upload_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise HTTPException(status_code=404, detail=f"Upload session '{upload_id}' not found")
+    return os.path.join(UPLOAD_SESSION_DIR, upload_id)
+
+def _save_meta(session):
+    meta_path = os.path.join(_session_dir(session["upload_id"]), "meta.json")
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(session, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def data_path(session):
+    """Path of the assembled upload for a session"""
+    return os.path.join(_session_dir(session["upload_id"]), session["data_file"])
+
+def cleanup_expired_sessions():
+    """Remove sessions that have not been touched within the TTL"""
+    if not os.path.isdir(UPLOAD_SESSION_DIR):
+        return
+    cutoff = time.time() - UPLOAD_SESSION_TTL_SECONDS
+    for upload_id in os.listdir(UPLOAD_SESSION_DIR):
+        path = os.path.join(UPLOAD_SESSION_DIR, upload_id)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                logger.info("Removing expired upload session %s", upload_id)
+                shutil.rmtree(path, ignore_errors=True)
+                _hashers.pop(upload_id, None)
+        except OSError:
+            continue
+
+def create_session(filename, size_bytes, options=None):
+    """Create an upload session for a file of the given total size"""
+    if size_bytes <= 0:
+        raise HTTPException(status_code=400, detail="size must be positive")
+    if size_bytes > MAX_RESUMABLE_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload exceeds the maximum size of {MAX_RESUMABLE_UPLOAD_BYTES // (1024 * 1024)} MB"
+        )
+
+    cleanup_expired_sessions()
+
+    upload_id = uuid.uuid4().hex
+    os.makedirs(_session_dir(upload_id))
+    extension = os.path.splitext(secure_filename(filename) or "")[1]
+    session = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "data_file": f"data{extension}",
+        "size": size_bytes,
+        "offset": 0,
+        "status": "uploading",
+        "options": options or {},
+        "job_id": None,
+        "conversation_id": None,
+        "content_hash": None
+    }
+    open(data_path(session), "wb").close()
+    _save_meta(session)
+    return session
+
+def get_session(upload_id):
+    """Load a session's metadata or raise 404"""
+    meta_path = os.path.join(_session_dir(upload_id), "meta.json")
+    if not os.path.exists(meta_path):
+        raise HTTPException(status_code=404, detail=f"Upload session '{upload_id}' not found")
+    with open(meta_path) as f:
+        return json.load(f)
+
+def new_part_path(upload_id):
+    """Reserve a scratch file for an incoming chunk of an existing session"""
+    session = get_session(upload_id)
+    if session["status"] != "uploading":
+        raise HTTPException(status_code=409, detail=f"Upload is already {session['status']}")
+    return os.path.join(_session_dir(upload_id), f"part-{uuid.uuid4().hex}")
+
+def commit_chunk(upload_id, offset, part_path):
+    """Write a received chunk into the assembled file at offset and advance the session.
+
+    Re-sending from an earlier offset (e.g. after a dropped connection)
+    overwrites from that point; skipping ahead of the committed offset is refused.
+    """
+    with _session_lock(upload_id):
+        session = get_session(upload_id)
+        if session["status"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is already {session['status']}")
+        if offset < 0 or offset > session["offset"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Offset {offset} does not match the committed offset {session['offset']}"
+            )
+
+        chunk_size = os.path.getsize(part_path)
+        if offset + chunk_size > session["size"]:
+            raise HTTPException(status_code=400, detail="Chunk extends past the declared upload size")
+
+        hasher = _hasher_at(session, offset)
+        with open(data_path(session), "r+b") as data, open(part_path, "rb") as part:
+            data.seek(offset)
+            for chunk in iter(lambda: part.read(UPLOAD_CHUNK_BYTES), b""):
+                data.write(chunk)
+                hasher[1].update(chunk)
+            data.truncate(offset + chunk_size)
+        hasher[0] = offset + chunk_size
+
+        session["offset"] = offset + chunk_size
+        _save_meta(session)
+        return session
+
+def hash_file(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_abandoned(session):
+    """True if an assembled or processing session has no live ingest job in this process"""
+    if session["status"] not in ("assembled", "processing"):
+        return False
+    if session["job_id"]:
+        job = get_job(session["job_id"])
+        return job is None or job["status"] not in ("queued", "running")
+    return time.time() - session.get("assembled_at", 0) > HANDOFF_GRACE_SECONDS
+
+def finalize_session(upload_id):
+    """Verify the upload is complete and mark it as assembled.
+
+    An assembled or processing session whose job was lost is marked assembled
+    again, so it can be handed to ingest again.
+    """
+    with _session_lock(upload_id):
+        session = get_session(upload_id)
+        if is_abandoned(session) and os.path.exists(data_path(session)):
+            logger.info("Requeueing upload %s, whose ingest job was lost", upload_id)
+            session["status"] = "assembled"
+            session["job_id"] = None
+            session["assembled_at"] = time.time()
+            _save_meta(session)
+            return session
+        if session["status"] != "uploading":
+            raise HTTPException(status_code=409, detail=f"Upload is already {session['status']}")
+        if session["offset"] != session["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: received {session['offset']} of {session['size']} bytes"
+            )
+        session["content_hash"] = _hasher_at(session, session["offset"])[1].hexdigest()
+        _hashers.pop(upload_id, None)
+        session["status"] = "assembled"
+        session["assembled_at"] = time.time()
+        _save_meta(session)
+        return session
+
+def update_session(upload_id, **fields):
+    """Update and persist fields on a session"""
+    with _session_lock(upload_id):
+        session = get_session(upload_id)
+        session.update(fields)
+        _save_meta(session)
+        return session
+
+def delete_session(upload_id):
+    """Remove a session and its data"""
+    shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+    with _session_lock(upload_id):
+        _hashers.pop(upload_id, None)
@@ -0,0 +1,94 @@
+"""
+Upload handling.
+Starlette spools a multipart upload to a temporary file before the route runs;
+save_upload then copies it to the job's workspace in fixed-size chunks instead
+of reading it into memory, enforcing a configurable size limit (MAX_UPLOAD_MB)
+and computing the SHA-256 used for deduplication in the same pass. The
+middleware below rejects oversized bodies before Starlette spools them.
+"""
+
+import os
+import hashlib
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Allowance for multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def too_large_detail(max_bytes):
+    return f"Upload exceeds the maximum size of {max_bytes // (1024 * 1024)} MB"
+
+def copy_stream(source, dest_path, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy a binary file object to dest_path in chunks; returns (size_bytes, sha256_hex)"""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=too_large_detail(max_bytes))
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, digest.hexdigest()
+
+def save_upload(upload, dest_path, max_bytes=MAX_UPLOAD_BYTES):
+    """Copy a spooled FastAPI UploadFile to dest_path, hashing it; returns (size_bytes, sha256_hex)"""
+    upload.file.seek(0)
+    return copy_stream(upload.file, dest_path, max_bytes)
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized request bodies on upload routes before they are buffered.
+
+    Requests with a Content-Length over the limit get a 413 immediately, and
+    a malformed Content-Length a 400; chunked requests are cut off as soon as
+    the running byte count exceeds the limit.
+    """
+
+    def __init__(self, app, path_prefixes, max_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+        self.max_bytes = max_bytes
+        self.max_body_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT")
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        response = None
+        if content_length is not None:
+            if not content_length.strip().isdigit():
+                response = JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header"})
+            elif int(content_length) > self.max_body_bytes:
+                response = JSONResponse(status_code=413, content={"detail": too_large_detail(self.max_bytes)})
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise HTTPException(status_code=413, detail=too_large_detail(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
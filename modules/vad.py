@@ -0,0 +1,82 @@
+"""
+Energy-based voice activity trimming.
+Utterance spans from the transcript include leading/trailing silence and
+pauses; stripping those frames before embedding shrinks the payload sent to the
+embedding service and keeps silence out of the speaker embedding.
+"""
+
+import os
+import threading
+import numpy as np
+from modules.audio import PCMBuffer
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_FRAME_MS = 30
+# Frames this far above the clip's noise floor count as speech
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+# Frames within this range of the loudest frame always count as speech, so a
+# clip that is speech throughout is not mistaken for noise
+VAD_DYNAMIC_RANGE_DB = float(os.getenv("VAD_DYNAMIC_RANGE_DB", "30"))
+# Frames quieter than this are never speech, however quiet the noise floor is
+VAD_FLOOR_DBFS = float(os.getenv("VAD_FLOOR_DBFS", "-50"))
+# Speech is extended by this much on each side so onsets and word tails survive
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "150"))
+# Clips with less detected speech than this are left untrimmed
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "500"))
+
+class TrimStats:
+    """Running totals of audio seen and removed by trimming, for one conversation"""
+
+    def __init__(self):
+        self.input_seconds = 0.0
+        self.output_seconds = 0.0
+        self.clips = 0
+        self._lock = threading.Lock()
+
+    def record(self, before, after):
+        with self._lock:
+            self.input_seconds += before.duration_seconds
+            self.output_seconds += after.duration_seconds
+            self.clips += 1
+
+    def summary(self):
+        return {
+            "clips": self.clips,
+            "input_seconds": round(self.input_seconds, 3),
+            "speech_seconds": round(self.output_seconds, 3),
+            "seconds_saved": round(self.input_seconds - self.output_seconds, 3)
+        }
+
+def speech_frame_mask(samples, sample_rate, frame_ms=VAD_FRAME_MS):
+    """Boolean speech/non-speech decision per frame (a trailing partial frame is dropped)"""
+    frame_length = sample_rate * frame_ms // 1000
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = np.asarray(samples[:frame_count * frame_length], dtype=np.float32).reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+
+    # The quieter frames of an utterance approximate its noise floor
+    noise_floor_db = np.percentile(energy_db, 10)
+    threshold_db = min(noise_floor_db + VAD_MARGIN_DB, energy_db.max() - VAD_DYNAMIC_RANGE_DB)
+    speech = energy_db > max(threshold_db, VAD_FLOOR_DBFS)
+
+    hangover = VAD_HANGOVER_MS // frame_ms
+    if hangover and speech.any():
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode="same") > 0
+    return speech
+
+def trim_silence(audio, stats=None):
+    """Return a PCMBuffer with non-speech frames removed (the input itself if trimming is off or would leave too little)"""
+    trimmed = audio
+    if VAD_ENABLED:
+        speech = speech_frame_mask(audio.samples, audio.sample_rate)
+        frame_length = audio.sample_rate * VAD_FRAME_MS // 1000
+        if speech.sum() * VAD_FRAME_MS >= VAD_MIN_SPEECH_MS and not speech.all():
+            frames = np.asarray(audio.samples[:len(speech) * frame_length]).reshape(len(speech), frame_length)
+            trimmed = PCMBuffer(frames[speech].reshape(-1), audio.sample_rate)
+    if stats is not None:
+        stats.record(audio, trimmed)
+    return trimmed
@@ -0,0 +1,74 @@
+"""
+Precomputed waveform peaks for the conversation player.
+Ingest reduces the decoded PCM to min/max peak pairs at several zoom levels so
+the UI can draw a conversation's waveform without downloading its audio.
+
+Binary layout (little-endian):
+    header   magic "SPKW", version u8, sample_rate u32, level_count u8
+    levels   level_count x (samples_per_peak u32, peak_count u32)
+    data     for each level in order, peak_count x (min i8, max i8)
+"""
+
+import struct
+import numpy as np
+
+WAVEFORM_MAGIC = b"SPKW"
+WAVEFORM_VERSION = 1
+WAVEFORM_CONTENT_TYPE = "application/octet-stream"
+# Samples per peak for each zoom level; each level must be a multiple of the previous one
+WAVEFORM_ZOOM_LEVELS = (256, 1024, 4096, 16384)
+# Samples read per pass over a (possibly memory-mapped) buffer
+WAVEFORM_CHUNK_SAMPLES = 256 * 4096
+
+def _reduce(values, factor, reducer):
+    """Apply reducer over consecutive groups of factor values, padding the tail with its last value"""
+    groups = -(-len(values) // factor)
+    padding = groups * factor - len(values)
+    if padding:
+        values = np.concatenate([values, np.repeat(values[-1:], padding)])
+    return reducer(values.reshape(groups, factor), axis=1)
+
+def compute_peaks(samples, zoom_levels=WAVEFORM_ZOOM_LEVELS):
+    """Return [(samples_per_peak, mins, maxs)] for each zoom level, finest first"""
+    finest = zoom_levels[0]
+    peak_count = -(-len(samples) // finest)
+    mins = np.empty(peak_count, dtype=np.int16)
+    maxs = np.empty(peak_count, dtype=np.int16)
+
+    # The finest level is computed in chunks so memory-mapped audio is read sequentially
+    for start in range(0, len(samples), WAVEFORM_CHUNK_SAMPLES):
+        chunk = np.asarray(samples[start:start + WAVEFORM_CHUNK_SAMPLES])
+        first = start // finest
+        chunk_mins = _reduce(chunk, finest, np.min)
+        mins[first:first + len(chunk_mins)] = chunk_mins
+        maxs[first:first + len(chunk_mins)] = _reduce(chunk, finest, np.max)
+
+    levels = [(finest, mins, maxs)]
+    for samples_per_peak in zoom_levels[1:]:
+        previous, previous_mins, previous_maxs = levels[-1]
+        factor = samples_per_peak // previous
+        if len(previous_mins) == 0:
+            levels.append((samples_per_peak, previous_mins, previous_maxs))
+            continue
+        levels.append((
+            samples_per_peak,
+            _reduce(previous_mins, factor, np.min),
+            _reduce(previous_maxs, factor, np.max)
+        ))
+    return levels
+
+def encode_peaks(levels, sample_rate):
+    """Pack peak levels into the compact binary waveform format"""
+    parts = [struct.pack("<4sBIB", WAVEFORM_MAGIC, WAVEFORM_VERSION, sample_rate, len(levels))]
+    parts.extend(struct.pack("<II", samples_per_peak, len(mins)) for samples_per_peak, mins, _ in levels)
+    for _, mins, maxs in levels:
+        pairs = np.empty(len(mins) * 2, dtype=np.int8)
+        # Keep the top 8 bits of each int16 peak
+        pairs[0::2] = mins >> 8
+        pairs[1::2] = maxs >> 8
+        parts.append(pairs.tobytes())
+    return b"".join(parts)
+
+def waveform_bytes(audio):
+    """Compute and encode the waveform of a PCMBuffer"""
+    return encode_peaks(compute_peaks(audio.samples), audio.sample_rate)
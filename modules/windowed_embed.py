@@ -0,0 +1,48 @@
+"""
+Bounded-cost embeddings for long clips.
+Clips up to EMBED_MAX_SINGLE_MS are embedded in one request. Longer clips
+(monologues, combined samples) are cut into fixed windows with a hop, at most
+EMBED_MAX_WINDOWS of them spread evenly over the clip. The windows are
+embedded concurrently and their L2-normalized vectors are mean-pooled.
+"""
+
+import os
+import numpy as np
+from modules import embed
+from modules.audio import to_wav_bytes
+from modules.timing import timed
+
+EMBED_WINDOW_MS = int(os.getenv("EMBED_WINDOW_MS", "4000"))
+EMBED_HOP_MS = int(os.getenv("EMBED_HOP_MS", "2000"))
+EMBED_MAX_WINDOWS = int(os.getenv("EMBED_MAX_WINDOWS", "8"))
+# Clips up to this long are embedded whole
+EMBED_MAX_SINGLE_MS = int(os.getenv("EMBED_MAX_SINGLE_MS", "6000"))
+
+def window_starts(duration_ms, window_ms=EMBED_WINDOW_MS, hop_ms=EMBED_HOP_MS, max_windows=EMBED_MAX_WINDOWS):
+    """Start offsets (ms) of the windows covering a clip, spread evenly when capped"""
+    if duration_ms <= window_ms:
+        return [0]
+    count = min(1 + -(-(duration_ms - window_ms) // hop_ms), max_windows)
+    return [int(round(start)) for start in np.linspace(0, duration_ms - window_ms, count)]
+
+def pool_embeddings(vectors):
+    """Mean of L2-normalized vectors, renormalized"""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    pooled = (vectors / np.maximum(norms, 1e-12)).mean(axis=0)
+    return pooled / max(np.linalg.norm(pooled), 1e-12)
+
+def embed_audio(audio, timer=None):
+    """Embed a PCMBuffer as a NumPy vector, pooling windows for long clips"""
+    duration_ms = len(audio)
+    if duration_ms <= EMBED_MAX_SINGLE_MS:
+        with timed(timer, "slice"):
+            wav_bytes = to_wav_bytes(audio)
+        with timed(timer, "embed"):
+            return np.array(embed(wav_bytes))
+
+    with timed(timer, "slice"):
+        payloads = [to_wav_bytes(audio[start:start + EMBED_WINDOW_MS]) for start in window_starts(duration_ms)]
+    with timed(timer, "embed"):
+        vectors = embed.batch(payloads)
+    return pool_embeddings(vectors)
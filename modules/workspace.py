@@ -0,0 +1,114 @@
+"""
+Per-job scratch directories for ingest.
+Every request or background job that needs scratch files gets its own
+directory, removed when the job finishes, so concurrent jobs in one process (or
+several workers in one container) never share a file name.
+
+Small scratch files go on tmpfs (/dev/shm) when it is available. Large files
+such as the memory-mapped decode of a long recording use a disk-backed
+directory instead, so they do not pin RAM.
+"""
+
+import os
+import re
+import time
+import uuid
+import shutil
+import tempfile
+from modules.log import get_logger
+
+logger = get_logger(__name__)
+
+WORKSPACE_PREFIX = "speaker-id-job-"
+TMPFS_DIR = "/dev/shm"
+# Workspaces untouched for this long are assumed to belong to a dead process.
+# PIDs cannot tell: they are reused, especially in containers where every start gets the same ones
+WORKSPACE_STALE_SECONDS = int(os.getenv("WORKSPACE_STALE_HOURS", "24")) * 3600
+
+# Workspaces owned by this process, never removed as stale
+_active = set()
+
+def _writable_dir(path):
+    return bool(path) and os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK)
+
+def scratch_root():
+    """Directory for small scratch files: INGEST_SCRATCH_DIR, else tmpfs, else the system temp dir"""
+    configured = os.getenv("INGEST_SCRATCH_DIR")
+    if configured:
+        os.makedirs(configured, exist_ok=True)
+        return configured
+    if _writable_dir(TMPFS_DIR):
+        return TMPFS_DIR
+    return tempfile.gettempdir()
+
+def disk_root():
+    """Directory for large scratch files that should not live in memory"""
+    return os.getenv("INGEST_DISK_SCRATCH_DIR") or tempfile.gettempdir()
+
+class Workspace:
+    """Scratch directories owned by one job; use as a context manager or call cleanup()"""
+
+    def __init__(self, label="job"):
+        safe_label = re.sub(r"[^A-Za-z0-9_-]", "_", str(label))[:40]
+        self.name = f"{WORKSPACE_PREFIX}{safe_label}-{uuid.uuid4().hex[:8]}"
+        self.dir = os.path.join(scratch_root(), self.name)
+        os.makedirs(self.dir)
+        _active.add(self.name)
+        self._disk_dir = None
+
+    @property
+    def disk_dir(self):
+        """Disk-backed directory for large files, created on first use"""
+        if self._disk_dir is None:
+            disk_dir = os.path.join(disk_root(), self.name)
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_dir = disk_dir
+        return self._disk_dir
+
+    def path(self, filename):
+        """Path for a small scratch file in this workspace"""
+        return os.path.join(self.dir, os.path.basename(filename))
+
+    def disk_path(self, filename):
+        """Path for a large scratch file, such as a raw upload, in the disk-backed directory"""
+        return os.path.join(self.disk_dir, os.path.basename(filename))
+
+    def cleanup(self):
+        _active.discard(self.name)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        if self._disk_dir:
+            shutil.rmtree(self._disk_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+def _last_modified(path):
+    """Newest mtime of a directory and the files directly in it"""
+    latest = os.stat(path).st_mtime
+    for entry in os.scandir(path):
+        latest = max(latest, entry.stat(follow_symlinks=False).st_mtime)
+    return latest
+
+def cleanup_stale_workspaces(max_age=None):
+    """Remove workspaces of other processes that have not been touched for WORKSPACE_STALE_SECONDS"""
+    max_age = WORKSPACE_STALE_SECONDS if max_age is None else max_age
+    cutoff = time.time() - max_age
+    for root in {scratch_root(), disk_root()}:
+        try:
+            entries = os.listdir(root)
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.startswith(WORKSPACE_PREFIX) or entry in _active:
+                continue
+            path = os.path.join(root, entry)
+            try:
+                stale = _last_modified(path) < cutoff
+            except OSError:
+                continue
+            if stale:
+                logger.info("Removing stale job workspace %s", entry)
+                shutil.rmtree(path, ignore_errors=True)
@@ -281,6 +281,7 @@ async function loadConversations() {
             const utteranceCount = conv.utterance_count || 0;
             const speakerCount = conv.speaker_count || 0;
             const duration = conv.duration ? formatTime(conv.duration * 1000) : '0:00';
+            const statusNote = conv.status === 'processing' ? '<span class="meta-item">• processing…</span>' : '';
 
             // Generate HTML matching the CSS
             card.innerHTML = `
@@ -292,6 +293,7 @@ async function loadConversations() {
                     <span class="meta-item">${duration}</span>
                     <span class="meta-item">• ${utteranceCount} utterances</span>
                     <span class="meta-item">• ${speakerCount} speakers: ${speakerNames}</span> 
+                    ${statusNote}
                     </div>
                 `;
             
@@ -604,14 +606,120 @@ function renderConversationDetail(conversation) {
             </div>
             <div class="summary-item">
                 <span class="summary-label">Utterances</span>
-                <span class="summary-value">${conversation.utterances.length}</span>
+                <span class="summary-value">${conversation.utterances.length}${conversation.status === 'processing' ? ' (processing…)' : ''}</span>
             </div>
         </div>
         
+        <div class="waveform-container" id="waveform-container">
+            <canvas id="conversation-waveform" class="conversation-waveform" height="80"></canvas>
+        </div>
+        
         <div class="transcript-container" id="transcript-container">
             ${conversation.utterances.map(u => createUtteranceElement(u, conversation.id)).join('')}
         </div>
     `;
+
+    renderWaveform(conversation.id);
+
+    // Utterances are committed while a recording is still processing; keep refreshing until it completes
+    if (conversation.status === 'processing') {
+        scheduleConversationRefresh(conversation.id);
+    }
+}
+
+const CONVERSATION_REFRESH_MS = 5000;
+let conversationRefreshTimer = null;
+
+function scheduleConversationRefresh(conversationId) {
+    clearTimeout(conversationRefreshTimer);
+    conversationRefreshTimer = setTimeout(async () => {
+        const detailView = document.getElementById('conversation-detail-view');
+        if (!detailView?.classList.contains('active') || currentConversation?.id !== conversationId) return;
+        // Don't re-render under a title edit in progress
+        if (document.getElementById('conversation-title')?.isContentEditable) {
+            scheduleConversationRefresh(conversationId);
+            return;
+        }
+        try {
+            const response = await fetch(`/api/conversations/${conversationId}`);
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            currentConversation = await response.json();
+            renderConversationDetail(currentConversation);
+        } catch (error) {
+            console.error('Error refreshing conversation:', error);
+            scheduleConversationRefresh(conversationId);
+        }
+    }, CONVERSATION_REFRESH_MS);
+}
+
+// Parse the binary peaks format served by /api/conversations/{id}/waveform
+function parseWaveform(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'SPKW') {
+        throw new Error('Unrecognized waveform format');
+    }
+    const sampleRate = view.getUint32(5, true);
+    const levelCount = view.getUint8(9);
+    const levels = [];
+    let offset = 10;
+    for (let i = 0; i < levelCount; i++) {
+        levels.push({ samplesPerPeak: view.getUint32(offset, true), peakCount: view.getUint32(offset + 4, true) });
+        offset += 8;
+    }
+    for (const level of levels) {
+        // Interleaved (min, max) pairs
+        level.peaks = new Int8Array(buffer, offset, level.peakCount * 2);
+        offset += level.peakCount * 2;
+    }
+    return { sampleRate, levels };
+}
+
+async function renderWaveform(conversationId) {
+    const canvas = document.getElementById('conversation-waveform');
+    const container = document.getElementById('waveform-container');
+    if (!canvas) return;
+
+    try {
+        const response = await fetch(`/api/conversations/${conversationId}/waveform`);
+        if (!response.ok) {
+            // Conversations ingested before waveforms were stored have none
+            container.style.display = 'none';
+            return;
+        }
+        const waveform = parseWaveform(await response.arrayBuffer());
+
+        const width = canvas.clientWidth || 800;
+        canvas.width = width;
+        // Coarsest zoom level that still has at least one peak per pixel
+        const level = [...waveform.levels].reverse().find(l => l.peakCount >= width) || waveform.levels[0];
+        if (!level || level.peakCount === 0) {
+            container.style.display = 'none';
+            return;
+        }
+
+        const ctx = canvas.getContext('2d');
+        const mid = canvas.height / 2;
+        const peaksPerPixel = level.peakCount / width;
+        ctx.clearRect(0, 0, width, canvas.height);
+        ctx.fillStyle = getComputedStyle(canvas).color;
+        for (let x = 0; x < width; x++) {
+            const start = Math.floor(x * peaksPerPixel);
+            const end = Math.min(level.peakCount, Math.max(start + 1, Math.floor((x + 1) * peaksPerPixel)));
+            let min = 0;
+            let max = 0;
+            for (let i = start; i < end; i++) {
+                min = Math.min(min, level.peaks[2 * i]);
+                max = Math.max(max, level.peaks[2 * i + 1]);
+            }
+            const top = mid - (max / 128) * mid;
+            const bottom = mid - (min / 128) * mid;
+            ctx.fillRect(x, top, 1, Math.max(1, bottom - top));
+        }
+    } catch (error) {
+        console.error('Error rendering waveform:', error);
+        container.style.display = 'none';
+    }
 }
 
 function createUtteranceElement(utterance, conversationId) {
@@ -996,6 +1104,58 @@ function completeProcessing(success = true) {
     processingInProgress = false;
 }
 
+// Server ingest stages -> upload view status steps
+const INGEST_STAGE_STEPS = {
+    decode: 'transcribe',
+    transcribe: 'transcribe',
+    identify: 'identify',
+    combine: 'identify',
+    auto_update: 'database'
+};
+
+// Follow a conversation's ingest progress over Server-Sent Events until it completes or fails
+function followIngestEvents(eventsUrl) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(eventsUrl);
+        const parse = event => JSON.parse(event.data);
+
+        source.addEventListener('queued', () => addLogEntry('Waiting for a free worker...'));
+        // Sent when another worker is processing the conversation; the stream reconnects and checks again
+        source.addEventListener('processing', () => addLogEntry('Still processing...'));
+        source.addEventListener('stage', event => {
+            const { stage } = parse(event);
+            const step = INGEST_STAGE_STEPS[stage];
+            if (step && step !== currentStep) updateProcessingStep(step, 'pending');
+            addLogEntry(`Stage: ${stage}`);
+        });
+        source.addEventListener('transcribed', event => {
+            addLogEntry(`Transcription complete: ${parse(event).utterances} utterances.`);
+        });
+        source.addEventListener('utterance', event => {
+            const data = parse(event);
+            const position = `Utterance ${data.index + 1}/${data.total}`;
+            if (data.status === 'matched') {
+                const how = data.matched ? `matched ${data.speaker} (${(data.confidence * 100).toFixed(1)}%)` : `unknown, labelled ${data.speaker}`;
+                addLogEntry(`${position}: ${how}`);
+            } else if (data.status === 'skipped') {
+                addLogEntry(`${position}: too short, skipped`);
+            }
+        });
+        source.addEventListener('completed', event => {
+            source.close();
+            resolve(parse(event));
+        });
+        source.addEventListener('failed', event => {
+            source.close();
+            reject(new Error(parse(event).error || 'Processing failed'));
+        });
+        source.onerror = () => {
+            // EventSource reconnects on its own while the connection is merely interrupted
+            if (source.readyState === EventSource.CLOSED) reject(new Error('Lost connection to the progress stream'));
+        };
+    });
+}
+
 async function handleUpload(e) {
     e.preventDefault();
     
@@ -1046,29 +1206,16 @@ async function handleUpload(e) {
         updateProcessingStep('upload', 'success');
         addLogEntry('File upload complete.');
 
-        // --- Mocking server-side progress --- 
-        // In a real app, you'd likely poll a status endpoint or use WebSockets
-        updateProcessingStep('transcribe', 'pending');
-        addLogEntry('Transcription started...');
-        await new Promise(resolve => setTimeout(resolve, 1500)); // Simulate delay
-        updateProcessingStep('transcribe', 'success');
-        addLogEntry('Transcription complete.');
-        
-        updateProcessingStep('identify', 'pending');
-        addLogEntry('Speaker identification started...');
-        await new Promise(resolve => setTimeout(resolve, 2000)); // Simulate delay
-        updateProcessingStep('identify', 'success');
-        addLogEntry('Speaker identification complete.');
-        
-        updateProcessingStep('database', 'pending');
-        addLogEntry('Database update started...');
-        await new Promise(resolve => setTimeout(resolve, 1000)); // Simulate delay
-        updateProcessingStep('database', 'success');
-        addLogEntry('Database update complete.');
-        // --- End Mock Progress --- 
-
-        const result = await response.json(); // Process final response if needed
-        console.log("Upload result:", result); // Use the actual result if it contains info
+        const result = await response.json();
+        console.log("Upload result:", result);
+        if (result.duplicate) {
+            addLogEntry(result.status === 'completed'
+                ? 'This recording was already processed.'
+                : `This recording was already uploaded (status: ${result.status}).`);
+        } else {
+            // Processing runs on the server in the background; follow its progress events
+            await followIngestEvents(result.events_url);
+        }
 
                         completeProcessing(true);
         showToast('success', 'Upload Complete', 'Conversation processed successfully.');
@@ -1252,6 +1399,17 @@ async function handleAddEmbedding(e) {
     }
 }
 
+// Poll a background job until it completes or fails
+async function waitForJob(jobId, intervalMs = 1000) {
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const job = await response.json();
+        if (job.status === 'completed' || job.status === 'failed') return job;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 async function deletePineconeSpeaker(speakerName) {
      // NOTE: Deleting a speaker *should* cascade delete embeddings via backend logic.
      // The confirmation should reflect this.
@@ -1267,7 +1425,11 @@ async function deletePineconeSpeaker(speakerName) {
             throw new Error(errorData.detail);
         }
         const result = await response.json();
-        showToast('success', 'Success', `Speaker "${speakerName}" deleted.`);
+        showToast('info', 'Deleting', `Deleting voice samples for "${speakerName}"...`);
+        // Deletion runs as a background job on the server; wait for it to finish
+        const job = await waitForJob(result.job_id);
+        if (job.status === 'failed') throw new Error(job.error || 'Deletion job failed');
+        showToast('success', 'Success', `Speaker "${speakerName}" deleted (${job.result.embeddings_deleted} voice samples).`);
             loadPineconeSpeakers();
     } catch (error) {
         console.error('Error deleting speaker:', error);
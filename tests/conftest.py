@@ -0,0 +1,25 @@
+"""
+Shared test setup.
+The pipeline modules create their S3 and Pinecone clients at import time, so
+the tests give them placeholder settings and an offline Pinecone client before
+anything under modules/ is imported.
+"""
+
+import os
+from unittest import mock
+import pytest
+
+os.environ.setdefault("AWS_S3_BUCKET", "test-bucket")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Resolving an index by name needs the network; tests patch the index they use
+mock.patch("pinecone.Pinecone").start()
+
+@pytest.fixture
+def client():
+    """TestClient for the app (imported on first use: it connects to its services at import time)"""
+    from fastapi.testclient import TestClient
+    import app
+    return TestClient(app.app)
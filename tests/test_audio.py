@@ -0,0 +1,118 @@
+import io
+import sys
+import wave
+import threading
+import numpy as np
+import pytest
+from modules import audio
+from modules.audio import parse_accept, accepts_explicitly
+
+def test_parse_accept_reads_q_values():
+    assert parse_accept("audio/ogg;q=0.5, audio/*;q=0.8, */*") == {"audio/ogg": 0.5, "audio/*": 0.8, "*/*": 1.0}
+
+def test_wildcards_do_not_select_opus():
+    assert not accepts_explicitly(None, "opus")
+    assert not accepts_explicitly("*/*", "opus")
+    assert not accepts_explicitly("audio/webm,audio/ogg;q=0,audio/*;q=0.9,*/*;q=0.5", "opus")
+
+def test_explicit_opus_types_select_opus():
+    assert accepts_explicitly("audio/ogg; codecs=opus, */*;q=0.1", "opus")
+    assert accepts_explicitly("audio/opus", "opus")
+
+FAKE_FFMPEG = """#!{python}
+import os, sys
+if os.environ["FAKE_FFMPEG"] == "corrupt":
+    # Far more than a pipe buffer of complaints, then a failure
+    for _ in range(4000):
+        sys.stderr.write("Invalid data found when processing input\\n")
+    sys.exit(1)
+sys.stdout.buffer.write(b"\\x01\\x00" * int(os.environ["FAKE_FFMPEG"]))
+"""
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch, tmp_path):
+    """Point the decoder at a stand-in for ffmpeg; set its behaviour with the FAKE_FFMPEG variable"""
+    script = tmp_path / "ffmpeg"
+    script.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setattr(audio.AudioSegment, "converter", str(script))
+    return lambda mode: monkeypatch.setenv("FAKE_FFMPEG", str(mode))
+
+def decode_with_timeout(*args, **kwargs):
+    result = {}
+
+    def run():
+        try:
+            result["audio"] = audio.decode_audio(*args, **kwargs)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "decoder hung"
+    return result
+
+def test_corrupt_input_fails_instead_of_hanging(fake_ffmpeg, tmp_path):
+    fake_ffmpeg("corrupt")
+    (tmp_path / "bad.mp3").write_bytes(b"not audio")
+
+    result = decode_with_timeout(str(tmp_path / "bad.mp3"))
+
+    assert isinstance(result["error"], RuntimeError)
+    assert "Invalid data found" in str(result["error"])
+
+def test_decode_moves_to_a_memory_map_once_it_outgrows_the_limit(fake_ffmpeg, monkeypatch, tmp_path):
+    monkeypatch.setattr(audio, "AUDIO_MEMMAP_MIN_BYTES", 3 * audio.DECODE_CHUNK_BYTES)
+    (tmp_path / "small.mp3").write_bytes(b"compressed")
+
+    fake_ffmpeg(1000)
+    in_memory = decode_with_timeout(str(tmp_path / "small.mp3"), workdir=str(tmp_path))["audio"]
+    fake_ffmpeg(4 * audio.DECODE_CHUNK_BYTES // 2)
+    spilled = decode_with_timeout(str(tmp_path / "small.mp3"), workdir=str(tmp_path))["audio"]
+
+    assert in_memory.path is None and len(in_memory.samples) == 1000
+    assert spilled.path is not None and isinstance(spilled.samples, np.memmap)
+    assert len(spilled.samples) == 2 * audio.DECODE_CHUNK_BYTES and (spilled.samples == 1).all()
+    spilled.close()
+
+def test_memmap_is_chosen_by_decoded_size_not_file_size(fake_ffmpeg, monkeypatch, tmp_path):
+    (tmp_path / "talk.opus").write_bytes(b"small compressed file")
+    fake_ffmpeg(1000)
+
+    # An hour of audio decodes to about 110 MB, far more than the file itself
+    monkeypatch.setattr(audio, "probe_duration_seconds", lambda path: 3600.0)
+    long_recording = decode_with_timeout(str(tmp_path / "talk.opus"), workdir=str(tmp_path))["audio"]
+    monkeypatch.setattr(audio, "probe_duration_seconds", lambda path: None)
+    unprobed = decode_with_timeout(str(tmp_path / "talk.opus"), workdir=str(tmp_path))["audio"]
+
+    assert long_recording.path is not None
+    assert unprobed.path is None
+    long_recording.close()
+
+def test_pcm_buffer_slices_by_milliseconds_as_views():
+    buffer = audio.PCMBuffer(np.arange(16000, dtype=np.int16))
+
+    clip = buffer[250:500]
+
+    assert len(buffer) == 1000 and len(clip) == 250
+    assert clip.samples[0] == 4000 and len(clip.samples) == 4000
+    assert np.shares_memory(clip.samples, buffer.samples)
+    # Out-of-range bounds are clamped like pydub's
+    assert len(buffer[-100:200]) == 200
+    assert len(buffer[900:5000]) == 100
+    assert len(buffer[:]) == 1000
+    with pytest.raises(TypeError):
+        buffer[0:100:2]
+
+def test_pcm_buffer_concatenate_and_wav_round_trip():
+    first = audio.PCMBuffer(np.array([1, 2, 3], dtype=np.int16))
+    second = audio.PCMBuffer(np.array([4, 5], dtype=np.int16))
+
+    joined = audio.PCMBuffer.concatenate([first, second])
+
+    assert list(joined.samples) == [1, 2, 3, 4, 5]
+    assert audio.PCMBuffer.concatenate([]).duration_seconds == 0
+    with wave.open(io.BytesIO(audio.to_wav_bytes(joined))) as wav:
+        assert (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (16000, 1, 2)
+        assert list(np.frombuffer(wav.readframes(5), dtype="<i2")) == [1, 2, 3, 4, 5]
@@ -0,0 +1,20 @@
+import numpy as np
+from unittest import mock
+from modules.auto_update_pinecone import AutoUpdateBuffer
+
+def test_similar_candidates_are_deduplicated_per_speaker():
+    buffer = AutoUpdateBuffer(mock.Mock(), threshold=0.5, similarity_threshold=0.92)
+    voice = np.ones(4)
+    buffer.add(voice, "Alice", "a1", 0.9, gallery_score=0.6)
+    buffer.add(voice * 1.01, "Alice", "a2", 0.8, gallery_score=0.6)
+    buffer.add(voice, "Bob", "b1", 0.7, gallery_score=0.6)
+
+    kept = buffer._deduplicate()
+
+    assert [c["audio_source"] for c in kept] == ["a1", "b1"]
+
+def test_candidates_close_to_the_gallery_are_dropped():
+    buffer = AutoUpdateBuffer(mock.Mock(), threshold=0.5, similarity_threshold=0.92)
+    buffer.add(np.ones(4), "Alice", "a1", 0.95, gallery_score=0.95)
+
+    assert buffer._deduplicate() == []
@@ -0,0 +1,43 @@
+import numpy as np
+from modules.compact_pinecone import farthest_point_sample, plan_compaction
+
+# Three tight clusters of directions, four exemplars each
+CLUSTERS = np.array([
+    base + offset
+    for base in ([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])
+    for offset in ([0.0, 0.0, 0.0], [0.02, 0.0, 0.0], [0.0, 0.02, 0.0], [0.0, 0.0, 0.02])
+])
+
+def vectors(embeddings, auto_updated=True):
+    return [(f"v{i}", list(e), {"auto_updated": auto_updated}) for i, e in enumerate(embeddings)]
+
+def test_farthest_point_sample_keeps_everything_under_the_cap():
+    assert farthest_point_sample(CLUSTERS[:3], 5) == [0, 1, 2]
+
+def test_farthest_point_sample_covers_every_cluster():
+    selected = farthest_point_sample(CLUSTERS, 3)
+
+    assert len(set(selected)) == 3
+    assert sorted(i // 4 for i in selected) == [0, 1, 2]
+
+def test_farthest_point_sample_keeps_seeds():
+    selected = farthest_point_sample(CLUSTERS, 3, seed_indices=[1, 2])
+
+    assert selected[:2] == [1, 2]
+    assert selected[2] // 4 in (1, 2)
+
+def test_plan_compaction_only_deletes_auto_updated_vectors():
+    manual = vectors(CLUSTERS[:4], auto_updated=False)
+    auto = [(f"auto{i}", values, metadata) for i, (_, values, metadata) in enumerate(vectors(CLUSTERS[4:]))]
+
+    keep_ids, delete_ids = plan_compaction(manual + auto, max_exemplars=6)
+
+    assert len(keep_ids) == 6 and len(delete_ids) == 6
+    assert {"v0", "v1", "v2", "v3"} <= set(keep_ids)
+    assert all(vector_id.startswith("auto") for vector_id in delete_ids)
+
+def test_plan_compaction_never_drops_below_the_protected_vectors():
+    keep_ids, delete_ids = plan_compaction(vectors(CLUSTERS, auto_updated=False), max_exemplars=3)
+
+    assert len(keep_ids) == len(CLUSTERS)
+    assert delete_ids == []
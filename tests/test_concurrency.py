@@ -0,0 +1,50 @@
+import asyncio
+import inspect
+import threading
+import time
+import pytest
+from modules import concurrency
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch):
+    # Each test runs its own event loop, and the limiter is created inside one
+    monkeypatch.setattr(concurrency, "_limiter", None)
+
+def test_run_blocking_runs_off_the_event_loop_thread():
+    async def run():
+        return threading.get_ident(), await concurrency.run_blocking(threading.get_ident)
+
+    loop_thread, worker_thread = asyncio.run(run())
+
+    assert worker_thread != loop_thread
+
+def test_pool_size_caps_concurrent_blocking_calls(monkeypatch):
+    monkeypatch.setattr(concurrency, "BLOCKING_IO_THREADS", 2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    async def run():
+        await asyncio.gather(*(concurrency.run_blocking(work) for _ in range(6)))
+
+    asyncio.run(run())
+
+    assert max(peak) == 2
+
+def test_offload_keeps_the_route_signature():
+    def route(speaker_name: str, limit: int = 10):
+        return speaker_name, limit
+
+    wrapped = concurrency.offload(route)
+
+    assert inspect.iscoroutinefunction(wrapped)
+    assert inspect.signature(wrapped) == inspect.signature(route)
+    assert asyncio.run(wrapped("Ann", limit=3)) == ("Ann", 3)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import pytest
+from modules import events
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(events, "_channels", {})
+
+def collect(conversation_id, **kwargs):
+    async def run():
+        return [event async for event in events.subscribe(conversation_id, **kwargs)]
+    return asyncio.run(run())
+
+def test_subscribe_replays_only_events_after_the_given_id():
+    for stage in ("decode", "transcribe", "identify"):
+        events.publish("c1", "stage", stage=stage)
+    events.publish("c1", "completed", utterances=3)
+
+    replayed = collect("c1", after=2)
+
+    assert [(event["id"], event["type"]) for event in replayed] == [(3, "stage"), (4, "completed")]
+    assert collect("c1", after=4) == []
+
+def test_subscribe_streams_events_published_from_another_thread():
+    events.publish("c1", "queued")
+
+    async def run():
+        received = []
+        async for event in events.subscribe("c1", after=1, heartbeat=0.05):
+            received.append(event)
+            if event is None and len(received) == 1:
+                threading.Thread(target=lambda: (
+                    events.publish("c1", "stage", stage="decode"),
+                    events.publish("c1", "failed", error="boom")
+                )).start()
+        return received
+
+    received = asyncio.run(asyncio.wait_for(run(), 5))
+
+    # A heartbeat while idle, then the new events in order, ending at the terminal one
+    assert received[0] is None
+    assert [event["type"] for event in received if event] == ["stage", "failed"]
+    assert not events._channels["c1"].waiters
+
+def test_events_after_a_terminal_event_are_dropped():
+    events.publish("c1", "completed")
+    events.publish("c1", "stage", stage="late")
+
+    assert [event["type"] for event in collect("c1")] == ["completed"]
+
+def test_subscribe_to_an_unknown_conversation_yields_nothing():
+    assert collect("missing") == []
@@ -0,0 +1,102 @@
+import time
+import threading
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from modules import ingest
+from modules.database import db_operations
+
+class FakeCursor:
+    """Records the query find_conversation runs and returns a fixed row"""
+
+    def __init__(self, row):
+        self.row = row
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_factory=None):
+        return self._cursor
+
+    def close(self):
+        pass
+
+def test_processing_rows_older_than_the_cutoff_are_not_duplicates(monkeypatch):
+    cursor = FakeCursor(None)
+    monkeypatch.setattr(db_operations, "get_db_connection", lambda: FakeConnection(cursor))
+
+    db_operations.find_conversation(content_hash="abc")
+
+    sql, (content_hash, stale_before) = cursor.executed[0]
+    assert "status <> 'processing' OR date_processed >= %s" in sql
+    expected = datetime.now() - timedelta(minutes=db_operations.PROCESSING_STALE_MINUTES)
+    assert abs((stale_before - expected).total_seconds()) < 5
+
+def test_duplicate_upload_reports_the_stored_status(monkeypatch, client):
+    monkeypatch.setattr(ingest, "find_conversation", lambda **kwargs: {
+        "conversation_id": "c1", "content_hash": None, "status": "processing"
+    })
+
+    response = client.post("/api/conversations/upload", files={"file": ("talk.wav", b"audio")})
+
+    assert response.status_code == 200
+    assert response.json()["duplicate"] is True
+    assert response.json()["conversation_id"] == "c1"
+    assert response.json()["status"] == "processing"
+
+def stored(rows):
+    """find_conversation over rows keyed by ("key", value) or ("hash", value)"""
+    def find(content_hash=None, idempotency_key=None):
+        return rows.get(("key", idempotency_key) if idempotency_key else ("hash", content_hash))
+    return find
+
+def test_idempotency_key_returns_its_conversation(monkeypatch):
+    row = {"conversation_id": "c1", "content_hash": "abc", "status": "completed"}
+    monkeypatch.setattr(ingest, "find_conversation", stored({("key", "k1"): row}))
+
+    assert ingest.find_existing_conversation("abc", "k1") is row
+
+def test_idempotency_key_reused_for_different_audio_is_a_conflict(monkeypatch):
+    row = {"conversation_id": "c1", "content_hash": "abc", "status": "completed"}
+    monkeypatch.setattr(ingest, "find_conversation", stored({("key", "k1"): row}))
+
+    with pytest.raises(HTTPException) as error:
+        ingest.find_existing_conversation("other", "k1")
+    assert error.value.status_code == 409
+
+def test_unknown_key_falls_back_to_the_content_hash(monkeypatch):
+    row = {"conversation_id": "c2", "content_hash": "abc", "status": "completed"}
+    monkeypatch.setattr(ingest, "find_conversation", stored({("hash", "abc"): row}))
+
+    assert ingest.find_existing_conversation("abc", "new-key") is row
+    assert ingest.find_existing_conversation("abc") is row
+    assert ingest.find_existing_conversation("xyz") is None
+
+def test_ingest_lock_serializes_identical_audio_and_is_released():
+    order = []
+
+    def ingest_twice(name):
+        with ingest.ingest_lock("abc"):
+            order.append(f"{name} start")
+            time.sleep(0.05)
+            order.append(f"{name} end")
+
+    threads = [threading.Thread(target=ingest_twice, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [entry.split()[1] for entry in order] == ["start", "end", "start", "end"]
+    assert ingest._ingest_locks == {}
@@ -0,0 +1,82 @@
+import wave
+import numpy as np
+import pytest
+from modules import live_ingest
+from modules.live_ingest import LiveIngestSession
+
+def test_feed_stops_at_the_length_limit(monkeypatch):
+    monkeypatch.setattr(live_ingest, "LIVE_MAX_SECONDS", 1)
+    session = LiveIngestSession()
+
+    session.feed(b"\0" * 20000)
+    assert not session.limit_reached
+    session.feed(b"\0" * 20000)
+
+    assert session.limit_reached
+    assert len(session.segmenter.pcm) == 32000
+
+def test_persist_drops_an_odd_trailing_byte(monkeypatch):
+    persisted = {}
+
+    def fake_process_conversation(wav_path, conversation_id, *args, **kwargs):
+        with wave.open(wav_path, "rb") as f:
+            persisted["frames"] = f.getnframes()
+        return {"conversation_id": conversation_id, "utterances": []}
+
+    monkeypatch.setattr(live_ingest, "process_conversation", fake_process_conversation)
+    session = LiveIngestSession()
+    session.feed(np.zeros(1000, dtype=np.int16).tobytes() + b"\x01")
+
+    session.persist()
+
+    assert persisted["frames"] == 1000
+
+@pytest.fixture
+def persisted(monkeypatch, tmp_path):
+    """Frame counts of the recordings the live route hands to process_conversation"""
+    monkeypatch.setenv("INGEST_SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setenv("INGEST_DISK_SCRATCH_DIR", str(tmp_path))
+    frames = []
+
+    def fake_process_conversation(wav_path, conversation_id, *args, **kwargs):
+        with wave.open(wav_path, "rb") as f:
+            frames.append(f.getnframes())
+        return {"conversation_id": conversation_id, "utterances": [{}, {}]}
+
+    monkeypatch.setattr(live_ingest, "process_conversation", fake_process_conversation)
+    return frames
+
+def test_ws_ingest_accepts_frames_that_split_samples(persisted, client):
+    with client.websocket_connect("/ws/ingest") as ws:
+        ws.send_json({"sample_rate": 16000})
+        conversation_id = ws.receive_json()["conversation_id"]
+        # 2001 bytes in frames of 3: samples straddle frame boundaries and one byte is left over
+        pcm = np.zeros(1000, dtype=np.int16).tobytes() + b"\x00"
+        for start in range(0, len(pcm), 3):
+            ws.send_bytes(pcm[start:start + 3])
+        ws.send_json({"type": "end"})
+
+        assert ws.receive_json() == {"type": "processing", "conversation_id": conversation_id}
+        assert ws.receive_json() == {"type": "completed", "conversation_id": conversation_id, "utterances": 2}
+    assert persisted == [1000]
+
+def test_ws_ingest_ends_and_persists_at_the_length_limit(persisted, monkeypatch, client):
+    import app
+    monkeypatch.setattr(live_ingest, "LIVE_MAX_SECONDS", 1)
+    monkeypatch.setattr(app, "LIVE_MAX_SECONDS", 1)
+
+    with client.websocket_connect("/ws/ingest") as ws:
+        ws.send_json({"sample_rate": 16000})
+        ws.receive_json()
+        ws.send_bytes(np.zeros(24000, dtype=np.int16).tobytes())
+
+        assert ws.receive_json() == {"type": "limit_reached", "max_seconds": 1}
+        assert ws.receive_json()["type"] == "processing"
+        assert ws.receive_json()["type"] == "completed"
+    assert persisted == [16000]
+
+def test_ws_ingest_rejects_other_sample_rates(client):
+    with client.websocket_connect("/ws/ingest") as ws:
+        ws.send_json({"sample_rate": 44100})
+
+        assert ws.receive_json()["type"] == "error"
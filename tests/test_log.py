@@ -0,0 +1,53 @@
+import sys
+import json
+import logging
+from modules.log import JSONFormatter, SamplingFilter, SAMPLED
+
+def make_record(msg, *args, name="modules.test", **extra):
+    return logging.getLogger(name).makeRecord(name, logging.INFO, __file__, 1, msg, args, None, extra=extra)
+
+def test_json_formatter_writes_core_fields_and_extras():
+    record = make_record("processed %s utterances", 3, conversation_id="abc", duration=1.5)
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["level"] == "info"
+    assert entry["logger"] == "modules.test"
+    assert entry["msg"] == "processed 3 utterances"
+    assert entry["conversation_id"] == "abc"
+    assert entry["duration"] == 1.5
+    assert entry["ts"].endswith("+00:00")
+    assert "args" not in entry and "sampled" not in entry
+
+def test_json_formatter_includes_exceptions_and_stringifies_other_values():
+    try:
+        raise ValueError("bad audio")
+    except ValueError:
+        record = logging.getLogger("modules.test").makeRecord(
+            "modules.test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info(),
+            extra={"path": object()}
+        )
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["level"] == "error"
+    assert "ValueError: bad audio" in entry["exc"]
+    assert entry["path"].startswith("<object object")
+
+def test_sampling_filter_passes_one_in_every_per_message():
+    sampler = SamplingFilter(every=3)
+
+    passed = [sampler.filter(make_record("utterance %s", i, **SAMPLED)) for i in range(7)]
+    other = sampler.filter(make_record("segment %s", 0, **SAMPLED))
+
+    assert passed == [True, False, False, True, False, False, True]
+    assert other
+
+def test_sampling_filter_marks_sampled_records_and_ignores_others():
+    sampler = SamplingFilter(every=3)
+    first = make_record("utterance %s", 0, **SAMPLED)
+
+    assert sampler.filter(first)
+    assert first.sample_every == 3
+    assert all(sampler.filter(make_record("utterance %s", i)) for i in range(5))
+    assert json.loads(JSONFormatter().format(first))["sample_every"] == 3
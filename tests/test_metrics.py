@@ -0,0 +1,31 @@
+from prometheus_client import REGISTRY
+
+def request_count(method, route, status):
+    labels = {"method": method, "route": route, "status": status}
+    return REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+
+def test_requests_are_labelled_by_route_template(client):
+    before = request_count("GET", "/api/jobs/{job_id}", "404")
+
+    client.get("/api/jobs/one-missing-job")
+    client.get("/api/jobs/another-missing-job")
+
+    assert request_count("GET", "/api/jobs/{job_id}", "404") == before + 2
+    assert request_count("GET", "/api/jobs/one-missing-job", "404") == 0
+
+def test_unrouted_paths_share_one_label(client):
+    before = request_count("GET", "unmatched", "404")
+
+    client.get("/no/such/page")
+
+    assert request_count("GET", "unmatched", "404") == before + 1
+
+def test_metrics_route_renders_prometheus_text(client):
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/health"' in response.text
+    assert "# TYPE external_calls_total counter" in response.text
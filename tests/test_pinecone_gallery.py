@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+import pytest
+from modules import pinecone_gallery
+
+class FakeIndex:
+    """The list/fetch/delete subset of a Pinecone index, held in memory"""
+
+    def __init__(self, vectors):
+        self.vectors = dict(vectors)
+        self.fetches = 0
+
+    def list(self, prefix=None):
+        yield sorted(i for i in self.vectors if not prefix or i.startswith(prefix))
+
+    def fetch(self, ids):
+        self.fetches += 1
+        return SimpleNamespace(vectors={
+            i: SimpleNamespace(values=[0.0], metadata=self.vectors[i]) for i in ids if i in self.vectors
+        })
+
+    def delete(self, ids):
+        for i in ids:
+            self.vectors.pop(i, None)
+
+    def upsert(self, vectors):
+        self.vectors.update((i, metadata) for i, _, metadata in vectors)
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(pinecone_gallery, "_gallery", None)
+    monkeypatch.setattr(pinecone_gallery, "_grouped", None)
+    monkeypatch.setattr(pinecone_gallery, "_speaker_counts", {})
+    monkeypatch.setattr(pinecone_gallery, "_gallery_loaded_at", 0.0)
+
+def test_delete_speaker_vectors_finds_ids_outside_the_known_prefixes():
+    index = FakeIndex({
+        "speaker_Ann_1": {"speaker_name": "Ann"},
+        "legacy-42": {"speaker_name": "Ann"},
+        "speaker_Ann_Lee_1": {"speaker_name": "Ann Lee"},
+        "speaker_Bob_1": {"speaker_name": "Bob"},
+    })
+    pinecone_gallery.get_gallery(index)
+
+    result = pinecone_gallery.delete_speaker_vectors(index, "Ann")
+
+    assert result["embeddings_deleted"] == 2
+    assert sorted(index.vectors) == ["speaker_Ann_Lee_1", "speaker_Bob_1"]
+    assert not pinecone_gallery.speaker_exists(index, "Ann")
+
+def test_delete_speaker_vectors_does_not_load_a_cold_gallery():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}, "speaker_Bob_1": {"speaker_name": "Bob"}})
+    fetched = []
+    fetch = index.fetch
+    index.fetch = lambda ids: fetched.extend(ids) or fetch(ids)
+
+    result = pinecone_gallery.delete_speaker_vectors(index, "Ann")
+
+    assert result["embeddings_deleted"] == 1
+    assert fetched == ["speaker_Ann_1"]
+    assert pinecone_gallery._gallery is None
+
+def test_gallery_is_served_from_cache_and_kept_current_by_writes():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    assert pinecone_gallery.get_gallery(index) == {"Ann": ["speaker_Ann_1"]}
+    fetches = index.fetches
+
+    pinecone_gallery.upsert_vectors(index, [("speaker_Bob_1", [0.0], {"speaker_name": "Bob"})])
+    pinecone_gallery.delete_vector_ids(index, ["speaker_Ann_1"])
+
+    assert pinecone_gallery.get_gallery(index) == {"Bob": ["speaker_Bob_1"]}
+    assert pinecone_gallery.speaker_exists(index, "Bob")
+    assert not pinecone_gallery.speaker_exists(index, "Ann")
+    assert index.fetches == fetches
+
+def test_write_during_a_load_forces_a_reload():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    fetch = index.fetch
+
+    def fetch_racing_with_a_write(ids):
+        # Another thread writes after the load has read the index but before it is stored
+        result = fetch(ids)
+        index.vectors["speaker_Bob_1"] = {"speaker_name": "Bob"}
+        pinecone_gallery._record_upsert([("speaker_Bob_1", [0.0], {"speaker_name": "Bob"})])
+        return result
+
+    index.fetch = fetch_racing_with_a_write
+    assert pinecone_gallery.get_gallery(index) == {"Ann": ["speaker_Ann_1"]}
+
+    index.fetch = fetch
+    assert pinecone_gallery.get_gallery(index) == {"Ann": ["speaker_Ann_1"], "Bob": ["speaker_Bob_1"]}
+
+def test_speaker_added_by_another_process_is_found_before_the_next_reconcile():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    pinecone_gallery.get_gallery(index)
+    # Written by another worker, so this process's cache never saw it
+    index.vectors["speaker_Bob_Smith_1"] = {"speaker_name": "Bob Smith"}
+
+    assert pinecone_gallery.speaker_exists(index, "Bob Smith")
+    assert not pinecone_gallery.speaker_exists(index, "Bob")
+    assert "Bob Smith" in pinecone_gallery.known_speaker_names()
+
+def test_delete_route_checks_the_index_before_returning_404(monkeypatch, client):
+    import app
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    pinecone_gallery.get_gallery(index)
+    index.vectors["speaker_Bob_1"] = {"speaker_name": "Bob"}
+    monkeypatch.setattr(app, "pinecone_index", index)
+    monkeypatch.setattr(app, "submit_job", lambda *args: "job-1")
+
+    assert client.delete("/api/pinecone/speakers/Bob").json()["job_id"] == "job-1"
+    assert client.delete("/api/pinecone/speakers/Carol").status_code == 404
+
+def test_reload_only_fetches_vectors_it_has_not_seen():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    pinecone_gallery.get_gallery(index)
+    index.vectors["speaker_Bob_1"] = {"speaker_name": "Bob"}
+    del index.vectors["speaker_Ann_1"]
+    fetched = []
+    fetch = index.fetch
+    index.fetch = lambda ids: fetched.extend(ids) or fetch(ids)
+
+    assert pinecone_gallery.get_gallery(index, refresh=True) == {"Bob": ["speaker_Bob_1"]}
+    assert fetched == ["speaker_Bob_1"]
+
+def test_grouped_gallery_is_reused_until_a_write():
+    index = FakeIndex({"speaker_Ann_1": {"speaker_name": "Ann"}})
+    first = pinecone_gallery.get_gallery(index)
+
+    assert pinecone_gallery.get_gallery(index) is first
+    pinecone_gallery.upsert_vectors(index, [("speaker_Ann_2", [0.0], {"speaker_name": "Ann"})])
+    assert pinecone_gallery.get_gallery(index) == {"Ann": ["speaker_Ann_1", "speaker_Ann_2"]}
+
+def test_speaker_listing_route(monkeypatch, client):
+    import app
+    index = FakeIndex({"speaker_Bob_1": {"speaker_name": "Bob"}, "speaker_Ann_1": {"speaker_name": "Ann"}})
+    monkeypatch.setattr(app, "pinecone_index", index)
+
+    assert client.get("/api/pinecone/speakers").json() == {"speakers": [
+        {"name": "Ann", "embeddings": [{"id": "speaker_Ann_1"}]},
+        {"name": "Bob", "embeddings": [{"id": "speaker_Bob_1"}]},
+    ]}
@@ -0,0 +1,32 @@
+import pytest
+from modules import profiling
+
+@pytest.fixture
+def admin(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return {"X-Admin-Key": "secret"}
+
+def test_is_admin_requires_a_configured_matching_key(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_API_KEY", None)
+    assert not profiling.is_admin("anything")
+    monkeypatch.setattr(profiling, "ADMIN_API_KEY", "secret")
+    assert not profiling.is_admin(None)
+    assert not profiling.is_admin("wrong")
+    assert profiling.is_admin("secret")
+
+def test_profile_routes_require_the_admin_key(admin, client):
+    assert client.get("/api/profiles").status_code == 403
+    assert client.get("/api/profiles", headers={"X-Admin-Key": "wrong"}).status_code == 403
+    assert client.get("/api/profiles", headers=admin).json() == {"profiles": []}
+    assert client.get("/api/profiles/abc", headers={"X-Admin-Key": "wrong"}).status_code == 403
+
+def test_only_admin_requests_are_profiled(admin, client):
+    anonymous = client.get("/health?profile=1")
+    profiled = client.get("/health", headers={"X-Profile": "1", **admin})
+
+    assert "x-profile-id" not in anonymous.headers
+    profile_id = profiled.headers["x-profile-id"]
+    assert [p["profile_id"] for p in client.get("/api/profiles", headers=admin).json()["profiles"]] == [profile_id]
+    report = client.get(f"/api/profiles/{profile_id}?format=text", headers=admin)
+    assert report.status_code == 200 and "function calls" in report.text
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from modules import speaker_id
+from modules.audio import PCMBuffer
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """process_conversation with storage, transcription and the database replaced"""
+    statuses = []
+    monkeypatch.setattr(speaker_id, "decode_audio", lambda *a, **k: PCMBuffer(np.zeros(16000, dtype=np.int16)))
+    monkeypatch.setattr(speaker_id, "store_original_audio", lambda *a, **k: True)
+    monkeypatch.setattr(speaker_id, "store_waveform", lambda *a, **k: None)
+    monkeypatch.setattr(speaker_id, "add_conversation", lambda info: "db-1")
+    monkeypatch.setattr(speaker_id, "add_utterances", lambda infos: [])
+    monkeypatch.setattr(speaker_id, "update_utterance_speakers", lambda updates: None)
+    monkeypatch.setattr(speaker_id, "set_conversation_status", lambda db_id, status: statuses.append(status))
+    audio = tmp_path / "conversation.wav"
+    audio.write_bytes(b"")
+    return str(audio), statuses
+
+def test_process_conversation_without_utterances(monkeypatch, pipeline):
+    file_path, statuses = pipeline
+    monkeypatch.setattr(speaker_id, "transcribe", lambda audio: {"utterances": []})
+
+    result = speaker_id.process_conversation(file_path, "empty")
+
+    assert result["utterances"] == []
+    assert result["s3_path"] == speaker_id.original_s3_path_for("empty", file_path)
+    assert statuses == ["completed"]
+
+def test_process_conversation_with_only_short_utterances(monkeypatch, pipeline):
+    file_path, statuses = pipeline
+    monkeypatch.setattr(speaker_id, "transcribe", lambda audio: {"utterances": [
+        {"start": 0, "end": 300, "speaker": "A", "text": "hi", "confidence": 0.9}
+    ]})
+
+    result = speaker_id.process_conversation(file_path, "short")
+
+    assert result["utterances"] == []
+    assert statuses == ["completed"]
+
+def test_vad_totals_count_each_utterance_once(monkeypatch, pipeline):
+    file_path, statuses = pipeline
+    monkeypatch.setattr(speaker_id, "transcribe", lambda audio: {"utterances": [
+        {"start": 0, "end": 400 * (n + 2), "speaker": "A", "text": "hello", "confidence": 0.9} for n in range(2)
+    ]})
+    monkeypatch.setattr(speaker_id, "store_audio", lambda *a, **k: None)
+    monkeypatch.setattr(speaker_id, "store_clip", lambda *a, **k: None)
+    monkeypatch.setattr(speaker_id, "embed_audio", lambda *a, **k: np.ones(192))
+    monkeypatch.setattr(speaker_id, "add_speaker", lambda name: name)
+    monkeypatch.setattr(speaker_id.index, "query", lambda **k: {"matches": []})
+
+    result = speaker_id.process_conversation(file_path, "unknowns")
+
+    # Both utterances go through the combine pass too, which must not add to the totals
+    assert [u["speaker"] for u in result["utterances"]] == ["Speaker_A", "Speaker_A"]
+    assert result["vad"]["clips"] == 2
+
+def test_utterance_clips_are_cut_from_the_original_recording(monkeypatch, pipeline):
+    file_path, statuses = pipeline
+    monkeypatch.setattr(speaker_id, "transcribe", lambda audio: {"utterances": [
+        {"start": 100, "end": 900, "speaker": "A", "text": "hello", "confidence": 0.9}
+    ]})
+    encoded, uploaded = [], []
+    monkeypatch.setattr(speaker_id, "encode_clip", lambda *args: encoded.append(args) or b"clip")
+    monkeypatch.setattr(speaker_id, "uploadBytes", lambda data, path, content_type: uploaded.append(path))
+    monkeypatch.setattr(speaker_id, "store_audio", lambda *a, **k: None)
+    monkeypatch.setattr(speaker_id, "embed_audio", lambda *a, **k: np.ones(192))
+    monkeypatch.setattr(speaker_id, "add_speaker", lambda name: name)
+    monkeypatch.setattr(speaker_id.index, "query", lambda **k: {"matches": []})
+
+    speaker_id.process_conversation(file_path, "clips")
+
+    formats = speaker_id.storage_formats()
+    assert encoded == [(file_path, 100, 900, audio_format) for audio_format in formats]
+    assert uploaded == [
+        speaker_id.with_format(speaker_id.utterance_s3_path("clips", "utterance_000"), audio_format)
+        for audio_format in formats
+    ]
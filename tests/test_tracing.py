@@ -0,0 +1,75 @@
+import threading
+import pytest
+from modules import tracing
+from modules.tracing import span, annotate, in_current_context
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Finished spans, in the order they were exported"""
+    records = []
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "console")
+    monkeypatch.setattr(tracing, "_export", records.append)
+    return records
+
+def run_on_thread(func):
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+
+def by_name(records):
+    return {record["name"]: record for record in records}
+
+def test_child_spans_join_the_parent_trace_and_inherit_correlation_ids(exported):
+    with span("http.request", request_id="req-1") as root:
+        with span("process_conversation"):
+            annotate(conversation_id="conv-1")
+            with span("s3.upload", bucket="audio"):
+                pass
+
+    spans = by_name(exported)
+    assert spans["http.request"]["parent_id"] is None
+    assert spans["process_conversation"]["parent_id"] == root.span_id
+    assert spans["s3.upload"]["parent_id"] == spans["process_conversation"]["span_id"]
+    assert {record["trace_id"] for record in exported} == {root.trace_id}
+    assert spans["s3.upload"]["request_id"] == "req-1"
+    assert spans["s3.upload"]["conversation_id"] == "conv-1"
+    assert spans["s3.upload"]["attributes"] == {"bucket": "audio"}
+    assert "conversation_id" not in spans["http.request"]
+
+def test_in_current_context_keeps_thread_work_in_the_trace(exported):
+    def work():
+        with span("embed"):
+            pass
+
+    with span("http.request", request_id="req-2") as root:
+        run_on_thread(in_current_context(work))
+
+    embed = by_name(exported)["embed"]
+    assert embed["trace_id"] == root.trace_id
+    assert embed["parent_id"] == root.span_id
+    assert embed["request_id"] == "req-2"
+
+def test_thread_work_without_in_current_context_starts_a_new_trace(exported):
+    def work():
+        with span("embed"):
+            pass
+
+    with span("http.request", request_id="req-3") as root:
+        run_on_thread(work)
+
+    embed = by_name(exported)["embed"]
+    assert embed["trace_id"] != root.trace_id
+    assert embed["parent_id"] is None
+    assert "request_id" not in embed
+
+def test_spans_record_errors_and_restore_the_parent(exported):
+    with span("http.request") as root:
+        with pytest.raises(ValueError):
+            with span("db.query"):
+                raise ValueError("connection lost")
+        with span("db.retry"):
+            pass
+
+    spans = by_name(exported)
+    assert spans["db.query"]["error"] == "ValueError: connection lost"
+    assert spans["db.retry"]["parent_id"] == root.span_id
@@ -0,0 +1,126 @@
+import time
+import hashlib
+import pytest
+from fastapi import HTTPException
+from modules import upload_sessions
+
+@pytest.fixture(autouse=True)
+def session_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_SESSION_DIR", str(tmp_path))
+
+def send_chunk(upload_id, offset, data):
+    part = upload_sessions.new_part_path(upload_id)
+    with open(part, "wb") as f:
+        f.write(data)
+    return upload_sessions.commit_chunk(upload_id, offset, part)
+
+def assembled_session(data=b"audio"):
+    session = upload_sessions.create_session("talk.wav", len(data))
+    send_chunk(session["upload_id"], 0, data)
+    return upload_sessions.finalize_session(session["upload_id"])
+
+def assembled_bytes(session):
+    with open(upload_sessions.data_path(session), "rb") as f:
+        return f.read()
+
+def test_chunks_resent_from_an_earlier_offset_overwrite_the_tail():
+    upload_id = upload_sessions.create_session("talk.wav", 10)["upload_id"]
+    send_chunk(upload_id, 0, b"aaaa")
+    send_chunk(upload_id, 4, b"bbbb")
+
+    # The client lost the second response and resumes from the middle of it
+    session = send_chunk(upload_id, 6, b"cccc")
+
+    assert session["offset"] == 10
+    assert assembled_bytes(session) == b"aaaabbcccc"
+
+def test_resending_a_shorter_chunk_truncates_what_followed():
+    upload_id = upload_sessions.create_session("talk.wav", 10)["upload_id"]
+    send_chunk(upload_id, 0, b"aaaabbbb")
+
+    session = send_chunk(upload_id, 2, b"cc")
+
+    assert session["offset"] == 4
+    assert assembled_bytes(session) == b"aacc"
+
+def test_chunks_past_the_committed_offset_or_declared_size_are_refused():
+    upload_id = upload_sessions.create_session("talk.wav", 6)["upload_id"]
+    send_chunk(upload_id, 0, b"aaaa")
+
+    with pytest.raises(HTTPException) as gap:
+        send_chunk(upload_id, 5, b"b")
+    with pytest.raises(HTTPException) as overflow:
+        send_chunk(upload_id, 4, b"bbb")
+
+    assert gap.value.status_code == 409
+    assert overflow.value.status_code == 400
+    assert upload_sessions.get_session(upload_id)["offset"] == 4
+
+def test_content_hash_follows_resends_without_rereading_the_file(monkeypatch):
+    upload_id = upload_sessions.create_session("talk.wav", 10)["upload_id"]
+    send_chunk(upload_id, 0, b"aaaa")
+    send_chunk(upload_id, 4, b"bbbb")
+    send_chunk(upload_id, 6, b"cccc")
+    monkeypatch.setattr(upload_sessions, "hash_file", None)
+
+    session = upload_sessions.finalize_session(upload_id)
+
+    assert session["content_hash"] == hashlib.sha256(b"aaaabbcccc").hexdigest()
+    assert upload_id not in upload_sessions._hashers
+
+def test_content_hash_survives_a_restart_mid_upload():
+    upload_id = upload_sessions.create_session("talk.wav", 8)["upload_id"]
+    send_chunk(upload_id, 0, b"aaaa")
+    upload_sessions._hashers.clear()
+    send_chunk(upload_id, 4, b"bbbb")
+
+    session = upload_sessions.finalize_session(upload_id)
+
+    assert session["content_hash"] == hashlib.sha256(b"aaaabbbb").hexdigest()
+
+def test_session_locks_are_dropped_when_released():
+    session = assembled_session()
+    upload_sessions.update_session(session["upload_id"], job_id="gone")
+    upload_sessions.delete_session(session["upload_id"])
+
+    assert upload_sessions._session_locks == {}
+
+def test_processing_session_with_a_lost_job_can_be_completed_again():
+    session = assembled_session()
+    upload_sessions.update_session(session["upload_id"], status="processing", job_id="gone")
+
+    requeued = upload_sessions.finalize_session(session["upload_id"])
+
+    assert requeued["status"] == "assembled"
+    assert requeued["job_id"] is None
+
+def test_assembled_session_with_a_lost_job_can_be_completed_again():
+    session = assembled_session()
+    upload_sessions.update_session(session["upload_id"], job_id="gone")
+
+    requeued = upload_sessions.finalize_session(session["upload_id"])
+
+    assert requeued["status"] == "assembled"
+    assert requeued["job_id"] is None
+
+def test_assembled_session_is_not_requeued_during_handoff():
+    session = assembled_session()
+
+    assert not upload_sessions.is_abandoned(session)
+    with pytest.raises(HTTPException) as error:
+        upload_sessions.finalize_session(session["upload_id"])
+    assert error.value.status_code == 409
+
+def test_processing_session_without_a_live_job_is_abandoned(monkeypatch):
+    session = assembled_session()
+    session = upload_sessions.update_session(session["upload_id"], status="processing", job_id="gone")
+
+    assert upload_sessions.is_abandoned(session)
+    monkeypatch.setattr(upload_sessions, "get_job", lambda job_id: {"status": "running"})
+    assert not upload_sessions.is_abandoned(session)
+
+def test_assembled_session_without_a_job_is_abandoned_after_the_grace_period():
+    session = assembled_session()
+    session["assembled_at"] = time.time() - upload_sessions.HANDOFF_GRACE_SECONDS - 1
+
+    assert upload_sessions.is_abandoned(session)
@@ -0,0 +1,49 @@
+import asyncio
+import io
+import hashlib
+import pytest
+from fastapi import HTTPException
+from modules.uploads import copy_stream, UploadSizeLimitMiddleware
+
+def test_copy_stream_hashes_what_it_writes(tmp_path):
+    data = b"x" * 3_000_000
+
+    size, digest = copy_stream(io.BytesIO(data), tmp_path / "out")
+
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "out").read_bytes() == data
+
+def test_copy_stream_removes_the_partial_file_over_the_limit(tmp_path):
+    with pytest.raises(HTTPException) as error:
+        copy_stream(io.BytesIO(b"x" * 2_000_000), tmp_path / "out", max_bytes=1_000_000)
+
+    assert error.value.status_code == 413
+    assert not (tmp_path / "out").exists()
+
+def call_middleware(content_length):
+    """Run a request with the given Content-Length through the middleware; returns the response status"""
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/conversations/upload",
+        "headers": [(b"content-length", content_length)]
+    }
+    asyncio.run(UploadSizeLimitMiddleware(app, ["/api/conversations/upload"], max_bytes=1024)(scope, receive, send))
+    return sent[0]["status"]
+
+def test_middleware_rejects_bad_or_oversized_content_length():
+    assert call_middleware(b"100") == 200
+    assert call_middleware(b"10000000") == 413
+    assert call_middleware(b"12abc") == 400
+    assert call_middleware(b"-5") == 400
@@ -0,0 +1,48 @@
+import numpy as np
+from modules import vad
+from modules.audio import PCMBuffer
+
+RATE = 16000
+
+def clip(*parts):
+    """Concatenate (seconds, amplitude) parts of a 200 Hz tone over faint noise"""
+    rng = np.random.default_rng(0)
+    pieces = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * RATE)) / RATE
+        pieces.append(amplitude * np.sin(2 * np.pi * 200 * t) + rng.normal(0, 10, len(t)))
+    return PCMBuffer(np.concatenate(pieces).astype(np.int16), RATE)
+
+def test_speech_frame_mask_finds_speech_with_hangover():
+    audio = clip((1.0, 0), (1.0, 8000), (1.0, 0))
+
+    speech = vad.speech_frame_mask(audio.samples, RATE)
+
+    speech_frames = np.flatnonzero(speech)
+    hangover = vad.VAD_HANGOVER_MS // vad.VAD_FRAME_MS
+    frames_per_second = 1000 // vad.VAD_FRAME_MS
+    assert abs(speech_frames[0] - (frames_per_second - hangover)) <= 1
+    assert abs(speech_frames[-1] - (2 * frames_per_second + hangover)) <= 1
+    assert speech[speech_frames[0]:speech_frames[-1] + 1].all()
+
+def test_trim_silence_drops_silence_and_records_stats():
+    audio = clip((1.0, 0), (1.0, 8000), (1.0, 0))
+    stats = vad.TrimStats()
+
+    trimmed = vad.trim_silence(audio, stats)
+
+    assert 1000 <= len(trimmed) <= 1000 + 2 * vad.VAD_HANGOVER_MS + 2 * vad.VAD_FRAME_MS
+    summary = stats.summary()
+    assert summary["clips"] == 1
+    assert summary["input_seconds"] == 3.0
+    assert summary["seconds_saved"] == round(3.0 - len(trimmed) / 1000, 3)
+
+def test_trim_silence_keeps_clips_with_too_little_speech():
+    audio = clip((1.0, 0), (0.1, 8000), (1.0, 0))
+
+    assert vad.trim_silence(audio) is audio
+
+def test_trim_silence_keeps_clips_that_are_speech_throughout():
+    audio = clip((1.0, 8000), (1.0, 4000))
+
+    assert vad.trim_silence(audio) is audio
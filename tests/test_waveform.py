@@ -0,0 +1,40 @@
+import struct
+import numpy as np
+from modules import waveform
+from modules.audio import PCMBuffer
+
+def reference_peaks(samples, samples_per_peak):
+    groups = [samples[i:i + samples_per_peak] for i in range(0, len(samples), samples_per_peak)]
+    return np.array([g.min() for g in groups]), np.array([g.max() for g in groups])
+
+def test_chunked_peaks_match_a_direct_reduction(monkeypatch):
+    # Chunks smaller than the audio, and a length that is not a multiple of any level
+    monkeypatch.setattr(waveform, "WAVEFORM_CHUNK_SAMPLES", 4 * 8)
+    samples = np.random.default_rng(0).integers(-32768, 32767, 1000, dtype=np.int16)
+
+    levels = waveform.compute_peaks(samples, zoom_levels=(8, 32, 128))
+
+    assert [samples_per_peak for samples_per_peak, _, _ in levels] == [8, 32, 128]
+    for samples_per_peak, mins, maxs in levels:
+        expected_mins, expected_maxs = reference_peaks(samples, samples_per_peak)
+        np.testing.assert_array_equal(mins, expected_mins)
+        np.testing.assert_array_equal(maxs, expected_maxs)
+
+def test_encoded_waveform_follows_the_documented_layout():
+    samples = np.array([-32768, 32767, 0, 256] * 128, dtype=np.int16)
+
+    data = waveform.waveform_bytes(PCMBuffer(samples, 16000))
+
+    magic, version, sample_rate, level_count = struct.unpack_from("<4sBIB", data)
+    assert (magic, version, sample_rate, level_count) == (b"SPKW", 1, 16000, len(waveform.WAVEFORM_ZOOM_LEVELS))
+    offset = struct.calcsize("<4sBIB")
+    levels = [struct.unpack_from("<II", data, offset + 8 * i) for i in range(level_count)]
+    assert levels == [(256, 2), (1024, 1), (4096, 1), (16384, 1)]
+    offset += 8 * level_count
+    assert list(np.frombuffer(data, dtype=np.int8, count=4, offset=offset)) == [-128, 127, -128, 127]
+    assert len(data) == offset + 2 * sum(count for _, count in levels)
+
+def test_empty_audio_has_empty_levels():
+    levels = waveform.compute_peaks(np.zeros(0, dtype=np.int16))
+
+    assert all(len(mins) == len(maxs) == 0 for _, mins, maxs in levels)
@@ -0,0 +1,45 @@
+import numpy as np
+from modules import windowed_embed
+from modules.audio import PCMBuffer
+
+class FakeEmbed:
+    """Records the length (ms) of every clip sent for embedding"""
+
+    def __init__(self):
+        self.single = []
+        self.batches = []
+
+    def __call__(self, wav_bytes):
+        self.single.append(wav_bytes)
+        return [1.0, 0.0]
+
+    def batch(self, payloads):
+        self.batches.append(payloads)
+        return [[1.0, float(i)] for i in range(len(payloads))]
+
+def test_window_starts_cover_the_clip_with_hops():
+    assert windowed_embed.window_starts(3000, window_ms=4000, hop_ms=2000) == [0]
+    assert windowed_embed.window_starts(10000, window_ms=4000, hop_ms=2000) == [0, 2000, 4000, 6000]
+
+def test_window_starts_are_spread_evenly_when_capped():
+    starts = windowed_embed.window_starts(60000, window_ms=4000, hop_ms=2000, max_windows=4)
+
+    assert starts == [0, 18667, 37333, 56000]
+
+def test_pool_embeddings_weighs_windows_equally_regardless_of_norm():
+    pooled = windowed_embed.pool_embeddings([[3.0, 0.0], [0.0, 0.5]])
+
+    np.testing.assert_allclose(pooled, [np.sqrt(0.5), np.sqrt(0.5)])
+
+def test_long_clips_are_embedded_as_pooled_windows(monkeypatch):
+    fake = FakeEmbed()
+    monkeypatch.setattr(windowed_embed, "embed", fake)
+    short = PCMBuffer(np.zeros(16000 * 5, dtype=np.int16))
+    long = PCMBuffer(np.zeros(16000 * 60, dtype=np.int16))
+
+    np.testing.assert_array_equal(windowed_embed.embed_audio(short), [1.0, 0.0])
+    pooled = windowed_embed.embed_audio(long)
+
+    assert len(fake.single) == 1
+    assert len(fake.batches) == 1 and len(fake.batches[0]) == windowed_embed.EMBED_MAX_WINDOWS
+    assert np.isclose(np.linalg.norm(pooled), 1.0)
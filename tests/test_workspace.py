@@ -0,0 +1,48 @@
+import os
+import time
+import pytest
+from modules import workspace
+
+@pytest.fixture(autouse=True)
+def scratch_dirs(monkeypatch, tmp_path):
+    monkeypatch.setenv("INGEST_SCRATCH_DIR", str(tmp_path / "scratch"))
+    monkeypatch.setenv("INGEST_DISK_SCRATCH_DIR", str(tmp_path / "disk"))
+    os.makedirs(tmp_path / "disk")
+    return tmp_path
+
+def leftover(root, name, age):
+    path = os.path.join(root, workspace.WORKSPACE_PREFIX + name)
+    os.makedirs(path)
+    with open(os.path.join(path, "chunk.wav"), "wb") as f:
+        f.write(b"audio")
+    modified = time.time() - age
+    for each in (os.path.join(path, "chunk.wav"), path):
+        os.utime(each, (modified, modified))
+    return path
+
+def test_only_untouched_workspaces_are_removed():
+    root = workspace.scratch_root()
+    old = leftover(root, "old", age=7200)
+    recent = leftover(root, "recent", age=60)
+
+    workspace.cleanup_stale_workspaces(max_age=3600)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+
+def test_workspaces_of_this_process_are_kept():
+    with workspace.Workspace("upload") as job:
+        job.disk_dir
+        old = time.time() - 7200
+        for each in (job.dir, job.disk_dir):
+            os.utime(each, (old, old))
+
+        workspace.cleanup_stale_workspaces(max_age=3600)
+
+        assert os.path.isdir(job.dir) and os.path.isdir(job.disk_dir)
+    assert not os.path.exists(job.dir)
+
+def test_large_files_go_to_the_disk_directory(scratch_dirs):
+    with workspace.Workspace("enroll") as job:
+        assert job.path("clip.wav").startswith(str(scratch_dirs / "scratch"))
+        assert job.disk_path("../sample.mp3") == str(scratch_dirs / "disk" / job.name / "sample.mp3")